@@ -0,0 +1,153 @@
+"""
+Offline lexical retrieval over the Mock AdCom reference documents.
+
+Documents are split into chunks of whole paragraphs (long paragraphs are cut into
+overlapping word windows), and the chunks are indexed with BM25. A request's query
+is built from the student's profile and target schools, and only the top-k chunks
+are pasted into the prompt instead of every document in full. Nothing here needs
+the network: the index is built in memory from the cached document text.
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+CHUNK_WORDS = 220
+CHUNK_OVERLAP = 40
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Rough characters-per-token ratio for English prose; good enough to compare prompt sizes offline.
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = frozenset(
+  """
+  a an and are as at be been but by can could did do does for from had has have he her his
+  i if in into is it its me my no not of on or our she so than that the their them then there
+  these they this to was we were what when which who will with would you your
+  """.split()
+)
+
+# Rubric vocabulary added to every query, so the scale definitions are always candidates.
+RUBRIC_QUERY = "academic extracurricular personal rating scale reader rubric essay admit deny"
+
+
+class Chunk(NamedTuple):
+  doc: str
+  index: int  # position of the chunk within its document
+  text: str
+
+
+def tokenize(text: str) -> List[str]:
+  """Lower-cased alphanumeric words without stopwords; a plural "-s" is folded away."""
+  tokens = []
+  for w in re.findall(r"[a-z0-9]+", text.lower()):
+    if len(w) < 2 or w in STOPWORDS:
+      continue
+    if len(w) > 4 and w.endswith("s") and not w.endswith("ss"):
+      w = w[:-1]
+    tokens.append(w)
+  return tokens
+
+
+def estimate_tokens(text: str) -> int:
+  return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _windows(words: List[str], size: int, overlap: int) -> Iterable[List[str]]:
+  step = max(1, size - overlap)
+  for start in range(0, len(words), step):
+    yield words[start:start + size]
+    if start + size >= len(words):
+      break
+
+
+def chunk_text(doc: str, text: str, max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[Chunk]:
+  """Pack consecutive paragraphs into chunks of at most ``max_words`` words."""
+  pieces: List[str] = []
+  current: List[str] = []
+  for para in re.split(r"\n\s*\n", text):
+    words = para.split()
+    if not words:
+      continue
+    if len(words) > max_words:
+      if current:
+        pieces.append(" ".join(current))
+        current = []
+      pieces.extend(" ".join(w) for w in _windows(words, max_words, overlap))
+      continue
+    if len(current) + len(words) > max_words:
+      pieces.append(" ".join(current))
+      current = []
+    current.extend(words)
+  if current:
+    pieces.append(" ".join(current))
+  return [Chunk(doc, i, piece) for i, piece in enumerate(pieces)]
+
+
+class BM25Index:
+  """Okapi BM25 over a fixed list of chunks."""
+
+  def __init__(self, chunks: Sequence[Chunk], k1: float = BM25_K1, b: float = BM25_B):
+    self.chunks = list(chunks)
+    self.k1 = k1
+    self.b = b
+    self.term_freqs: List[Counter] = [Counter(tokenize(c.text)) for c in self.chunks]
+    self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+    self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+    df: Counter = Counter()
+    for tf in self.term_freqs:
+      df.update(tf.keys())
+    n = len(self.chunks)
+    self.idf: Dict[str, float] = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+    self.postings: Dict[str, List[int]] = {}
+    for i, tf in enumerate(self.term_freqs):
+      for term in tf:
+        self.postings.setdefault(term, []).append(i)
+
+  def scores(self, query: str) -> Dict[int, float]:
+    scores: Dict[int, float] = {}
+    for term in set(tokenize(query)):
+      idf = self.idf.get(term)
+      if idf is None:
+        continue
+      for i in self.postings[term]:
+        f = self.term_freqs[i][term]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+        scores[i] = scores.get(i, 0.0) + idf * f * (self.k1 + 1) / (f + norm)
+    return scores
+
+  def search(self, query: str, k: int) -> List[Tuple[float, Chunk]]:
+    """The ``k`` best chunks, best first (ties keep document order)."""
+    ranked = sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+    return [(score, self.chunks[i]) for i, score in ranked[:k]]
+
+
+def build_index(documents: Iterable[Tuple[str, str]]) -> BM25Index:
+  """Index ``(name, text)`` documents."""
+  chunks: List[Chunk] = []
+  for name, text in documents:
+    chunks.extend(chunk_text(name, text))
+  return BM25Index(chunks)
+
+
+def _strings(value: Any) -> Iterable[str]:
+  if isinstance(value, dict):
+    for k, v in value.items():
+      yield str(k)
+      yield from _strings(v)
+  elif isinstance(value, (list, tuple)):
+    for v in value:
+      yield from _strings(v)
+  elif isinstance(value, str):
+    yield value
+
+
+def profile_query(student_data: Dict[str, Any], target_schools: Sequence[Dict[str, Any]]) -> str:
+  """Query text from every key and string value of the student profile and target schools."""
+  return " ".join([RUBRIC_QUERY, *_strings(student_data), *_strings(list(target_schools))])
+
+
+def render_context(hits: Sequence[Tuple[float, Chunk]]) -> str:
+  """Selected chunks in document order, each labelled with its source."""
+  ordered = sorted((chunk for _, chunk in hits), key=lambda c: (c.doc, c.index))
+  return "\n\n".join(f"[{c.doc}, excerpt {c.index + 1}]\n{c.text}" for c in ordered)
@@ -0,0 +1,404 @@
+"""
+Local "generic essay" pre-signal for the Mock AdCom reader.
+
+The system prompt tells the model to flag a generic main essay (a standard sports
+injury story, generic community service or service trip, ...). This module gives it
+a cheap, deterministic signal to start from:
+
+- Near-duplicates: every known essay (``Anonymous_Essays.json`` plus any files in
+  ``ADCOM_ESSAY_SOURCES``) is reduced to a MinHash signature over its word 3-grams,
+  and the signatures are bucketed with locality-sensitive hashing (``BANDS`` bands of
+  ``ROWS`` rows). A draft is only compared with the essays sharing a bucket, and the
+  fraction of equal signature slots estimates their Jaccard similarity. With 64
+  bands of 2 rows the candidate threshold is about (1/64)^(1/2) = 0.125, so a draft
+  at similarity 0.5 is missed with probability (1 - 0.5^2)^64, about 1e-8.
+- Topic clusters: ``TOPIC_CLUSTERS`` lists distinctive cues of overused topics, each
+  a phrase with its variants ("passed away|died|death"). A draft scores the share
+  of a topic's cues it contains and is flagged only with ``TOPIC_MIN_CUES`` distinct
+  cues, so everyday words ("new", "school", "friend") never flag on their own;
+  ``topic_corpus_share`` is the share of known essays in the same topic.
+
+``essay_signal`` reports the two separately (``max_similarity`` and ``topic_score``)
+with their flags.
+``python adcom_similarity.py`` benchmarks index build and query time.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+ESSAYS_JSON = ROOT / "public" / "data" / "Applicant_Data" / "Anonymous_Essays.json"
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+SEED = 20240917
+# Estimated Jaccard at which a draft counts as a near-copy of a known essay.
+NEAR_DUPLICATE_THRESHOLD = 0.5
+# A topic counts only when a draft contains this many of its distinct cues.
+TOPIC_MIN_CUES = 3
+
+TOPIC_CLUSTERS: Dict[str, Tuple[str, ...]] = {
+  "sports injury": (
+    "torn acl|tore my acl|acl",
+    "surgery",
+    "physical therapy|rehab|rehabilitation",
+    "sidelined|on the bench|from the bench",
+    "season ending|rest of the season",
+    "injury|injured|concussion",
+    "back on the field|back on the court",
+  ),
+  "service trip": (
+    "mission trip|service trip",
+    "orphanage|orphans",
+    "third world|developing country",
+    "village",
+    "built houses|build houses|habitat for humanity",
+    "less fortunate|extreme poverty",
+    "my privilege|how privileged|so much to be grateful",
+  ),
+  "community service": (
+    "community service",
+    "food bank|food drive|clothing drive",
+    "soup kitchen",
+    "homeless shelter|the homeless",
+    "service hours|volunteer hours",
+    "nursing home",
+    "volunteered|volunteering",
+  ),
+  "immigrant family": (
+    "immigrant|immigrants|immigrated|immigration",
+    "american dream",
+    "my parents sacrificed|sacrifices my parents|their sacrifices",
+    "translate for|translating for|translator for",
+    "native language|mother tongue",
+    "new country|came to america|came to the united states",
+    "green card|visa",
+  ),
+  "loss of a relative": (
+    "passed away|died|death",
+    "funeral",
+    "diagnosed with cancer|cancer",
+    "hospice|hospital bed",
+    "grief|grieving|mourning",
+    "last words|said goodbye|last time i saw",
+  ),
+  "moving schools": (
+    "new school",
+    "moved to|moving to|we moved",
+    "new town|new city",
+    "new kid|transferred",
+    "make new friends|left my friends|leaving my friends|left behind",
+    "fit in|outsider",
+  ),
+  "overcoming failure": (
+    "i failed|failing grade|failed the",
+    "failure|failures",
+    "my mistake|my mistakes",
+    "lesson learned|learned my lesson",
+    "persevere|perseverance|resilience",
+    "never give up|not to give up|bounce back",
+  ),
+  "music performance": (
+    "recital|concert",
+    "orchestra|band director|conductor",
+    "piano|violin|cello|viola|flute|clarinet",
+    "stage fright|on stage",
+    "audition|auditioned",
+    "practiced for hours|hours of practice|sheet music",
+  ),
+}
+
+
+class Signature(NamedTuple):
+  key: str
+  meta: Dict[str, Any]
+  minhash: np.ndarray
+
+
+def words(text: Optional[str]) -> List[str]:
+  return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def shingles(text: Optional[str], size: int = SHINGLE_WORDS) -> np.ndarray:
+  """crc32 hashes of the distinct word ``size``-grams (the words themselves for shorter texts)."""
+  w = words(text)
+  grams = {" ".join(w[i:i + size]) for i in range(max(1, len(w) - size + 1))} if w else set()
+  return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+  """MinHash with ``num_perm`` multiply-shift hash functions (64-bit a, b; top 32 bits)."""
+
+  def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+    rng = np.random.default_rng(seed)
+    self.a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+    self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    self.num_perm = num_perm
+
+  def signature(self, hashes: np.ndarray) -> np.ndarray:
+    if hashes.size == 0:
+      return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+    # uint64 arithmetic wraps modulo 2^64, which is what multiply-shift hashing wants.
+    mixed = (hashes[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)
+    return mixed.min(axis=0).astype(np.uint32)
+
+
+class EssayIndex:
+  """MinHash signatures of known essays, bucketed by LSH band."""
+
+  def __init__(self, bands: int = BANDS, hasher: Optional[MinHasher] = None):
+    self.hasher = hasher or MinHasher()
+    if self.hasher.num_perm % bands:
+      raise ValueError(f"{self.hasher.num_perm} permutations do not split into {bands} bands")
+    self.bands = bands
+    self.rows = self.hasher.num_perm // bands
+    self.entries: List[Signature] = []
+    self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+    self._matrix: Optional[np.ndarray] = None
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def _band_keys(self, minhash: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+    for band in range(self.bands):
+      yield band, minhash[band * self.rows:(band + 1) * self.rows].tobytes()
+
+  def add(self, key: str, text: str, meta: Optional[Dict[str, Any]] = None) -> None:
+    minhash = self.hasher.signature(shingles(text))
+    position = len(self.entries)
+    self.entries.append(Signature(key, meta or {}, minhash))
+    for band, bucket in self._band_keys(minhash):
+      self.buckets[band].setdefault(bucket, []).append(position)
+    self._matrix = None
+
+  def signatures(self) -> np.ndarray:
+    """All signatures as one (essays, NUM_PERM) array."""
+    if self._matrix is None:
+      self._matrix = np.stack([e.minhash for e in self.entries]) if self.entries else np.empty((0, self.hasher.num_perm), np.uint32)
+    return self._matrix
+
+  def candidates(self, minhash: np.ndarray) -> List[int]:
+    found = set()
+    for band, bucket in self._band_keys(minhash):
+      found.update(self.buckets[band].get(bucket, ()))
+    return sorted(found)
+
+  def query(self, text: str, k: int = 5) -> List[Tuple[float, Signature]]:
+    """Up to ``k`` LSH candidates with their estimated Jaccard similarity, most similar first."""
+    minhash = self.hasher.signature(shingles(text))
+    found = self.candidates(minhash)
+    if not found:
+      return []
+    similarity = (self.signatures()[found] == minhash).mean(axis=1)
+    order = sorted(range(len(found)), key=lambda i: (-similarity[i], found[i]))
+    return [(float(similarity[i]), self.entries[found[i]]) for i in order[:k]]
+
+  def scan(self, text: str, k: int = 5) -> List[Tuple[float, Signature]]:
+    """Like ``query`` but compares against every signature (no LSH); for benchmarks."""
+    minhash = self.hasher.signature(shingles(text))
+    similarity = (self.signatures() == minhash).mean(axis=1)
+    order = np.lexsort((np.arange(len(similarity)), -similarity))[:k]
+    return [(float(similarity[i]), self.entries[i]) for i in order]
+
+
+# ---------- topics ----------
+def topic_cues(text: str) -> Dict[str, List[str]]:
+  """Per topic cluster, the phrase found for each of its cues that the text contains."""
+  padded = f" {' '.join(words(text))} "
+  found: Dict[str, List[str]] = {}
+  for name, cues in TOPIC_CLUSTERS.items():
+    hits = (next((v for v in cue.split("|") if f" {v} " in padded), None) for cue in cues)
+    found[name] = [hit for hit in hits if hit is not None]
+  return found
+
+
+def best_topic(text: str) -> Optional[Tuple[str, float, List[str]]]:
+  """(topic, share of its cues found, phrases found) for the strongest cluster with TOPIC_MIN_CUES cues."""
+  cues = topic_cues(text)
+  name = max(cues, key=lambda n: (len(cues[n]) / len(TOPIC_CLUSTERS[n]), n))
+  if len(cues[name]) < TOPIC_MIN_CUES:
+    return None
+  return name, len(cues[name]) / len(TOPIC_CLUSTERS[name]), cues[name]
+
+
+# ---------- corpus ----------
+def essay_sources() -> List[Path]:
+  """``Anonymous_Essays.json`` plus the JSON files listed in ``ADCOM_ESSAY_SOURCES`` (os.pathsep-separated)."""
+  extra = [Path(p) for p in (os.getenv("ADCOM_ESSAY_SOURCES") or "").split(os.pathsep) if p]
+  return [p for p in [ESSAYS_JSON, *extra] if p.is_file()]
+
+
+def load_essays(paths: Sequence[Path]) -> List[Dict[str, Any]]:
+  """Essay records (dicts with an ``essay`` text) from JSON arrays, keyed ``<file stem>:<essay_id or position>``."""
+  records = []
+  for path in paths:
+    for i, item in enumerate(json.loads(path.read_text(encoding="utf-8"))):
+      if isinstance(item, dict) and str(item.get("essay") or "").strip():
+        records.append({**item, "key": f"{path.stem}:{item.get('essay_id', i)}"})
+  return records
+
+
+def build_essay_index(records: Sequence[Dict[str, Any]]) -> Tuple[EssayIndex, Dict[str, int]]:
+  """The LSH index over ``records`` and the number of known essays per topic cluster."""
+  index = EssayIndex()
+  topics: Dict[str, int] = {}
+  for record in records:
+    meta = {k: record.get(k) for k in ("essay_id", "school", "year", "type", "category")}
+    index.add(record["key"], record["essay"], meta)
+    topic = best_topic(record["essay"])
+    if topic is not None:
+      topics[topic[0]] = topics.get(topic[0], 0) + 1
+  return index, topics
+
+
+_index_lock = threading.Lock()
+_essay_index: Optional[Tuple[tuple, EssayIndex, Dict[str, int]]] = None
+
+
+def _sources_key(paths: Sequence[Path]) -> tuple:
+  return tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in paths)
+
+
+def essay_sources_key() -> tuple:
+  """(path, mtime_ns, size) of every essay source; changes whenever the index would be rebuilt."""
+  return _sources_key(essay_sources())
+
+
+def essay_index() -> Tuple[EssayIndex, Dict[str, int]]:
+  """The index over every essay source, rebuilt only when a source file changes."""
+  global _essay_index
+  paths = essay_sources()
+  key = _sources_key(paths)
+  with _index_lock:
+    if _essay_index is None or _essay_index[0] != key:
+      _essay_index = (key, *build_essay_index(load_essays(paths)))
+    return _essay_index[1], _essay_index[2]
+
+
+def essay_signal(
+  text: str,
+  index: Optional[EssayIndex] = None,
+  topic_counts: Optional[Dict[str, int]] = None,
+  k: int = 3,
+) -> Dict[str, Any]:
+  """
+  Similarity of one draft to the known essays (``max_similarity``, the estimated
+  Jaccard of the closest one) and to the topic clusters (``topic_score``, the share of
+  the matched topic's cues), reported separately.
+  """
+  if index is None:
+    index, topic_counts = essay_index()
+  topic_counts = topic_counts or {}
+  matches = index.query(text, k)
+  topic = best_topic(text)
+  similarity = matches[0][0] if matches else 0.0
+  topic_share = topic[1] if topic else 0.0
+  flags = []
+  if similarity >= NEAR_DUPLICATE_THRESHOLD:
+    flags.append("near_duplicate")
+  if topic is not None:
+    flags.append("common_topic")
+  return {
+    "flags": flags,
+    "max_similarity": round(similarity, 3),
+    "similar_essays": [{"key": s.key, "similarity": round(score, 3), **s.meta} for score, s in matches],
+    "topic": topic[0] if topic else None,
+    "topic_score": round(topic_share, 3),
+    "topic_cues": topic[2] if topic else [],
+    "topic_corpus_share": round(topic_counts.get(topic[0], 0) / len(index), 3) if topic and len(index) else 0.0,
+  }
+
+
+def student_essays(student_data: Dict[str, Any]) -> Dict[str, str]:
+  """Essay texts from ``student_data["essays"]`` (a string, a list, or a dict of named essays)."""
+  essays = student_data.get("essays")
+  if isinstance(essays, str):
+    essays = {"essay": essays}
+  elif isinstance(essays, list):
+    essays = {f"essay_{i + 1}": e for i, e in enumerate(essays)}
+  if not isinstance(essays, dict):
+    return {}
+  return {str(name): text for name, text in essays.items() if isinstance(text, str) and len(words(text)) >= SHINGLE_WORDS}
+
+
+# ---------- benchmark ----------
+def _perturb(text: str, rng: np.random.Generator, drop: float) -> str:
+  w = text.split()
+  keep = rng.random(len(w)) >= drop
+  return " ".join(x for x, kept in zip(w, keep) if kept)
+
+
+def _percentiles(seconds: List[float]) -> str:
+  ms = np.array(seconds) * 1e3
+  return f"p50 {np.percentile(ms, 50):.2f}ms  p95 {np.percentile(ms, 95):.2f}ms"
+
+
+def benchmark(records: Sequence[Dict[str, Any]], scale: int = 20, drop: float = 0.1) -> List[str]:
+  """
+  Times the index build and queries. Each known essay, with ``drop`` of its words
+  removed, must find itself; the corpus is then padded to ``scale`` times its size
+  with shuffled essays to show query time against a full scan.
+  """
+  failures = []
+  start = time.perf_counter()
+  index, topics = build_essay_index(records)
+  build = time.perf_counter() - start
+  print(f"build: {len(index)} essays in {build * 1e3:.0f}ms ({build / max(1, len(index)) * 1e3:.2f}ms/essay); topics {topics}")
+
+  rng = np.random.default_rng(SEED)
+  times, hits = [], 0
+  for record in records:
+    draft = _perturb(record["essay"], rng, drop)
+    start = time.perf_counter()
+    signal = essay_signal(draft, index, topics)
+    times.append(time.perf_counter() - start)
+    hits += bool(signal["similar_essays"]) and signal["similar_essays"][0]["key"] == record["key"]
+  print(f"query ({drop:.0%} of words dropped): found itself {hits}/{len(records)}  {_percentiles(times)}")
+  if hits < 0.95 * len(records):
+    failures.append(f"near-duplicate recall {hits}/{len(records)}")
+
+  fresh = [" ".join(rng.permutation(r["essay"].split())) for r in records]
+  false = sum(1 for text in fresh if essay_signal(text, index, topics)["max_similarity"] >= NEAR_DUPLICATE_THRESHOLD)
+  print(f"shuffled essays flagged as near-duplicates: {false}/{len(fresh)}")
+  if false:
+    failures.append(f"{false} shuffled essays flagged")
+
+  padded = list(records) + [
+    {**r, "key": f"pad{n}:{r['key']}", "essay": " ".join(rng.permutation(r["essay"].split()))}
+    for n in range(scale - 1)
+    for r in records
+  ]
+  start = time.perf_counter()
+  big, _ = build_essay_index(padded)
+  big.signatures()
+  build = time.perf_counter() - start
+  lsh, scan = [], []
+  for record in records:
+    draft = _perturb(record["essay"], rng, drop)
+    start = time.perf_counter()
+    found = big.query(draft, 1)
+    lsh.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    best = big.scan(draft, 1)
+    scan.append(time.perf_counter() - start)
+    missed = best and best[0][0] >= NEAR_DUPLICATE_THRESHOLD and (not found or found[0][0] < best[0][0])
+    if missed:
+      failures.append(f"LSH missed the best match for {record['key']}")
+  print(f"padded to {len(big)} essays: build {build:.2f}s; LSH query {_percentiles(lsh)}; full scan {_percentiles(scan)}")
+  return failures
+
+
+if __name__ == "__main__":
+  failed = benchmark(load_essays(essay_sources()))
+  for failure in failed:
+    print(f"FAIL {failure}")
+  raise SystemExit(1 if failed else 0)
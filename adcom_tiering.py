@@ -0,0 +1,278 @@
+"""
+Deterministic 5-tier pre-classification of a student's target schools.
+
+The tier rules in the Mock AdCom system prompt are arithmetic on each school's admit
+rate, its SAT/ACT 25th-75th percentile range and Ivy-style flags. ``assign_tiers``
+applies them to the whole target list at once with numpy, filling each school's
+numbers from the per-institution files the data pipeline publishes
+(``institutions/<unitid>.json`` and ``metrics/<unitid>.json``); values given on the
+school dict itself take precedence.
+
+The student's position within a school's range is ``(score - p25) / (p75 - p25)``:
+0 at the 25th percentile, 1 at the 75th. With both SAT and ACT the better position
+counts. Rules, first match wins:
+
+- Lottery:         is_ivy / is_tippy_top, or admit rate < 10%
+- Academic Safety: position >= 1 and admit rate >= 50%
+- Yield Target:    position >= 1 and admit rate 10-50% (overqualified, must show interest)
+- Reach:           position < 0, or position < 0.5 at a school admitting < 25%
+- Target Match:    any other position
+- without comparable scores, on the admit rate alone:
+                   >= 60% Target Match, otherwise Reach
+- without scores or an admit rate the tier is None and is left to the model.
+
+Only Lottery is ``binding``: it follows from the flags or the published admit rate
+alone, whatever else is in the file. Every other tier is arithmetic on test scores
+and the admit rate, which GPA, rigor and hooks can outweigh, so it is a suggestion.
+"""
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv("ADCOM_DATA_DIR") or ROOT / "public" / "data" / "University_data")
+
+TIERS = ("Academic Safety", "Yield Target", "Target Match", "Reach", "Lottery")
+LOTTERY_MAX_RATE = 0.10
+SAFETY_MIN_RATE = 0.50
+SELECTIVE_MAX_RATE = 0.25
+RATE_ONLY_MATCH_MIN_RATE = 0.60
+
+SAT_SECTIONS = ("sat_evidence_based_reading_and_writing", "sat_math")
+ACT_COMPOSITE = "act_composite"
+
+
+# ---------- school numbers ----------
+def _number(value: Any) -> Optional[float]:
+  """``value`` as a float; None when missing or unparsable ("30%", "n/a", "")."""
+  try:
+    number = None if value is None else float(value)
+  except (TypeError, ValueError):
+    return None
+  return None if number is None or np.isnan(number) else number
+
+
+def _latest(rows: Sequence[Dict[str, Any]], field: str) -> Optional[float]:
+  """Most recent non-null value of ``field`` across yearly metric rows."""
+  for row in sorted(rows, key=lambda r: r.get("year") or 0, reverse=True):
+    value = _number(row.get(field))
+    if value is not None:
+      return value
+  return None
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+  try:
+    return json.loads(path.read_text(encoding="utf-8"))
+  except (OSError, ValueError):
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _school_file_stats(data_dir: str, unitid: int, mtime_ns: int) -> Dict[str, Optional[float]]:
+  # mtime_ns is part of the cache key only, so a regenerated file is re-read.
+  stats: Dict[str, Optional[float]] = {}
+  metrics = _read_json(Path(data_dir) / "metrics" / f"{unitid}.json") or {}
+  rows = metrics.get("metrics") or []
+  rate = _latest(rows, "percent_admitted_total")
+  if rate is None:
+    detail = _read_json(Path(data_dir) / "institutions" / f"{unitid}.json") or {}
+    rate = _number(((detail.get("profile") or {}).get("outcomes") or {}).get("acceptance_rate"))
+  stats["acceptance_rate"] = None if rate is None else rate / 100.0
+  for p in (25, 75):
+    sections = [_latest(rows, f"{s}_{p}th_percentile_score") for s in SAT_SECTIONS]
+    stats[f"sat_{p}"] = None if None in sections else sum(sections)
+    stats[f"act_{p}"] = _latest(rows, f"{ACT_COMPOSITE}_{p}th_percentile_score")
+  return stats
+
+
+def school_file_stats(unitid: int, data_dir: Path = DATA_DIR) -> Dict[str, Optional[float]]:
+  """Admit rate (fraction) and SAT total / ACT composite 25th and 75th percentiles."""
+  path = Path(data_dir) / "metrics" / f"{unitid}.json"
+  try:
+    mtime_ns = path.stat().st_mtime_ns
+  except OSError:
+    mtime_ns = 0
+  return _school_file_stats(str(data_dir), int(unitid), mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _name_index(data_dir: str) -> Dict[str, int]:
+  index = _read_json(Path(data_dir) / "institutions_index.json") or []
+  return {str(row["name"]).strip().lower(): int(row["unitid"]) for row in index if row.get("name")}
+
+
+def resolve_unitid(school: Dict[str, Any], data_dir: Path = DATA_DIR) -> Optional[int]:
+  """The school's unitid, given directly or found by exact (case-insensitive) name."""
+  unitid = school.get("unitid")
+  if unitid is not None:
+    try:
+      return int(unitid)
+    except (TypeError, ValueError):
+      return None
+  name = school.get("school_name") or school.get("name")
+  if not name:
+    return None
+  return _name_index(str(data_dir)).get(str(name).strip().lower())
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+  try:
+    stat = path.stat()
+  except OSError:
+    return None
+  return stat.st_mtime_ns, stat.st_size
+
+
+def data_files_key(target_schools: Sequence[Dict[str, Any]], data_dir: Path = DATA_DIR) -> list:
+  """
+  (file, mtime_ns, size) of every data file ``school_numbers`` reads for these schools:
+  the name index and each school's metrics and detail files (None when missing).
+  """
+  data_dir = Path(data_dir)
+  files = ["institutions_index.json"]
+  for school in target_schools:
+    unitid = resolve_unitid(school, data_dir)
+    if unitid is not None:
+      files += [f"metrics/{unitid}.json", f"institutions/{unitid}.json"]
+  return [(name, _file_stamp(data_dir / name)) for name in files]
+
+
+def _rate(value: Any) -> Optional[float]:
+  """Admit rate as a fraction; percentages (> 1) are accepted too. None when unparsable."""
+  rate = _number(value)
+  if rate is None:
+    return None
+  return rate / 100.0 if rate > 1 else rate
+
+
+def school_numbers(school: Dict[str, Any], data_dir: Path = DATA_DIR) -> Dict[str, Any]:
+  """The numbers the rules need, from the school dict first and the data files second."""
+  unitid = resolve_unitid(school, data_dir)
+  stats = school_file_stats(unitid, data_dir) if unitid is not None else {}
+  numbers: Dict[str, Any] = {"unitid": unitid}
+  # Values on the school dict win; unparsable ones count as unknown and fall back to the files.
+  rate = _rate(school.get("acceptance_rate"))
+  numbers["acceptance_rate"] = rate if rate is not None else stats.get("acceptance_rate")
+  for field in ("sat_25", "sat_75", "act_25", "act_75"):
+    value = _number(school.get(field))
+    numbers[field] = value if value is not None else stats.get(field)
+  numbers["flagged"] = bool(school.get("is_ivy") or school.get("is_tippy_top"))
+  return numbers
+
+
+# ---------- student scores ----------
+def student_scores(student_data: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+  """(SAT total, ACT composite) from ``academics.test_scores`` (or ``academics`` itself)."""
+  academics = student_data.get("academics") or {}
+  scores = academics.get("test_scores") or academics
+  sat = _number(scores.get("sat"))
+  if sat is None:
+    parts = [_number(scores.get(k)) for k in ("sat_math", "sat_ebrw")]
+    sat = None if None in parts else sum(parts)
+  return sat, _number(scores.get("act"))
+
+
+# ---------- rules ----------
+def _position(score: Optional[float], p25: np.ndarray, p75: np.ndarray) -> np.ndarray:
+  if score is None:
+    return np.full(p25.shape, np.nan)
+  spread = p75 - p25
+  with np.errstate(divide="ignore", invalid="ignore"):
+    pos = (score - p25) / spread
+  # A degenerate range (p25 == p75) still says whether the score is above or below it.
+  flat = spread == 0
+  pos[flat] = np.where(score >= p25[flat], 1.0, -1.0)
+  return pos
+
+
+def tier_arrays(
+  rate: np.ndarray,
+  position: np.ndarray,
+  flagged: np.ndarray,
+) -> np.ndarray:
+  """Tier per school from admit rates, score positions (NaN = unknown) and Ivy flags."""
+  has_pos = ~np.isnan(position)
+  has_rate = ~np.isnan(rate)
+  above = has_pos & (position >= 1)
+  conditions = [
+    flagged | (has_rate & (rate < LOTTERY_MAX_RATE)),
+    above & has_rate & (rate >= SAFETY_MIN_RATE),
+    above & has_rate,
+    has_pos & ((position < 0) | ((position < 0.5) & has_rate & (rate < SELECTIVE_MAX_RATE))),
+    has_pos,
+    has_rate & (rate >= RATE_ONLY_MATCH_MIN_RATE),
+    has_rate,
+  ]
+  choices = ["Lottery", "Academic Safety", "Yield Target", "Reach", "Target Match", "Target Match", "Reach"]
+  return np.select(conditions, choices, default="")
+
+
+def assign_tiers(
+  student_data: Dict[str, Any],
+  target_schools: Sequence[Dict[str, Any]],
+  data_dir: Path = DATA_DIR,
+) -> List[Dict[str, Any]]:
+  """
+  One entry per target school, in order: ``school_name``, ``unitid``, ``tier`` (None
+  when the numbers are insufficient), ``basis`` ("flag", "scores", "acceptance_rate"
+  or None), ``binding`` (True for Lottery only) and the numbers used.
+  """
+  numbers = [school_numbers(s, data_dir) for s in target_schools]
+
+  def column(field: str) -> np.ndarray:
+    return np.array([np.nan if n[field] is None else n[field] for n in numbers], dtype=float)
+
+  rate = column("acceptance_rate")
+  flagged = np.array([n["flagged"] for n in numbers], dtype=bool)
+  sat, act = student_scores(student_data)
+  sat_pos = _position(sat, column("sat_25"), column("sat_75"))
+  act_pos = _position(act, column("act_25"), column("act_75"))
+  position = np.fmax(sat_pos, act_pos)
+  tiers = tier_arrays(rate, position, flagged)
+
+  out = []
+  for i, school in enumerate(target_schools):
+    tier = str(tiers[i]) or None
+    if tier is None:
+      basis = None
+    elif flagged[i]:
+      basis = "flag"
+    elif tier == "Lottery" or np.isnan(position[i]):
+      basis = "acceptance_rate"
+    else:
+      basis = "scores"
+    out.append(
+      {
+        "school_name": school.get("school_name") or school.get("name"),
+        "unitid": numbers[i]["unitid"],
+        "tier": tier,
+        "basis": basis,
+        "binding": tier == "Lottery",
+        "acceptance_rate": None if np.isnan(rate[i]) else round(float(rate[i]), 4),
+        "score_position": None if np.isnan(position[i]) else round(float(position[i]), 3),
+        "sat_range": [numbers[i]["sat_25"], numbers[i]["sat_75"]],
+        "act_range": [numbers[i]["act_25"], numbers[i]["act_75"]],
+      }
+    )
+  return out
+
+
+def tier_rationale(entry: Dict[str, Any]) -> str:
+  """A one-line, rule-based rationale for a pre-assigned tier."""
+  if entry["tier"] is None:
+    return "Not enough published data (admit rate or test ranges) to place this school."
+  parts = []
+  if entry["acceptance_rate"] is not None:
+    parts.append(f"admit rate {entry['acceptance_rate']:.0%}")
+  if entry["score_position"] is not None:
+    pos = entry["score_position"]
+    where = "above the 75th percentile" if pos >= 1 else "below the 25th percentile" if pos < 0 else "within the middle 50%"
+    parts.append(f"test scores {where}")
+  if entry["basis"] == "flag":
+    parts.append("ultra-selective (Ivy / tippy-top)")
+  return f"{entry['tier']}: " + ", ".join(parts) + "."
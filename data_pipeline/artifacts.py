@@ -0,0 +1,127 @@
+"""
+Shared helpers for writing the pipeline's JSON artifacts.
+
+Two output formats are supported:
+
+- ``pretty``  (default): indented JSON, exactly as the scripts have always written it.
+- ``compact``: minified JSON plus precompressed ``.gz`` and ``.br`` siblings
+  (``.br`` only when the optional ``brotli`` package is installed), with a per-artifact
+  size report so the transfer savings are visible.
+"""
+import gzip
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:  # optional: brotli siblings are skipped when it is not installed
+    import brotli
+except ImportError:
+    brotli = None
+
+OUTPUT_FORMATS = ("pretty", "compact")
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def json_text(payload, pretty: bool, ensure_ascii: bool = False) -> str:
+    if pretty:
+        return json.dumps(payload, indent=2, ensure_ascii=ensure_ascii)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=ensure_ascii)
+
+
+def add_output_format_arg(parser) -> None:
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="pretty",
+        help="pretty: indented JSON (default); compact: minified JSON plus precompressed .gz/.br siblings",
+    )
+
+
+def sibling(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def remove_compressed_siblings(path: Path) -> None:
+    for suffix in COMPRESSED_SUFFIXES:
+        sibling(path, suffix).unlink(missing_ok=True)
+
+
+def write_compressed_siblings(path: Path, data: bytes) -> Dict[str, int]:
+    """Write ``<path>.gz`` (and ``<path>.br`` when available); returns their sizes by suffix."""
+    sizes: Dict[str, int] = {}
+    # mtime=0 keeps the gzip bytes reproducible so unchanged artifacts stay unchanged.
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    sibling(path, ".gz").write_bytes(gz)
+    sizes[".gz"] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        sibling(path, ".br").write_bytes(br)
+        sizes[".br"] = len(br)
+    else:
+        sibling(path, ".br").unlink(missing_ok=True)
+    return sizes
+
+
+class SizeReport:
+    """Collects pretty vs. minified vs. compressed byte counts per artifact."""
+
+    def __init__(self) -> None:
+        self.rows: List[Tuple[str, int, int, Optional[int], Optional[int]]] = []
+
+    def add(self, name: str, pretty: int, minified: int, gz: Optional[int], br: Optional[int]) -> None:
+        self.rows.append((name, pretty, minified, gz, br))
+
+    def print(self) -> None:
+        if not self.rows:
+            return
+
+        def fmt(n: Optional[int]) -> str:
+            return "-" if n is None else f"{n:,}"
+
+        print(f"{'artifact':<40} {'pretty':>13} {'minified':>13} {'gzip':>13} {'brotli':>13} {'saved':>7}")
+        for name, pretty, minified, gz, br in self.rows:
+            smallest = min(n for n in (minified, gz, br) if n is not None)
+            saved = 100.0 * (1 - smallest / pretty) if pretty else 0.0
+            print(f"{name:<40} {fmt(pretty):>13} {fmt(minified):>13} {fmt(gz):>13} {fmt(br):>13} {saved:6.1f}%")
+        if brotli is None:
+            print("(brotli not installed: .br siblings were not written)")
+
+
+def write_json_artifact(
+    path: Path,
+    render: Callable[[bool], str],
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+) -> None:
+    """
+    Write one JSON artifact. ``render(pretty)`` returns the indented text when ``pretty``
+    is true and the minified text otherwise.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if output_format == "pretty":
+        path.write_text(render(True), encoding="utf-8")
+        remove_compressed_siblings(path)
+        return
+
+    data = render(False).encode("utf-8")
+    path.write_bytes(data)
+    sizes = write_compressed_siblings(path, data)
+    if report is not None:
+        report.add(path.name, len(render(True).encode("utf-8")), len(data), sizes.get(".gz"), sizes.get(".br"))
+
+
+def write_binary_artifact(
+    path: Path,
+    data: bytes,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+) -> None:
+    """Write a binary artifact; compact output adds the same precompressed siblings as JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if output_format != "compact":
+        remove_compressed_siblings(path)
+        return
+    sizes = write_compressed_siblings(path, data)
+    if report is not None:
+        report.add(path.name, len(data), len(data), sizes.get(".gz"), sizes.get(".br"))
@@ -0,0 +1,805 @@
+"""
+Benchmarks for the vectorized ETL stages in etl_admissions.py (and the streaming
+reader in build_majors_from_ipeds.py).
+
+Each stage is timed against the original row-wise implementation (kept here as
+a reference) and the two outputs are compared byte-for-byte via ``to_json``.
+
+    python data_pipeline/bench_etl.py                  # synthetic inputs only
+    python data_pipeline/bench_etl.py --src <csv dir>  # also the real IPEDS inputs
+    python data_pipeline/bench_etl.py --degrees-csv public/data/institutions_degrees_bachelor.csv
+    python data_pipeline/bench_etl.py --essays public/data/Applicant_Data/Anonymous_Essays.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import build_majors_from_ipeds as majors  # noqa: E402
+import columnar  # noqa: E402
+import essay_corpus  # noqa: E402
+import etl_admissions as etl  # noqa: E402
+import export_institutions_sql as sql_export  # noqa: E402
+import schema  # noqa: E402
+import search_index  # noqa: E402
+
+
+# ---------- reference (row-wise) implementations ----------
+def legacy_load_uni_info(info_path: Path, merged_path: Path) -> pd.DataFrame:
+    info_df = etl.prefer_base_cols(etl.read_csv_safe(info_path))
+    merged_df = etl.prefer_base_cols(etl.read_csv_safe(merged_path)).rename(
+        columns={
+            "instnm": "inst_name",
+            "city": "inst_city",
+            "stabbr": "inst_state",
+            "insturl": "inst_url",
+            "admurl": "adm_url"
+        }
+    )
+    merged_subset = merged_df[
+        [c for c in ["unitid", "inst_name", "inst_city", "inst_state", "inst_url", "adm_url"] if c in merged_df.columns]
+    ].drop_duplicates("unitid", keep="last")
+    combined = info_df.merge(merged_subset, on="unitid", how="left", suffixes=("", "_merged"))
+
+    def choose(row, *cols):
+        for col in cols:
+            if col not in row:
+                continue
+            val = row[col]
+            if pd.isna(val):
+                continue
+            if isinstance(val, str):
+                val = val.strip()
+                if not val:
+                    continue
+            return val
+        return None
+
+    records = []
+    for _, row in combined.iterrows():
+        unitid = row.get("unitid")
+        if pd.isna(unitid):
+            continue
+        records.append({field: choose(row, *cols) for field, cols in etl.UNI_INFO_SOURCES.items()})
+
+    out = pd.DataFrame(records)
+    out = out[out["unitid"].notna()].copy()
+    out["unitid"] = out["unitid"].astype(int)
+    out["control"] = out["control"].map(etl.simplify_control)
+    out["level"] = out["level"].map(etl.simplify_level)
+    return out
+
+
+def legacy_derive_requirements_2023(df23: pd.DataFrame) -> pd.DataFrame:
+    present = [f for f in etl.REQUIREMENT_FIELDS if f in df23.columns]
+    rows = []
+    for _, record in df23[["unitid"] + present].iterrows():
+        buckets = {"required": [], "considered": [], "not_considered": []}
+        for field in present:
+            b = etl.requirement_bucket(record[field])
+            if not b:
+                continue
+            label = field.replace("_", " ").title()
+            buckets[b].append(label)
+
+        tests_label = "Admission Test Scores"
+        if tests_label in buckets["required"]:
+            policy = "Required"
+        elif tests_label in buckets["considered"]:
+            policy = "Test flexible"
+        else:
+            policy = "Test optional"
+
+        rows.append(
+            {
+                "unitid": int(record["unitid"]),
+                "required": sorted(buckets["required"]),
+                "considered": sorted(buckets["considered"]),
+                "not_considered": sorted(buckets["not_considered"]),
+                "test_policy": policy,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def legacy_derive_major_families(path: Path) -> Dict[int, List[str]]:
+    df = etl.prefer_base_cols(etl.read_csv_safe(path))
+    if "unitid" not in df.columns or "cipcode" not in df.columns:
+        return {}
+
+    df["cipcode"] = df["cipcode"].astype(str).str.strip()
+    df["family"] = df["cipcode"].apply(etl.cip_family)
+
+    count_col = None
+    for candidate in ["ctotalt", "ctotalb", "ctotalm"]:
+        if candidate in df.columns:
+            count_col = candidate
+            break
+
+    if count_col:
+        df[count_col] = pd.to_numeric(df[count_col], errors="coerce").fillna(0)
+
+    agg = defaultdict(dict)
+    for _, row in df.iterrows():
+        # pandas>=3 stores the None from cip_family as NaN (truthy) in a str column.
+        if not isinstance(row.get("family"), str):
+            continue
+        unit = int(row["unitid"])
+        weight = float(row[count_col]) if count_col else 1.0
+        agg[unit][row["family"]] = agg[unit].get(row["family"], 0.0) + weight
+
+    major_map: Dict[int, List[str]] = {}
+    for unitid, fams in agg.items():
+        sorted_fams = sorted(fams.items(), key=lambda x: x[1], reverse=True)
+        major_map[unitid] = [name for name, _ in sorted_fams[:4]]
+    return major_map
+
+
+def legacy_col(row: Dict[str, str], name: str) -> str:
+    target = majors._norm_col_name(name)
+    for k, v in row.items():
+        if majors._norm_col_name(k) == target:
+            return (v or "").strip()
+    return ""
+
+
+def legacy_build_majors(degrees_csv: str) -> Tuple[int, dict, dict]:
+    """The DictReader loop build_majors_from_ipeds.main() used before build_majors()."""
+    dialect = majors.sniff_dialect(degrees_csv)
+    titles: Tuple[Dict[str, str], ...] = ({}, {}, {})
+    per_inst: Tuple[Dict[int, Set[str]], ...] = (defaultdict(set), defaultdict(set), defaultdict(set))
+    rows = 0
+    with open(degrees_csv, "r", encoding="utf-8", errors="replace", newline="") as f:
+        for row in csv.DictReader(f, dialect=dialect):
+            rows += 1
+            uid_raw = legacy_col(row, "unitid") or legacy_col(row, "UnitID")
+            try:
+                unitid = int(uid_raw)
+            except Exception:
+                continue
+            cip_code = legacy_col(row, "CIP Code -  2020 Classification") or legacy_col(
+                row, "C2024_A.CIP Code -  2020 Classification"
+            )
+            if not cip_code:
+                continue
+            title = legacy_col(row, "CipTitle")
+            codes = majors.parse_cip(cip_code)
+            if not any(codes):
+                continue
+            for code, title_map, members in zip(codes, titles, per_inst):
+                if code and code not in title_map and title:
+                    title_map[code] = title
+                if code:
+                    members[unitid].add(code)
+
+    meta = {
+        key: dict(sorted(title_map.items()))
+        for key, title_map in zip(("two_digit", "four_digit", "six_digit"), titles)
+    }
+    unitids = sorted(set(per_inst[0]) | set(per_inst[1]) | set(per_inst[2]))
+    by_inst = {
+        str(uid): {
+            key: sorted(members.get(uid, set()))
+            for key, members in zip(("two_digit", "four_digit", "six_digit"), per_inst)
+        }
+        for uid in unitids
+    }
+    return rows, meta, by_inst
+
+
+def legacy_write_institution_details(
+    out_dir: Path,
+    institutions: pd.DataFrame,
+    metrics: pd.DataFrame,
+    tuition_long: pd.DataFrame,
+    requirements: pd.DataFrame,
+):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    metrics_dir = out_dir.parent / "metrics"
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+
+    metrics_group = {k: g.sort_values("year") for k, g in metrics.groupby("unitid")}
+    tuition_group = {k: g.sort_values("tuition_year") for k, g in tuition_long.groupby("unitid")}
+    req_map = {row["unitid"]: row for row in requirements.to_dict(orient="records")}
+
+    for inst in institutions.to_dict(orient="records"):
+        unitid = int(inst["unitid"])
+        profile = {
+            "unitid": unitid,
+            "name": inst.get("name"),
+            "city": inst.get("city"),
+            "state": inst.get("state"),
+            "control": inst.get("control"),
+            "level": inst.get("level"),
+            "carnegie_basic": inst.get("carnegie_basic"),
+            "website": inst.get("website"),
+            "admissions_url": inst.get("admissions_url"),
+            "test_policy": inst.get("test_policy"),
+            "major_families": inst.get("major_families", []),
+            "intl_enrollment_pct": inst.get("intl_enrollment_pct"),
+            "tuition_summary": {
+                "sticker": inst.get("tuition_2023_24"),
+                "in_state": inst.get("tuition_2023_24_in_state"),
+                "out_of_state": inst.get("tuition_2023_24_out_of_state"),
+            },
+            "outcomes": {
+                "acceptance_rate": inst.get("acceptance_rate"),
+                "yield": inst.get("yield"),
+                "grad_rate_6yr": inst.get("grad_rate_6yr"),
+                "retention_full_time": inst.get("full_time_retention_rate"),
+                "student_faculty_ratio": inst.get("student_to_faculty_ratio"),
+                "total_enrollment": inst.get("total_enrollment"),
+            },
+        }
+
+        req = req_map.get(unitid, {"required": [], "considered": [], "not_considered": [], "test_policy": "Test optional"})
+        detail_payload = {
+            "profile": profile,
+            "requirements": {
+                "required": req.get("required", []),
+                "considered": req.get("considered", []),
+                "not_considered": req.get("not_considered", []),
+                "test_policy": req.get("test_policy", "Test optional"),
+            },
+            "support_notes": {
+                "international_cost": None,
+                "scholarships": None,
+                "support_services": None,
+                "deadlines": None,
+            },
+        }
+        (out_dir / f"{unitid}.json").write_text(json.dumps(etl.scrub_json(detail_payload), indent=2), encoding="utf-8")
+
+        metrics_payload = {
+            "unitid": unitid,
+            "metrics": etl.to_records(metrics_group.get(unitid, pd.DataFrame())),
+            "tuition": etl.to_records(tuition_group.get(unitid, pd.DataFrame())),
+        }
+        (metrics_dir / f"{unitid}.json").write_text(json.dumps(metrics_payload, indent=2), encoding="utf-8")
+
+
+# ---------- synthetic inputs ----------
+CONTROLS = ["Public", "Private not-for-profit", "Private for-profit", "", None]
+LEVELS = ["Four or more years", "At least 2 but less than 4 years", "Less than 2 years (below associate)", None]
+CITIES = ["Chicago", "  Boston ", "Austin", "", None, "New York"]
+
+
+def _blank(rng: random.Random, value, p: float = 0.15):
+    return None if rng.random() < p else value
+
+
+def write_synthetic_uni_info(folder: Path, rows: int, seed: int = 7) -> Tuple[Path, Path]:
+    rng = random.Random(seed)
+    unitids = list(range(100000, 100000 + rows))
+    info = pd.DataFrame(
+        {
+            "UnitID": unitids,
+            "Institution Name": [_blank(rng, f"Institution {u}") for u in unitids],
+            "State abbreviation": [rng.choice(["AL", "CA", "NY", "TX", None]) for _ in unitids],
+            "Control of institution": [rng.choice(CONTROLS) for _ in unitids],
+            "Level of institution": [rng.choice(LEVELS) for _ in unitids],
+            "Carnegie Classification 2021: Basic": [_blank(rng, f"Basic {rng.randint(1, 30)}", 0.3) for _ in unitids],
+            "City location of institution": [rng.choice(CITIES) for _ in unitids],
+            "Institution's internet website address": [_blank(rng, f" www.u{u}.edu/ ", 0.2) for u in unitids],
+            "Admissions office web address": [_blank(rng, f"www.u{u}.edu/admit", 0.5) for u in unitids],
+        }
+    )
+    merged = pd.DataFrame(
+        {
+            "UNITID": unitids,
+            "INSTNM": [_blank(rng, f"Inst {u}", 0.05) for u in unitids],
+            "CITY": [rng.choice(CITIES) for _ in unitids],
+            "STABBR": [_blank(rng, rng.choice(["AL", "CA", "NY", "TX"]), 0.4) for _ in unitids],
+            "INSTURL": [_blank(rng, f"u{u}.edu", 0.3) for u in unitids],
+            "ADMURL": [_blank(rng, f"u{u}.edu/apply", 0.3) for u in unitids],
+        }
+    )
+    info_path = folder / "info.csv"
+    merged_path = folder / "merged.csv"
+    info.to_csv(info_path, index=False)
+    merged.to_csv(merged_path, index=False)
+    return info_path, merged_path
+
+
+REQUIREMENT_VALUES = [
+    "Required",
+    "Recommended",
+    "Considered but not required",
+    "Not considered",
+    "Required to be considered for admission",
+    "Not required for admission, but considered if submitted",
+    "Neither required nor recommended",
+    None,
+]
+
+
+def synthetic_admissions(rows: int, seed: int = 11, profiles: int = 40, noise: float = 0.05) -> pd.DataFrame:
+    # Real policies cluster: most schools follow one of a few dozen profiles with small deviations.
+    rng = random.Random(seed)
+    templates = [[rng.choice(REQUIREMENT_VALUES) for _ in etl.REQUIREMENT_FIELDS] for _ in range(profiles)]
+    picks = [rng.choice(templates) for _ in range(rows)]
+    data = {"unitid": list(range(100000, 100000 + rows))}
+    for i, field in enumerate(etl.REQUIREMENT_FIELDS):
+        data[field] = [rng.choice(REQUIREMENT_VALUES) if rng.random() < noise else t[i] for t in picks]
+    return pd.DataFrame(data)
+
+
+def write_synthetic_degrees(folder: Path, institutions: int, seed: int = 13) -> Path:
+    # Roughly 40 program rows per institution, as in the IPEDS completions file.
+    rng = random.Random(seed)
+    roots = list(etl.CIP_FAMILY_MAP) + ["99", "32"]
+    rows = []
+    for unitid in range(100000, 100000 + institutions):
+        for _ in range(rng.randint(5, 75)):
+            code = f"{rng.choice(roots)}.{rng.randint(0, 9999):04d}"
+            rows.append((unitid, rng.choice([code, code.lstrip("0"), code]), rng.choice([0, 1, 2, 5, 10, 40, None])))
+    path = folder / "degrees.csv"
+    pd.DataFrame(rows, columns=["UNITID", "CIPCODE", "CTOTALT"]).to_csv(path, index=False)
+    return path
+
+
+def write_synthetic_ipeds_degrees(folder: Path, rows: int, seed: int = 17) -> Path:
+    """An IPEDS Data Center style export: prefixed headers, ~30 columns, quoted CIP codes."""
+    rng = random.Random(seed)
+    extra = [f"C2024_A.Awards {kind} {sex}" for kind in ("first major", "second major", "total") for sex in ("men", "women", "total")]
+    extra += [f"DRVC2024.Race {i}" for i in range(18)]
+    header = ["unitid", "institution name", "year", "C2024_A.CIP Code -  2020 Classification", "CipTitle"] + extra
+    cips = [(f"{rng.randint(1, 54):02d}.{rng.randint(0, 9999):04d}", f"Program {i}") for i in range(1500)]
+    cips += [(f"{rng.randint(1, 54):02d}", "Family"), (f"{rng.randint(1, 54)}.{rng.randint(0, 99):02d}", "Series")]
+    path = folder / "ipeds_degrees.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            unitid = 100000 + i // 40
+            code, title = rng.choice(cips)
+            code = rng.choice([code, f"'{code}'", f" {code} "])
+            uid = rng.choice([str(unitid)] * 50 + ["", "n/a"])
+            writer.writerow([uid, f"Institution {unitid}", "2024", code, rng.choice([title, title, ""])] + [rng.randint(0, 50) for _ in extra])
+    return path
+
+
+def major_map_text(major_map: Dict[int, List[str]]) -> str:
+    return json.dumps(sorted(major_map.items()))
+
+
+def frames_from_published(data_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Rebuild write_institution_details inputs from an existing public/data/University_data tree."""
+    institutions, requirements, metrics, tuition = [], [], [], []
+    for path in sorted((data_dir / "institutions").glob("*.json")):
+        detail = json.loads(path.read_text(encoding="utf-8"))
+        profile = detail["profile"]
+        institutions.append(
+            {
+                **{k: v for k, v in profile.items() if k not in ("tuition_summary", "outcomes")},
+                "tuition_2023_24": profile["tuition_summary"]["sticker"],
+                "tuition_2023_24_in_state": profile["tuition_summary"]["in_state"],
+                "tuition_2023_24_out_of_state": profile["tuition_summary"]["out_of_state"],
+                "acceptance_rate": profile["outcomes"]["acceptance_rate"],
+                "yield": profile["outcomes"]["yield"],
+                "grad_rate_6yr": profile["outcomes"]["grad_rate_6yr"],
+                "full_time_retention_rate": profile["outcomes"]["retention_full_time"],
+                "student_to_faculty_ratio": profile["outcomes"]["student_faculty_ratio"],
+                "total_enrollment": profile["outcomes"]["total_enrollment"],
+            }
+        )
+        requirements.append({"unitid": profile["unitid"], **detail["requirements"]})
+        side = json.loads((data_dir / "metrics" / path.name).read_text(encoding="utf-8"))
+        metrics.extend(side["metrics"])
+        tuition.extend(side["tuition"])
+
+    inst_df = pd.DataFrame(institutions)
+    for col in ["acceptance_rate", "yield", "grad_rate_6yr", "intl_enrollment_pct", "full_time_retention_rate",
+                "student_to_faculty_ratio", "total_enrollment"]:
+        inst_df[col] = pd.to_numeric(inst_df[col], errors="coerce").astype("Int64")
+    return inst_df, pd.DataFrame(metrics), pd.DataFrame(tuition), pd.DataFrame(requirements)
+
+
+def tree_bytes(folder: Path) -> Dict[str, bytes]:
+    return {
+        str(p.relative_to(folder)): p.read_bytes()
+        for p in sorted(folder.rglob("*.json"))
+        if p.name != etl.DETAIL_MANIFEST
+    }
+
+
+def compare_writers(data_dir: Path, workers: int) -> List[str]:
+    frames = frames_from_published(data_dir)
+    failures = check_columnar_roundtrip(frames[1])
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _, t_old = timed(legacy_write_institution_details, root / "legacy" / "institutions", *frames)
+        expected = tree_bytes(root / "legacy")
+        for n in sorted({1, workers}):
+            label = f"write_institution_details (workers={n})"
+            _, t_new = timed(etl.write_institution_details, root / f"w{n}" / "institutions", *frames, n)
+            same = tree_bytes(root / f"w{n}") == expected
+            print(f"{label:<40} legacy {t_old:8.3f}s  current {t_new:8.3f}s  x{t_old / t_new:6.1f}  identical={same}")
+            if not same:
+                failures.append(label)
+    return failures
+
+
+def compare_load_bundle(data_dir: Path) -> List[str]:
+    """
+    The load bundle must hold exactly the rows load_to_postgres would otherwise parse
+    from institutions.json, metrics_by_year.json and the per-institution detail files.
+    """
+    institutions, metrics, tuition, requirements = frames_from_published(data_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        etl.write_institution_details(root / "institutions", institutions, metrics, tuition, requirements)
+        counts, t_write = timed(etl.write_load_bundle, root / "load", institutions, metrics, requirements)
+
+        def from_files() -> Dict[str, list]:
+            req, notes = [], []
+            for path in (root / "institutions").glob("*.json"):
+                detail = json.loads(path.read_text(encoding="utf-8"))
+                unitid = int(detail["profile"]["unitid"])
+                req.append(schema.requirement_row(unitid, detail.get("requirements") or {}))
+                notes.extend(schema.support_note_rows(unitid, detail.get("support_notes") or {}))
+            return {"institution_requirements": req, "institution_support_notes": notes}
+
+        expected, t_files = timed(from_files)
+        expected["institutions"] = list(schema.table_rows("institutions", json.loads(etl.frame_json(institutions, False))))
+        expected["institution_metrics"] = list(
+            schema.table_rows("institution_metrics", json.loads(etl.frame_json(metrics, False)))
+        )
+        bundle, t_read = timed(lambda: {t: list(schema.read_load_table(root / "load", t)) for t in counts})
+        _, t_req = timed(lambda: list(schema.read_load_table(root / "load", "institution_requirements")))
+
+    def canonical(rows: list) -> str:
+        return json.dumps(sorted(json.dumps(r) for r in rows))
+
+    failures = []
+    for table, rows in bundle.items():
+        same = canonical(rows) == canonical(expected[table])
+        print(f"  load bundle {table:<28} rows {len(rows):>8,}  identical={same}")
+        if not same:
+            failures.append(f"load bundle {table}")
+    print(
+        f"{'load bundle':<40} write {t_write:8.3f}s  read all tables {t_read:8.3f}s"
+        f"  requirements: bundle {t_req:.3f}s vs"
+        f" {len(expected['institution_requirements']):,} detail files {t_files:.3f}s"
+    )
+    return failures
+
+
+LEGACY_EXPORT_COLUMNS = [
+    "unitid",
+    "name",
+    "city",
+    "state",
+    "control",
+    "level",
+    "carnegie_basic",
+    "acceptance_rate",
+    "yield",
+    "tuition_2023_24",
+    "tuition_2023_24_in_state",
+    "tuition_2023_24_out_of_state",
+    "grad_rate_6yr",
+    "intl_enrollment_pct",
+    "full_time_retention_rate",
+    "student_to_faculty_ratio",
+    "total_enrollment",
+    "website",
+    "admissions_url",
+    "financial_aid_url",
+    "application_url",
+    "test_policy",
+    "major_families",
+]
+
+
+def legacy_sql_literal(value) -> str:
+    """export_institutions_sql.sql_literal as it was before the export formats were added."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list):
+        inner = ", ".join(legacy_sql_literal(v) for v in value)
+        return f"ARRAY[{inner}]"
+    s = str(value).replace("'", "''")
+    return f"'{s}'"
+
+
+def legacy_export_sql(records: List[dict]) -> List[str]:
+    """The original export_institutions_sql.main() row loop: one INSERT per record, unfiltered."""
+    cols_sql = ", ".join(LEGACY_EXPORT_COLUMNS)
+    lines = ["-- INSERTs for public.institutions, generated locally"]
+    for d in records:
+        values = [d.get(c) for c in LEGACY_EXPORT_COLUMNS[:-1]] + [d.get("major_families") or []]
+        values_sql = ", ".join(legacy_sql_literal(v) for v in values)
+        lines.append(f"INSERT INTO public.institutions ({cols_sql}) VALUES ({values_sql});")
+    return lines
+
+
+def untyped_arrays(line: str) -> str:
+    """Undo the ``text[]`` casts the export now writes, giving the legacy array literals."""
+    return line.replace("'{}'::text[]", "ARRAY[]").replace("]::text[]", "]")
+
+
+def check_sql_export(data_dir: Path) -> List[str]:
+    """
+    Size of every export format for the real institutions. The insert output must match
+    the legacy row loop except for the two documented changes: arrays carry a ``text[]``
+    cast, and records whose unitid is not an integer are dropped instead of emitted.
+    """
+    institutions = frames_from_published(data_dir)[0]
+    records = json.loads(etl.frame_json(institutions, False))
+    legacy = legacy_export_sql(records)
+    current = list(sql_export.export_lines(records))
+    failures = []
+
+    def integer_unitid(record: dict) -> bool:
+        try:
+            int(record.get("unitid"))
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    kept = [line for record, line in zip(records, legacy[1:]) if integer_unitid(record)]
+    byte_identical = current == legacy
+    typed = sum(line != untyped_arrays(line) for line in current[1:])
+    same = current[0] == legacy[0] and [untyped_arrays(line) for line in current[1:]] == kept
+    print(
+        f"  sql export insert vs legacy: byte-identical={byte_identical}  rows {len(current) - 1:,}"
+        f" of {len(legacy) - 1:,} (dropped {len(legacy) - len(kept) - 1:,} without an integer unitid)"
+        f"  typed array literals {typed:,}  identical apart from those={same}"
+    )
+    if not same:
+        failures.append("sql export insert")
+    for fmt in sql_export.EXPORT_FORMATS:
+        for upsert in (False, True):
+            text, t_export = timed(lambda: "\n".join(sql_export.export_lines(records, fmt, upsert=upsert)))
+            statements = text.count("\nINSERT INTO")
+            print(
+                f"  sql export {fmt + (' upsert' if upsert else ''):<20} {len(text.encode('utf-8')):>12,} bytes"
+                f"  {statements:>6,} INSERTs  {t_export:.2f}s"
+            )
+    return failures
+
+
+def check_columnar_roundtrip(metrics: pd.DataFrame) -> List[str]:
+    """metrics_by_year.bin must decode to exactly the rows of metrics_by_year.json."""
+    text = etl.frame_json(metrics, pretty=True)
+    data = etl.frame_columnar(metrics)
+    expected, t_json = timed(json.loads, text, repeat=3)
+    decoded, t_bin = timed(columnar.decode_columnar, data, repeat=3)
+    key = lambda r: (r["unitid"], r["year"])  # noqa: E731
+    same = sorted(expected, key=key) == columnar.columnar_records(decoded)
+    print(
+        f"{'metrics_by_year columnar round trip':<40} json {len(text):,} B parse {t_json * 1e3:.1f}ms"
+        f"  bin {len(data):,} B decode {t_bin * 1e3:.2f}ms  identical={same}"
+    )
+    return [] if same else ["metrics_by_year columnar round trip"]
+
+
+SEARCH_QUERIES = [
+    "harvard",
+    "university of chicago",
+    "chicago",
+    "state univ",
+    "new york",
+    "texas a",
+    "cal poly",
+    "community college",
+    "saint mary",
+    "tech",
+    "bayamon",
+    "university",
+    "univ",
+]
+
+
+def compare_search_index(data_dir: Path) -> List[str]:
+    """Index size/shard count vs. the first-letter slices, and shard results vs. a full scan."""
+    index_df = pd.read_json(data_dir / "institutions_index.json")
+    slices = {p.stem: p.stat().st_size for p in (data_dir / "indexes").glob("*.json") if p.stem != "manifest"}
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp)
+        (manifest, _), t_build = timed(search_index.write_search_index, index_df, out, "compact")
+        sizes = {key: meta["bytes"] for key, meta in manifest["shards"].items()}
+        print(
+            f"{'search index build':<40} {t_build:.2f}s  {len(sizes)} shards, {sum(sizes.values()):,} B total,"
+            f" largest {max(sizes.values()):,} B  (letter slices: {len(slices)} files, {sum(slices.values()):,} B total,"
+            f" largest {max(slices.values()):,} B pretty)"
+        )
+        docs = search_index.index_docs(index_df)
+        print(f"  common tokens (not posted): {manifest['common']}")
+        for query in SEARCH_QUERIES:
+            index = search_index.SearchIndex(out)
+            hits, t_query = timed(index.search, query)
+            expected = search_index.brute_force_search(docs, query)
+            fetched = sum(sizes[k] for k in index.shards_loaded)
+            letter = search_index.normalize(query)[:1]
+            same = hits == expected
+            print(
+                f"  {query!r:<26} {len(hits):>2} hits  {t_query * 1e3:6.1f}ms  fetched {fetched:>7,} B"
+                f" (letter slice {slices.get(letter, 0):>7,} B)  top={hits[0]['name'] if hits else '-'!r}  matches_scan={same}"
+            )
+            if not same:
+                failures.append(f"search {query!r}")
+    return failures
+
+
+ESSAY_QUERIES = ["community", "grandmother kitchen", "yale", "music science", "zzzz-nothing"]
+
+
+def check_essay_corpus(essays_path: Path) -> List[str]:
+    """Corpus listings, lookups and search vs. scans of the flat essay array."""
+    essays = json.loads(essays_path.read_text(encoding="utf-8"))
+    full = essays_path.stat().st_size
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp)
+        meta, t_build = timed(essay_corpus.write_corpus, essays, out, "compact")
+        sizes = {str(p.relative_to(out)): p.stat().st_size for p in out.rglob("*.json")}
+        print(
+            f"{'essay corpus build':<40} {t_build:.2f}s  {meta['count']} essays, {len(meta['shards'])} shards,"
+            f" meta.json {sizes['meta.json']:,} B  (flat file {full:,} B)"
+        )
+        by_id = {e["essay_id"]: e for e in essays}
+        filters = [(None, None, None)]
+        filters += [(e.get("school"), None, None) for e in essays[:1]]
+        filters += [(None, t, None) for t in sorted({str(e.get("type")) for e in essays})]
+        filters += [(None, None, y) for y in sorted({e.get("year") for e in essays if e.get("year") is not None})]
+        for school, essay_type, year in filters:
+            corpus = essay_corpus.EssayCorpus(out)
+            got = corpus.essays(school, essay_type, year)
+            want = sorted(
+                (
+                    e
+                    for e in essays
+                    if (school is None or e.get("school") == school)
+                    and (essay_type is None or essay_corpus.slug(e.get("type")) == essay_corpus.slug(essay_type))
+                    and (year is None or e.get("year") == year)
+                ),
+                key=lambda e: e["essay_id"],
+            )
+            fetched = sum(sizes[f] for f in corpus.files_loaded)
+            same = got == want
+            label = f"school={school} type={essay_type} year={year}"
+            print(f"  {label:<48} {len(got):>4} essays  fetched {fetched:>8,} B + meta  matches_scan={same}")
+            if not same:
+                failures.append(f"essays {label}")
+        corpus = essay_corpus.EssayCorpus(out)
+        if any(corpus.essay(essay_id) != essay for essay_id, essay in by_id.items()):
+            failures.append("essay lookup")
+        for query in ESSAY_QUERIES:
+            corpus = essay_corpus.EssayCorpus(out)
+            hits, t_query = timed(corpus.search, query)
+            expected = essay_corpus.brute_force_search(essays, query)
+            fetched = sum(sizes[f] for f in corpus.files_loaded)
+            same = [(h["essay_id"], h["score"]) for h in hits] == expected
+            print(
+                f"  {query!r:<26} {len(hits):>2} hits  {t_query * 1e3:6.1f}ms  fetched {fetched:>7,} B + meta"
+                f"  top={hits[0]['essay_id'] if hits else '-'}  matches_scan={same}"
+            )
+            if not same:
+                failures.append(f"essay search {query!r}")
+    return failures
+
+
+# ---------- harness ----------
+def timed(fn: Callable, *args, repeat: int = 1):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def compare(label: str, legacy: Callable, current: Callable, args: tuple, to_text: Callable = None) -> List[str]:
+    to_text = to_text or (lambda df: df.to_json(orient="records"))
+    old, t_old = timed(legacy, *args)
+    new, t_new = timed(current, *args)
+    same = to_text(old) == to_text(new)
+    speedup = t_old / t_new if t_new else float("inf")
+    print(f"{label:<40} legacy {t_old:8.3f}s  current {t_new:8.3f}s  x{speedup:6.1f}  identical={same}")
+    return [] if same else [label]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--src", help="Folder with the real IPEDS CSVs (same layout as etl_admissions --src)")
+    ap.add_argument("--rows", type=int, default=100_000, help="Synthetic row count")
+    ap.add_argument(
+        "--published",
+        default=str(Path(__file__).resolve().parents[1] / "public" / "data" / "University_data"),
+        help="Existing output tree used to benchmark the detail-file writer",
+    )
+    ap.add_argument("--degrees-csv", help="IPEDS degrees CSV for build_majors_from_ipeds (as its --degrees_csv)")
+    ap.add_argument(
+        "--essays",
+        default=str(essay_corpus.ESSAYS_JSON),
+        help="Anonymous_Essays.json used to check the essay corpus build",
+    )
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Workers for the parallel writer")
+    args = ap.parse_args()
+
+    failures: List[str] = []
+    if args.src:
+        src = Path(args.src)
+        failures += compare(
+            "load_uni_info (real)",
+            legacy_load_uni_info,
+            etl.load_uni_info,
+            (src / "2023_uni_information.csv", src / "MERGED2022_23_PP.csv"),
+        )
+        df23 = etl.prefer_base_cols(etl.read_csv_safe(src / "2023_Admissions_Enrollment_Graduation.csv"))
+        failures += compare("derive_requirements_2023 (real)", legacy_derive_requirements_2023, etl.derive_requirements_2023, (df23,))
+        failures += compare(
+            "derive_major_families (real)",
+            legacy_derive_major_families,
+            etl.derive_major_families,
+            (src / "2023 - degree offerings coded.csv",),
+            major_map_text,
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        info_path, merged_path = write_synthetic_uni_info(folder, args.rows)
+        failures += compare(f"load_uni_info (synthetic {args.rows:,})", legacy_load_uni_info, etl.load_uni_info, (info_path, merged_path))
+        degrees_path = write_synthetic_degrees(folder, args.rows // 10)
+        failures += compare(
+            f"derive_major_families (synthetic {args.rows // 10:,} inst)",
+            legacy_derive_major_families,
+            etl.derive_major_families,
+            (degrees_path,),
+            major_map_text,
+        )
+        ipeds_path = write_synthetic_ipeds_degrees(folder, args.rows * 2)
+        failures += compare(
+            f"build_majors (synthetic {args.rows * 2:,})",
+            legacy_build_majors,
+            majors.build_majors,
+            (str(ipeds_path),),
+            json.dumps,
+        )
+
+    if args.degrees_csv:
+        failures += compare("build_majors (real)", legacy_build_majors, majors.build_majors, (args.degrees_csv,), json.dumps)
+
+    admissions = synthetic_admissions(args.rows)
+    failures += compare(
+        f"derive_requirements_2023 (synthetic {args.rows:,})",
+        legacy_derive_requirements_2023,
+        etl.derive_requirements_2023,
+        (admissions,),
+    )
+
+    published = Path(args.published)
+    if (published / "institutions_index.json").is_file():
+        failures += compare_search_index(published)
+    if (published / "institutions").is_dir():
+        failures += compare_writers(published, args.workers)
+        failures += compare_load_bundle(published)
+        failures += check_sql_export(published)
+    if Path(args.essays).is_file():
+        failures += check_essay_corpus(Path(args.essays))
+
+    if failures:
+        print("Output mismatch: " + ", ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
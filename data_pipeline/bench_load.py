@@ -0,0 +1,98 @@
+"""
+Time load_to_postgres --mode batch against --mode copy on a scratch Postgres.
+
+    python data_pipeline/bench_load.py --database-url postgresql://localhost/admissions_scratch [--jobs 4]
+
+Each mode starts from empty tables (TRUNCATE ... CASCADE, so never point this at the
+Supabase database), loads everything, then reloads it with --full-reload (the conflict
+path) and once more diff-aware (nothing to send), both serially and with --jobs
+concurrent connections. Table contents are fingerprinted after every run and the
+script exits 1 if any run leaves different data.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_to_postgres as loader  # noqa: E402
+
+TABLES = (
+  "institutions",
+  "institution_locations",
+  "institution_metrics",
+  "majors_meta",
+  "institution_majors",
+  "institution_requirements",
+  "institution_support_notes",
+)
+
+
+def fingerprint(conn) -> Dict[str, Tuple[int, str]]:
+  out = {}
+  with conn.cursor() as cur:
+    for table in TABLES:
+      cur.execute(
+        f"SELECT count(*), coalesce(md5(string_agg(t::text, E'\\n' ORDER BY t::text)), '') "
+        f"FROM public.{table} t"
+      )
+      out[table] = cur.fetchone()
+  conn.commit()
+  return out
+
+
+def truncate(conn) -> None:
+  with conn.cursor() as cur:
+    cur.execute("TRUNCATE " + ", ".join(f"public.{t}" for t in TABLES) + " CASCADE;")
+  conn.commit()
+
+
+def timed_load(pool: ThreadedConnectionPool, mode: str, jobs: int, diff: bool = True) -> float:
+  start = time.perf_counter()
+  loader.run_loaders(pool, mode, jobs, diff)
+  return time.perf_counter() - start
+
+
+def main() -> int:
+  ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  ap.add_argument("--database-url", required=True, help="Scratch database; its tables are truncated")
+  ap.add_argument("--jobs", type=int, default=4, help="Concurrent loader connections, as load_to_postgres --jobs")
+  args = ap.parse_args()
+
+  conn = psycopg2.connect(args.database_url)
+  pool = ThreadedConnectionPool(1, max(1, args.jobs), args.database_url)
+  try:
+    loader.create_tables(conn)
+    results = {}
+    for mode in loader.LOAD_MODES:
+      for jobs in sorted({1, args.jobs}):
+        truncate(conn)
+        t_fresh = timed_load(pool, mode, jobs)
+        t_full = timed_load(pool, mode, jobs, diff=False)
+        t_diff = timed_load(pool, mode, jobs)
+        results[(mode, jobs)] = fingerprint(conn)
+        print(
+          f"{mode:<6} jobs={jobs:<3} empty tables {t_fresh:8.2f}s   full reload {t_full:8.2f}s"
+          f"   diff reload (nothing changed) {t_diff:8.2f}s"
+        )
+  finally:
+    pool.closeall()
+    conn.close()
+
+  reference = results[("batch", 1)]
+  for table in TABLES:
+    same = all(r[table] == reference[table] for r in results.values())
+    print(f"  {table:<28} rows {reference[table][0]:>9,}  identical={same}")
+  if any(r != reference for r in results.values()):
+    print("Output mismatch between load modes")
+    return 1
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
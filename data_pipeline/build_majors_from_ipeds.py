@@ -1,11 +1,15 @@
 import argparse
 import csv
-import json
 import os
 import re
 import sys
 from collections import defaultdict
-from typing import Dict, Set, Tuple
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+from artifacts import SizeReport, add_output_format_arg, json_text, write_json_artifact
+from schema import institution_majors_rows, majors_meta_rows, write_load_table
 
 
 def sniff_dialect(path: str):
@@ -24,11 +28,39 @@ def _norm_col_name(name: str) -> str:
   return s
 
 
-def col(row: Dict[str, str], name: str) -> str:
-  target = _norm_col_name(name)
-  for k, v in row.items():
-    if _norm_col_name(k) == target:
-      return (v or "").strip()
+# Candidate headers per field, in fallback order (matched after _norm_col_name).
+UNITID_COLUMNS = ("unitid", "UnitID")
+CIP_COLUMNS = ("CIP Code -  2020 Classification", "C2024_A.CIP Code -  2020 Classification")
+TITLE_COLUMNS = ("CipTitle",)
+
+
+def resolve_columns(header: Sequence[str], names: Sequence[str]) -> Tuple[int, ...]:
+  """
+  Resolve ``names`` to header positions once, so rows can be read as plain lists.
+  For each name the first header that normalizes to the same string wins; a header
+  that is repeated verbatim refers to its last column, as with csv.DictReader.
+  """
+  last: Dict[str, int] = {}
+  for i, h in enumerate(header):
+    last[h] = i
+  normalized = [(_norm_col_name(h), i) for h, i in last.items()]
+  positions: List[int] = []
+  for name in names:
+    target = _norm_col_name(name)
+    for norm, i in normalized:
+      if norm == target:
+        positions.append(i)
+        break
+  return tuple(positions)
+
+
+def field(row: Sequence[str], positions: Tuple[int, ...]) -> str:
+  """First non-empty stripped value among ``positions``; missing cells count as empty."""
+  for i in positions:
+    if i < len(row):
+      v = row[i].strip()
+      if v:
+        return v
   return ""
 
 
@@ -58,23 +90,13 @@ def parse_cip(code_raw: str) -> Tuple[str, str, str]:
   return head, four, six
 
 
-def main() -> int:
-  ap = argparse.ArgumentParser()
-  ap.add_argument(
-    "--degrees_csv",
-    default=os.path.join("public", "data", "institutions_degrees_bachelor.csv"),
-  )
-  ap.add_argument(
-    "--out_meta",
-    default=os.path.join("public", "data", "majors_bachelor_meta.json"),
-  )
-  ap.add_argument(
-    "--out_by_inst",
-    default=os.path.join("public", "data", "majors_bachelor_by_institution.json"),
-  )
-  args = ap.parse_args()
-
-  dialect = sniff_dialect(args.degrees_csv)
+def build_majors(degrees_csv: str) -> Tuple[int, dict, dict]:
+  """
+  Stream the degrees CSV and return (rows processed, meta, per-institution map).
+  The header is resolved to column positions once and parsed CIP codes are cached
+  (and interned), so each row costs a few list lookups.
+  """
+  dialect = sniff_dialect(degrees_csv)
 
   # Global CIP title maps
   two_titles: Dict[str, str] = {}
@@ -86,25 +108,33 @@ def main() -> int:
   per_inst_four: Dict[int, Set[str]] = defaultdict(set)
   per_inst_six: Dict[int, Set[str]] = defaultdict(set)
 
+  parsed: Dict[str, Tuple[str, str, str]] = {}
   rows = 0
-  with open(args.degrees_csv, "r", encoding="utf-8", errors="replace", newline="") as f:
-    reader = csv.DictReader(f, dialect=dialect)
+  with open(degrees_csv, "r", encoding="utf-8", errors="replace", newline="") as f:
+    reader = csv.reader(f, dialect=dialect)
+    header = next(reader, [])
+    uid_cols = resolve_columns(header, UNITID_COLUMNS)
+    cip_cols = resolve_columns(header, CIP_COLUMNS)
+    title_cols = resolve_columns(header, TITLE_COLUMNS)
     for row in reader:
+      if not row:
+        continue
       rows += 1
-      uid_raw = col(row, "unitid") or col(row, "UnitID")
+      uid_raw = field(row, uid_cols)
       try:
         unitid = int(uid_raw)
       except Exception:
         continue
 
-      cip_code = col(row, "CIP Code -  2020 Classification") or col(
-        row, "C2024_A.CIP Code -  2020 Classification"
-      )
+      cip_code = field(row, cip_cols)
       if not cip_code:
         continue
-      title = col(row, "CipTitle")
+      title = field(row, title_cols)
 
-      two, four, six = parse_cip(cip_code)
+      codes = parsed.get(cip_code)
+      if codes is None:
+        codes = parsed[cip_code] = tuple(sys.intern(c) for c in parse_cip(cip_code))
+      two, four, six = codes
       if not (two or four or six):
         continue
 
@@ -123,23 +153,12 @@ def main() -> int:
       if six:
         per_inst_six[unitid].add(six)
 
-  print(f"Processed rows: {rows}")
-  print(f"Unique 2-digit CIP: {len(two_titles)}")
-  print(f"Unique 4-digit CIP: {len(four_titles)}")
-  print(f"Unique 6-digit CIP: {len(six_titles)}")
-
-  # Write meta
   meta = {
     "two_digit": dict(sorted(two_titles.items(), key=lambda kv: kv[0])),
     "four_digit": dict(sorted(four_titles.items(), key=lambda kv: kv[0])),
     "six_digit": dict(sorted(six_titles.items(), key=lambda kv: kv[0])),
   }
-  os.makedirs(os.path.dirname(args.out_meta), exist_ok=True)
-  with open(args.out_meta, "w", encoding="utf-8") as f:
-    json.dump(meta, f, indent=2, ensure_ascii=False)
-  print(f"Wrote meta: {args.out_meta}")
 
-  # Write per-institution map
   by_inst_out = {}
   all_unitids = sorted(
     set(per_inst_two.keys()) | set(per_inst_four.keys()) | set(per_inst_six.keys())
@@ -150,15 +169,54 @@ def main() -> int:
       "four_digit": sorted(per_inst_four.get(uid, set())),
       "six_digit": sorted(per_inst_six.get(uid, set())),
     }
+  return rows, meta, by_inst_out
 
-  os.makedirs(os.path.dirname(args.out_by_inst), exist_ok=True)
-  with open(args.out_by_inst, "w", encoding="utf-8") as f:
-    json.dump(by_inst_out, f, indent=2, ensure_ascii=False)
+
+def main() -> int:
+  ap = argparse.ArgumentParser()
+  ap.add_argument(
+    "--degrees_csv",
+    default=os.path.join("public", "data", "institutions_degrees_bachelor.csv"),
+  )
+  ap.add_argument(
+    "--out_meta",
+    default=os.path.join("public", "data", "majors_bachelor_meta.json"),
+  )
+  ap.add_argument(
+    "--out_by_inst",
+    default=os.path.join("public", "data", "majors_bachelor_by_institution.json"),
+  )
+  ap.add_argument(
+    "--load_dir",
+    default=os.path.join("public", "data", "load"),
+    help="Where to write the majors_meta / institution_majors load bundle for load_to_postgres.py",
+  )
+  add_output_format_arg(ap)
+  args = ap.parse_args()
+  report = SizeReport()
+
+  rows, meta, by_inst_out = build_majors(args.degrees_csv)
+
+  print(f"Processed rows: {rows}")
+  print(f"Unique 2-digit CIP: {len(meta['two_digit'])}")
+  print(f"Unique 4-digit CIP: {len(meta['four_digit'])}")
+  print(f"Unique 6-digit CIP: {len(meta['six_digit'])}")
+
+  # Write meta
+  write_json_artifact(Path(args.out_meta), partial(json_text, meta), args.output_format, report)
+  print(f"Wrote meta: {args.out_meta}")
+
+  # Write per-institution map
+  write_json_artifact(Path(args.out_by_inst), partial(json_text, by_inst_out), args.output_format, report)
   print(f"Wrote per-institution majors: {args.out_by_inst}")
 
+  meta_rows = write_load_table(Path(args.load_dir), "majors_meta", majors_meta_rows(meta))
+  major_rows = write_load_table(Path(args.load_dir), "institution_majors", institution_majors_rows(by_inst_out))
+  print(f"Wrote load bundle: majors_meta {meta_rows:,} rows, institution_majors {major_rows:,} rows in {args.load_dir}")
+  report.print()
+
   return 0
 
 
 if __name__ == "__main__":
   sys.exit(main())
-
@@ -0,0 +1,121 @@
+"""
+Columnar binary encoding for numeric tables such as metrics_by_year.
+
+File layout (all integers little-endian):
+
+    b"COLS" | uint32 header_length | header JSON (space-padded) | column buffers
+
+Every column buffer starts on an 8-byte boundary, so a browser can wrap it
+directly in an ``Int32Array`` / ``Float32Array`` / ``Float64Array`` without
+copying. The header lists, per column, its ``name``, ``dtype`` and byte
+``offset``; every column holds ``rows`` values. Key columns are int32 and
+the rows are sorted by them; other columns are float32 when that is exact
+for every value and float64 otherwise, with nulls stored as NaN.
+"""
+import json
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"COLS"
+VERSION = 1
+ALIGN = 8
+DTYPES = {"int32": "<i4", "float32": "<f4", "float64": "<f8"}
+
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+def _value_dtype(values: np.ndarray) -> str:
+    finite = values[~np.isnan(values)]
+    if np.array_equal(finite.astype(np.float32).astype(np.float64), finite):
+        return "float32"
+    return "float64"
+
+
+def encode_columnar(df: pd.DataFrame, keys: Sequence[str] = ("unitid", "year")) -> bytes:
+    """Encode a numeric frame; ``keys`` become sorted int32 columns and must be non-null."""
+    ordered = df.sort_values(list(keys), kind="stable")
+    columns: List[dict] = []
+    buffers: List[bytes] = []
+    for name in ordered.columns:
+        if name in keys:
+            dtype = "int32"
+            values = ordered[name].astype(np.int64).to_numpy()
+            if values.size and (values.min() < np.iinfo(np.int32).min or values.max() > np.iinfo(np.int32).max):
+                raise ValueError(f"Key column {name!r} does not fit in int32")
+        else:
+            numeric = pd.to_numeric(ordered[name], errors="coerce").astype(float).to_numpy()
+            dtype = _value_dtype(numeric)
+            values = numeric
+        columns.append({"name": name, "dtype": dtype})
+        buffers.append(values.astype(DTYPES[dtype]).tobytes())
+
+    # Offsets depend on the header length, which depends on the offsets: reserve
+    # width for them first, then pad the header out to the reserved size.
+    header = {"version": VERSION, "rows": len(ordered), "keys": list(keys), "columns": columns}
+    for col in columns:
+        col["offset"] = 0
+    reserve = len(json.dumps(header).encode("utf-8")) + 16 * len(columns) + ALIGN
+    start = 8 + reserve + _pad(8 + reserve)
+    offset = start
+    for col, buf in zip(columns, buffers):
+        col["offset"] = offset
+        offset += len(buf) + _pad(len(buf))
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert len(header_bytes) <= start - 8, "columnar header outgrew its reserved space"
+    header_bytes += b" " * (start - 8 - len(header_bytes))
+
+    parts = [MAGIC, struct.pack("<I", len(header_bytes)), header_bytes]
+    for buf in buffers:
+        parts.append(buf)
+        parts.append(b"\0" * _pad(len(buf)))
+    return b"".join(parts)
+
+
+def decode_columnar(data: bytes) -> Dict[str, np.ndarray]:
+    if data[:4] != MAGIC:
+        raise ValueError("Not a columnar file (bad magic)")
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8 : 8 + header_len].decode("utf-8"))
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported columnar version {header.get('version')!r}")
+    rows = header["rows"]
+    return {
+        col["name"]: np.frombuffer(data, dtype=DTYPES[col["dtype"]], count=rows, offset=col["offset"])
+        for col in header["columns"]
+    }
+
+
+def read_columnar(path: Path) -> Dict[str, np.ndarray]:
+    return decode_columnar(Path(path).read_bytes())
+
+
+def columnar_records(columns: Dict[str, np.ndarray], unitid: Optional[int] = None) -> List[dict]:
+    """
+    Row dicts in the same shape as the JSON export (NaN -> None, whole numbers -> float
+    like pandas emits them). With ``unitid``, only that institution's rows are decoded,
+    found by binary search on the sorted key column.
+    """
+    lo, hi = 0, None
+    if unitid is not None:
+        ids = columns["unitid"]
+        lo = int(np.searchsorted(ids, unitid, side="left"))
+        hi = int(np.searchsorted(ids, unitid, side="right"))
+    sliced = {name: values[lo:hi] for name, values in columns.items()}
+    out: List[dict] = []
+    count = len(next(iter(sliced.values()))) if sliced else 0
+    for i in range(count):
+        rec = {}
+        for name, values in sliced.items():
+            v = values[i]
+            if values.dtype.kind == "i":
+                rec[name] = int(v)
+            else:
+                rec[name] = None if np.isnan(v) else float(v)
+        out.append(rec)
+    return out
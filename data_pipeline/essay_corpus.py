@@ -0,0 +1,293 @@
+"""
+Indexed essay corpus built from ``Applicant_Data/Anonymous_Essays.json``.
+
+The flat essay array is split so pages fetch only what they show:
+
+- ``meta.json``: one compact row per essay (no body) with the columns listed in
+  ``fields``, plus per-school/type counts, the shard list and the token count of
+  every essay (for ranking). Listing essays by school, year or type needs only this.
+- ``shards/<school>--<type>.json``: the full records of one school and essay type.
+- ``search/<prefix>.json``: the inverted index, ``{"tokens": {token: [[essay_id, tf], ...]}}``,
+  sharded by the first two characters of each token and listed in
+  ``search/manifest.json``. A keyword search loads one small file per query token.
+
+``EssayCorpus`` below is the reference reader: it lists, fetches and searches a written
+corpus while loading only the files a query needs.
+"""
+import argparse
+import json
+import math
+import re
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from artifacts import SizeReport, add_output_format_arg, json_text, remove_compressed_siblings, write_json_artifact
+from search_index import normalize
+
+VERSION = 1
+ROOT = Path(__file__).resolve().parents[1]
+ESSAYS_JSON = ROOT / "public" / "data" / "Applicant_Data" / "Anonymous_Essays.json"
+OUT_DIR = ROOT / "public" / "data" / "Applicant_Data" / "essays"
+PREFIX_LEN = 2
+META_FIELDS = ("essay_id", "school", "year", "type", "category", "question", "words", "shard")
+# BM25 parameters for search().
+K1 = 1.2
+B = 0.75
+STOPWORDS = frozenset(
+    """
+    a about after all also am an and any are as at be because been before being but by can could
+    did do does doing down during each few for from further had has have having he her here hers
+    him his how i if in into is it its just me more most my no nor not now of off on once only or
+    other our out over own same she should so some such than that the their them then there these
+    they this those through to too under until up very was we were what when where which while who
+    whom why will with would you your
+    """.split()
+)
+
+
+def tokens(text: Optional[str]) -> List[str]:
+    """Accent-folded, lower-cased words of two or more characters, without stopwords."""
+    return [t for t in normalize(text).split() if len(t) >= PREFIX_LEN and t not in STOPWORDS]
+
+
+def slug(value: Any) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", normalize(str(value or "unknown"))).strip("-") or "unknown"
+
+
+def shard_key(essay: Dict[str, Any]) -> str:
+    """Shard of an essay: its school and (case-folded) type."""
+    return f"{slug(essay.get('school'))}--{slug(essay.get('type'))}"
+
+
+# ---------- build ----------
+def build_corpus(essays: Sequence[Dict[str, Any]]) -> Tuple[dict, Dict[str, List[dict]], Dict[str, dict]]:
+    """Return (meta, shards, search shards) for the essay records."""
+    ordered = sorted((e for e in essays if e.get("essay_id") is not None), key=lambda e: e["essay_id"])
+    shards: Dict[str, List[dict]] = {}
+    rows: List[list] = []
+    lengths: Dict[str, int] = {}
+    postings: Dict[str, Dict[int, int]] = {}
+    schools: Dict[str, Dict[str, int]] = {}
+    for essay in ordered:
+        key = shard_key(essay)
+        shards.setdefault(key, []).append(essay)
+        body = tokens(essay.get("essay"))
+        rows.append(
+            [
+                essay["essay_id"],
+                essay.get("school"),
+                essay.get("year"),
+                essay.get("type"),
+                essay.get("category"),
+                essay.get("question") or None,
+                len(str(essay.get("essay") or "").split()),
+                key,
+            ]
+        )
+        # The prompt is searchable too; the body dominates the counts.
+        searchable = body + tokens(essay.get("question"))
+        lengths[str(essay["essay_id"])] = len(searchable)
+        for tok in searchable:
+            by_doc = postings.setdefault(tok, {})
+            by_doc[essay["essay_id"]] = by_doc.get(essay["essay_id"], 0) + 1
+        by_type = schools.setdefault(str(essay.get("school")), {})
+        by_type[str(essay.get("type"))] = by_type.get(str(essay.get("type")), 0) + 1
+
+    search: Dict[str, dict] = {}
+    for tok in sorted(postings):
+        shard = search.setdefault(tok[:PREFIX_LEN], {"prefix": tok[:PREFIX_LEN], "tokens": {}})
+        shard["tokens"][tok] = [[essay_id, tf] for essay_id, tf in sorted(postings[tok].items())]
+
+    meta = {
+        "version": VERSION,
+        "count": len(rows),
+        "fields": list(META_FIELDS),
+        "essays": rows,
+        "schools": {school: dict(sorted(types.items())) for school, types in sorted(schools.items())},
+        "shards": {key: len(items) for key, items in sorted(shards.items())},
+        "doc_tokens": lengths,
+        "avg_doc_tokens": (sum(lengths.values()) / len(lengths)) if lengths else 0.0,
+    }
+    return meta, shards, search
+
+
+def _write_dir(out_dir: Path, files: Dict[str, Any], output_format: str, report: Optional[SizeReport]) -> None:
+    """Write ``name -> payload`` into ``out_dir`` and remove stale JSON files there."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, payload in files.items():
+        write_json_artifact(out_dir / f"{name}.json", partial(json_text, payload), output_format, report)
+    keep = {f"{name}.json" for name in files}
+    for path in out_dir.glob("*.json"):
+        if path.name not in keep:
+            path.unlink()
+            remove_compressed_siblings(path)
+
+
+def write_corpus(
+    essays: Sequence[Dict[str, Any]],
+    out_dir: Path,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+) -> dict:
+    meta, shards, search = build_corpus(essays)
+    manifest = {
+        "version": VERSION,
+        "prefix_len": PREFIX_LEN,
+        "stopwords": sorted(STOPWORDS),
+        "shards": {
+            key: {
+                "tokens": len(shard["tokens"]),
+                "bytes": len(json_text(shard, pretty=False).encode("utf-8")),
+            }
+            for key, shard in search.items()
+        },
+    }
+    _write_dir(out_dir / "shards", shards, output_format, report)
+    _write_dir(out_dir / "search", {**search, "manifest": manifest}, output_format, report)
+    write_json_artifact(out_dir / "meta.json", partial(json_text, meta), output_format, report)
+    return meta
+
+
+# ---------- query ----------
+class EssayCorpus:
+    """Reads a written corpus lazily, loading (and caching) only the files a call needs."""
+
+    def __init__(self, corpus_dir: Path, loader: Optional[Callable[[Path], Any]] = None):
+        self.dir = Path(corpus_dir)
+        self._load = loader or (lambda p: json.loads(p.read_text(encoding="utf-8")))
+        self.meta = self._load(self.dir / "meta.json")
+        self._fields = self.meta["fields"]
+        self._manifest: Optional[dict] = None
+        self._cache: Dict[str, Any] = {}
+        self.files_loaded: List[str] = []
+
+    def _file(self, rel: str) -> Any:
+        if rel not in self._cache:
+            self._cache[rel] = self._load(self.dir / rel)
+            self.files_loaded.append(rel)
+        return self._cache[rel]
+
+    def rows(self) -> Iterable[Dict[str, Any]]:
+        for row in self.meta["essays"]:
+            yield dict(zip(self._fields, row))
+
+    def list(
+        self,
+        school: Optional[str] = None,
+        essay_type: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Metadata rows (no bodies) matching every given filter; type matches case-insensitively."""
+        wanted_type = slug(essay_type) if essay_type is not None else None
+        return [
+            row
+            for row in self.rows()
+            if (school is None or row["school"] == school)
+            and (wanted_type is None or slug(row["type"]) == wanted_type)
+            and (year is None or row["year"] == year)
+        ]
+
+    def essays(
+        self,
+        school: Optional[str] = None,
+        essay_type: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Full essay records matching the filters, read from their shards only."""
+        rows = self.list(school, essay_type, year)
+        wanted = {row["essay_id"] for row in rows}
+        out: List[Dict[str, Any]] = []
+        for key in sorted({row["shard"] for row in rows}):
+            out.extend(e for e in self._file(f"shards/{key}.json") if e["essay_id"] in wanted)
+        return sorted(out, key=lambda e: e["essay_id"])
+
+    def essay(self, essay_id: int) -> Optional[Dict[str, Any]]:
+        for row in self.rows():
+            if row["essay_id"] == essay_id:
+                return next(e for e in self._file(f"shards/{row['shard']}.json") if e["essay_id"] == essay_id)
+        return None
+
+    def postings(self, token: str) -> List[List[int]]:
+        """``[[essay_id, tf], ...]`` for one index token."""
+        if self._manifest is None:
+            self._manifest = self._file("search/manifest.json")
+        key = token[:PREFIX_LEN]
+        if key not in self._manifest["shards"]:
+            return []
+        return self._file(f"search/{key}.json")["tokens"].get(token, [])
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        school: Optional[str] = None,
+        essay_type: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Essays containing every query word, ranked by BM25 over essay body and prompt,
+        best first (ties by essay_id). Returns metadata rows with a ``score``.
+        """
+        terms = sorted(set(tokens(query)))
+        if not terms:
+            return []
+        allowed = {row["essay_id"]: row for row in self.list(school, essay_type, year)}
+        n = self.meta["count"]
+        avg = self.meta["avg_doc_tokens"] or 1.0
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for term in terms:
+            plist = self.postings(term)
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for essay_id, tf in plist:
+                if essay_id not in allowed:
+                    continue
+                length = self.meta["doc_tokens"][str(essay_id)]
+                scores[essay_id] = scores.get(essay_id, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg))
+                matched[essay_id] = matched.get(essay_id, 0) + 1
+        ranked = sorted((-s, essay_id) for essay_id, s in scores.items() if matched[essay_id] == len(terms))
+        return [{**allowed[essay_id], "score": round(-neg, 6)} for neg, essay_id in ranked[:limit]]
+
+
+def brute_force_search(essays: Sequence[Dict[str, Any]], query: str, limit: int = 20) -> List[Tuple[int, float]]:
+    """(essay_id, score) by scanning every essay body; used to check the index."""
+    terms = sorted(set(tokens(query)))
+    if not terms:
+        return []
+    docs = {e["essay_id"]: tokens(e.get("essay")) + tokens(e.get("question")) for e in essays if e.get("essay_id") is not None}
+    n = len(docs)
+    avg = (sum(len(d) for d in docs.values()) / n) if n else 1.0
+    df = {t: sum(1 for d in docs.values() if t in d) for t in terms}
+    ranked = []
+    for essay_id, doc in docs.items():
+        if not all(t in doc for t in terms):
+            continue
+        score = 0.0
+        for t in terms:
+            tf = doc.count(t)
+            idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+            score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(doc) / avg))
+        ranked.append((-score, essay_id))
+    ranked.sort()
+    return [(essay_id, round(-neg, 6)) for neg, essay_id in ranked[:limit]]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Build the sharded, searchable essay corpus")
+    ap.add_argument("--essays", default=str(ESSAYS_JSON), help="Anonymous_Essays.json")
+    ap.add_argument("--out", default=str(OUT_DIR), help="Output folder")
+    add_output_format_arg(ap)
+    args = ap.parse_args()
+
+    essays = json.loads(Path(args.essays).read_text(encoding="utf-8"))
+    report = SizeReport()
+    meta = write_corpus(essays, Path(args.out), args.output_format, report)
+    print(f"Wrote {meta['count']} essays in {len(meta['shards'])} shards to {args.out}")
+    report.print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,37 @@
 import argparse
+import hashlib
 import json
 import math
+import os
 import re
-from collections import defaultdict
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from artifacts import (
+    SizeReport,
+    add_output_format_arg,
+    json_text,
+    remove_compressed_siblings,
+    sibling,
+    write_binary_artifact,
+    write_compressed_siblings,
+    write_json_artifact,
+)
+from columnar import encode_columnar
+from schema import TABLES, missing_sources, requirement_row, table_rows, write_load_table
+from search_index import write_search_index
+
+try:  # optional: faster encoder for the per-institution files
+    import orjson
+except ImportError:
+    orjson = None
+
 # ---------- constants ----------
 CIP_FAMILY_MAP: Dict[str, str] = {
     "01": "Agriculture & Natural Resources",
@@ -50,6 +74,50 @@ CIP_FAMILY_MAP: Dict[str, str] = {
     "54": "History"
 }
 
+REQUIREMENT_FIELDS: List[str] = [
+    "secondary_school_gpa",
+    "secondary_school_rank",
+    "secondary_school_record",
+    "completion_of_college_preparatory_program",
+    "recommendations",
+    "formal_demonstration_of_competencies",
+    "work_experience",
+    "personal_statement_or_essay",
+    "legacy_status",
+    "admission_test_scores",
+    "english_proficiency_test",
+    "other_test_wonderlic_wisc_iii_etc",
+]
+REQUIREMENT_BUCKETS: Tuple[str, ...] = ("required", "considered", "not_considered")
+
+# Rank index key -> (source frame, period column, value column, order). Each index ranks
+# institutions by their latest non-null value; "desc" puts the largest value first.
+RANK_KEYS: Dict[str, Tuple[str, str, str, str]] = {
+    "applicants": ("metrics", "year", "applicants_total", "desc"),
+    "acceptance_rate": ("metrics", "year", "percent_admitted_total", "asc"),
+    "total_enrollment": ("metrics", "year", "total_enrollment", "desc"),
+    "grad_rate_6yr": ("metrics", "year", "graduation_rate_bachelor_degree_within_6_years_total", "desc"),
+    "tuition": ("tuition", "tuition_year", "tuition_and_fees", "asc"),
+}
+RANK_TOP_N = 100
+
+# institutions columns filled in later by merge_official_urls.py, not by this script.
+URL_MERGE_COLUMNS = ("financial_aid_url", "application_url")
+DEFAULT_TEST_POLICY = "Test optional"
+
+# Output field -> candidate source columns, in priority order (first non-blank wins).
+UNI_INFO_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "unitid": ("unitid",),
+    "name": ("institution_name", "inst_name"),
+    "state": ("inst_state", "state_abbreviation"),
+    "control": ("control_of_institution", "sector_of_institution", "control"),
+    "level": ("level_of_institution",),
+    "carnegie_basic": ("carnegie_classification_2021_basic",),
+    "city": ("inst_city", "city"),
+    "website": ("institution_internet_website_address", "inst_url"),
+    "admissions_url": ("admissions_office_web_address", "adm_url"),
+}
+
 
 # ---------- small helpers ----------
 def snake(s: str) -> str:
@@ -124,6 +192,29 @@ def cip_family(code: Optional[str]) -> Optional[str]:
     return CIP_FAMILY_MAP.get(root)
 
 
+def coalesce(df: pd.DataFrame, *cols: str) -> pd.Series:
+    """
+    Column-wise "first non-null, non-blank" across ``cols`` (strings are stripped).
+    Columns missing from ``df`` are skipped; rows with no usable value get None.
+    """
+    out = pd.Series(None, index=df.index, dtype=object)
+    pending = pd.Series(True, index=df.index)
+    for col in cols:
+        if col not in df.columns:
+            continue
+        values = df[col].astype(object)
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            stripped = values.str.strip()
+            values = stripped.where(stripped.notna(), values)
+        usable = values.notna() & (values != "")
+        take = pending & usable
+        out[take] = values[take]
+        pending &= ~usable
+        if not pending.any():
+            break
+    return out
+
+
 def to_records(df: pd.DataFrame) -> List[dict]:
     if df is None or df.empty:
         return []
@@ -131,6 +222,54 @@ def to_records(df: pd.DataFrame) -> List[dict]:
     return json.loads(clean.to_json(orient="records"))
 
 
+def records_by_unit(df: pd.DataFrame, sort_col: str) -> Dict[int, List[dict]]:
+    """
+    Same records as ``to_records`` on each unitid group (sorted by ``sort_col``),
+    but with a single to_json/json.loads round trip for the whole frame.
+    """
+    if df is None or df.empty:
+        return {}
+    ordered = df.sort_values(["unitid", sort_col], kind="stable")
+    grouped: Dict[int, List[dict]] = {}
+    for rec in to_records(ordered):
+        grouped.setdefault(int(rec["unitid"]), []).append(rec)
+    return grouped
+
+
+# orjson escapes neither DEL nor non-ASCII text, nor writes exponents, the way json.dumps does.
+_ORJSON_MISMATCH = re.compile(rb"[\x7f-\xff]|\d[eE]")
+
+
+def dump_json(payload, pretty: bool = True) -> bytes:
+    """
+    ``json.dumps(payload, indent=2)`` (or minified, when not ``pretty``) as UTF-8 bytes.
+    Uses orjson when installed and falls back to the stdlib whenever the two could disagree.
+    """
+    if orjson is not None:
+        try:
+            data = orjson.dumps(payload, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            data = None
+        if data is not None and not _ORJSON_MISMATCH.search(data):
+            return data
+    if pretty:
+        return json.dumps(payload, indent=2).encode("utf-8")
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def frame_json(df: pd.DataFrame, pretty: bool) -> str:
+    return df.to_json(orient="records", indent=2 if pretty else None)
+
+
+def frame_columnar(df: pd.DataFrame) -> bytes:
+    """
+    Columnar encoding of ``df`` as frame_json publishes it. pandas writes floats with
+    at most 10 decimal places, so the cells are re-read from that JSON first; the .bin
+    then decodes to exactly the rows of the .json written from the same frame.
+    """
+    return encode_columnar(pd.DataFrame(json.loads(frame_json(df, False)), columns=df.columns))
+
+
 def scrub_json(value):
     """
     Recursively replace pandas/NumPy NaN or NA values with None so we emit valid JSON.
@@ -171,41 +310,10 @@ def load_uni_info(info_path: Path, merged_path: Path) -> pd.DataFrame:
     ].drop_duplicates("unitid", keep="last")
 
     combined = info_df.merge(merged_subset, on="unitid", how="left", suffixes=("", "_merged"))
+    combined = combined[combined["unitid"].notna()]
 
-    def choose(row, *cols):
-        for col in cols:
-            if col not in row:
-                continue
-            val = row[col]
-            if pd.isna(val):
-                continue
-            if isinstance(val, str):
-                val = val.strip()
-                if not val:
-                    continue
-            return val
-        return None
-
-    records = []
-    for _, row in combined.iterrows():
-        unitid = row.get("unitid")
-        if pd.isna(unitid):
-            continue
-        records.append(
-            {
-                "unitid": unitid,
-                "name": choose(row, "institution_name", "inst_name"),
-                "state": choose(row, "inst_state", "state_abbreviation"),
-                "control": choose(row, "control_of_institution", "sector_of_institution", "control"),
-                "level": choose(row, "level_of_institution"),
-                "carnegie_basic": choose(row, "carnegie_classification_2021_basic"),
-                "city": choose(row, "inst_city", "city"),
-                "website": choose(row, "institution_internet_website_address", "inst_url"),
-                "admissions_url": choose(row, "admissions_office_web_address", "adm_url"),
-            }
-        )
-
-    out = pd.DataFrame(records)
+    out = pd.DataFrame({field: coalesce(combined, *cols) for field, cols in UNI_INFO_SOURCES.items()})
+    out = out.reset_index(drop=True).infer_objects()
     if "unitid" in out.columns:
         out = out[out["unitid"].notna()].copy()
         out["unitid"] = out["unitid"].astype(int)
@@ -299,66 +407,72 @@ def load_tuition(tuition_path: Path, merged_path: Optional[Path] = None) -> pd.D
     return long_df
 
 
-def derive_requirements_2023(df23: pd.DataFrame) -> pd.DataFrame:
-    def bucket(val: str) -> Optional[str]:
-        if not isinstance(val, str):
-            return None
-        t = val.lower()
-        if "not considered" in t:
-            return "not_considered"
-        if "required to be considered" in t:
-            return "required"
-        if "not required" in t and "considered" in t:
-            return "considered"
-        if "required" in t:
-            return "required"
-        if "considered" in t:
-            return "considered"
+def requirement_bucket(val: str) -> Optional[str]:
+    if not isinstance(val, str):
+        return None
+    t = val.lower()
+    if "not considered" in t:
         return "not_considered"
+    if "required to be considered" in t:
+        return "required"
+    if "not required" in t and "considered" in t:
+        return "considered"
+    if "required" in t:
+        return "required"
+    if "considered" in t:
+        return "considered"
+    return "not_considered"
 
-    fields = [
-        "secondary_school_gpa",
-        "secondary_school_rank",
-        "secondary_school_record",
-        "completion_of_college_preparatory_program",
-        "recommendations",
-        "formal_demonstration_of_competencies",
-        "work_experience",
-        "personal_statement_or_essay",
-        "legacy_status",
-        "admission_test_scores",
-        "english_proficiency_test",
-        "other_test_wonderlic_wisc_iii_etc",
-    ]
-    present = [f for f in fields if f in df23.columns]
-    rows = []
-    for _, record in df23[["unitid"] + present].iterrows():
-        buckets = {"required": [], "considered": [], "not_considered": []}
-        for field in present:
-            b = bucket(record[field])
-            if not b:
-                continue
-            label = field.replace("_", " ").title()
-            buckets[b].append(label)
-
-        tests_label = "Admission Test Scores"
-        if tests_label in buckets["required"]:
-            policy = "Required"
-        elif tests_label in buckets["considered"]:
-            policy = "Test flexible"
-        else:
-            policy = "Test optional"
-
-        rows.append(
-            {
-                "unitid": int(record["unitid"]),
-                "required": sorted(buckets["required"]),
-                "considered": sorted(buckets["considered"]),
-                "not_considered": sorted(buckets["not_considered"]),
-                "test_policy": policy,
-            }
-        )
-    return pd.DataFrame(rows)
+
+def derive_requirements_2023(df23: pd.DataFrame) -> pd.DataFrame:
+    """
+    Classify each admission factor into required / considered / not_considered.
+
+    Every distinct category string is bucketed once; rows are then encoded as a
+    single integer per bucket pattern so the label lists and test policy are
+    built once per distinct pattern rather than once per row.
+    """
+    present = [f for f in REQUIREMENT_FIELDS if f in df23.columns]
+    # Encode in label order so decoded lists come out already sorted.
+    present.sort(key=lambda f: f.replace("_", " ").title())
+    labels = [f.replace("_", " ").title() for f in present]
+    out_cols = ["unitid", *REQUIREMENT_BUCKETS, "test_policy"]
+    if df23.empty:
+        return pd.DataFrame(columns=out_cols)
+
+    bucket_code = {name: i + 1 for i, name in enumerate(REQUIREMENT_BUCKETS)}
+    distinct = pd.unique(df23[present].to_numpy().ravel()) if present else []
+    lookup = {v: bucket_code[b] for v in distinct if (b := requirement_bucket(v))}
+
+    base = len(REQUIREMENT_BUCKETS) + 1
+    codes = {f: df23[f].map(lookup).fillna(0).to_numpy(dtype=np.int64) for f in present}
+    pattern = np.zeros(len(df23), dtype=np.int64)
+    for i, field in enumerate(present):
+        pattern += codes[field] * base**i
+
+    keys, inverse = np.unique(pattern, return_inverse=True)
+    per_key = {name: [] for name in REQUIREMENT_BUCKETS}
+    for key in keys:
+        lists = {name: [] for name in REQUIREMENT_BUCKETS}
+        for i, label in enumerate(labels):
+            code = (int(key) // base**i) % base
+            if code:
+                lists[REQUIREMENT_BUCKETS[code - 1]].append(label)
+        for name in REQUIREMENT_BUCKETS:
+            per_key[name].append(lists[name])
+
+    out = pd.DataFrame({"unitid": df23["unitid"].astype(int).to_numpy()})
+    for name in REQUIREMENT_BUCKETS:
+        # Copy so rows sharing a pattern don't share (mutable) list objects.
+        out[name] = [list(per_key[name][k]) for k in inverse]
+
+    tests_code = codes.get("admission_test_scores", np.zeros(len(df23), dtype=np.int64))
+    out["test_policy"] = np.select(
+        [tests_code == bucket_code["required"], tests_code == bucket_code["considered"]],
+        ["Required", "Test flexible"],
+        default="Test optional",
+    )
+    return out[out_cols]
 
 
 def derive_major_families(path: Path) -> Dict[int, List[str]]:
@@ -367,7 +481,11 @@ def derive_major_families(path: Path) -> Dict[int, List[str]]:
         return {}
 
     df["cipcode"] = df["cipcode"].astype(str).str.strip()
-    df["family"] = df["cipcode"].apply(cip_family)
+    # Resolve families once per distinct CIP root rather than once per row.
+    roots = df["cipcode"].str.split(".", n=1).str[0].str.zfill(2)
+    root_codes, root_uniques = pd.factorize(roots)
+    root_families = np.array([CIP_FAMILY_MAP.get(r) for r in root_uniques] + [None], dtype=object)
+    df["family"] = root_families[root_codes]
 
     count_col = None
     for candidate in ["ctotalt", "ctotalb", "ctotalm"]:
@@ -376,21 +494,24 @@ def derive_major_families(path: Path) -> Dict[int, List[str]]:
             break
 
     if count_col:
-        df[count_col] = pd.to_numeric(df[count_col], errors="coerce").fillna(0)
+        df["weight"] = pd.to_numeric(df[count_col], errors="coerce").fillna(0).astype(float)
+    else:
+        df["weight"] = 1.0
 
-    agg = defaultdict(dict)
-    for _, row in df.iterrows():
-        if not row.get("family"):
-            continue
-        unit = int(row["unitid"])
-        weight = float(row[count_col]) if count_col else 1.0
-        agg[unit][row["family"]] = agg[unit].get(row["family"], 0.0) + weight
-
-    major_map: Dict[int, List[str]] = {}
-    for unitid, fams in agg.items():
-        sorted_fams = sorted(fams.items(), key=lambda x: x[1], reverse=True)
-        major_map[unitid] = [name for name, _ in sorted_fams[:4]]
-    return major_map
+    df = df[df["family"].notna()]
+    if df.empty:
+        return {}
+    df = df.assign(unitid=df["unitid"].astype(int), first_seen=np.arange(len(df)))
+
+    totals = df.groupby(["unitid", "family"], sort=False).agg(weight=("weight", "sum"), first_seen=("first_seen", "min"))
+    # Heaviest first; ties keep the order in which the family first appeared for the institution.
+    top = (
+        totals.reset_index()
+        .sort_values(["unitid", "weight", "first_seen"], ascending=[True, False, True], kind="stable")
+        .groupby("unitid", sort=False)
+        .head(4)
+    )
+    return {int(unitid): list(fams) for unitid, fams in top.groupby("unitid", sort=False)["family"]}
 
 
 # ---------- builders ----------
@@ -463,29 +584,7 @@ def build_institutions(
 
     merged["major_families"] = merged["unitid"].apply(family_lookup)
 
-    cols_out = [
-        "unitid",
-        "name",
-        "city",
-        "state",
-        "control",
-        "level",
-        "carnegie_basic",
-        "acceptance_rate",
-        "yield",
-        "tuition_2023_24",
-        "tuition_2023_24_in_state",
-        "tuition_2023_24_out_of_state",
-        "grad_rate_6yr",
-        "intl_enrollment_pct",
-        "full_time_retention_rate",
-        "student_to_faculty_ratio",
-        "total_enrollment",
-        "website",
-        "admissions_url",
-        "test_policy",
-        "major_families",
-    ]
+    cols_out = [c for c in TABLES["institutions"].column_names if c not in URL_MERGE_COLUMNS]
     out = merged[[c for c in cols_out if c in merged.columns]].copy()
     out = out[out["unitid"].notna()].copy()
     out["unitid"] = out["unitid"].astype(int)
@@ -505,6 +604,46 @@ def build_institutions(
     return out[out["name"].notna()]
 
 
+def latest_per_unit(df: pd.DataFrame, period_col: str, value_col: str) -> pd.DataFrame:
+    """One row per unitid holding its most recent non-null ``value_col``."""
+    vals = df[["unitid", period_col, value_col]].copy()
+    vals[value_col] = pd.to_numeric(vals[value_col], errors="coerce")
+    vals = vals.dropna(subset=["unitid", value_col])
+    vals["unitid"] = vals["unitid"].astype(int)
+    return vals.sort_values(["unitid", period_col], kind="stable").drop_duplicates("unitid", keep="last")
+
+
+def build_rank_indexes(
+    institutions: pd.DataFrame,
+    metrics: pd.DataFrame,
+    tuition_long: pd.DataFrame,
+) -> Dict[str, dict]:
+    """
+    Precomputed sort orders for the common "top N" views, restricted to published
+    institutions. Ties are broken by unitid so the output is stable across runs.
+    """
+    sources = {"metrics": metrics, "tuition": tuition_long}
+    known = set(institutions["unitid"].astype(int))
+    out: Dict[str, dict] = {}
+    for key, (source, period_col, value_col, order) in RANK_KEYS.items():
+        frame = sources[source]
+        if frame is None or frame.empty or value_col not in frame.columns:
+            continue
+        latest = latest_per_unit(frame, period_col, value_col)
+        latest = latest[latest["unitid"].isin(known)]
+        ranked = latest.sort_values([value_col, "unitid"], ascending=[order == "asc", True], kind="stable")
+        period = ranked[period_col].max() if not ranked.empty else None
+        out[key] = {
+            "key": key,
+            "column": value_col,
+            "order": order,
+            "latest_period": period.item() if hasattr(period, "item") else period,
+            "unitids": ranked["unitid"].tolist(),
+            "values": ranked[value_col].tolist(),
+        }
+    return out
+
+
 def build_institutions_index(base: pd.DataFrame) -> pd.DataFrame:
     cols = ["unitid", "name", "state", "city"]
     out = base[[c for c in cols if c in base.columns]].dropna(subset=["name"]).copy()
@@ -579,7 +718,12 @@ def build_metrics_by_year(a22: pd.DataFrame, a23: pd.DataFrame) -> pd.DataFrame:
     return m
 
 
-def write_index_slices(index_df: pd.DataFrame, out_dir: Path):
+def write_index_slices(
+    index_df: pd.DataFrame,
+    out_dir: Path,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+):
     out_dir.mkdir(parents=True, exist_ok=True)
     records = index_df.copy()
     records["letter"] = (
@@ -591,25 +735,112 @@ def write_index_slices(index_df: pd.DataFrame, out_dir: Path):
     for letter, group in records.groupby("letter"):
         manifest.append(letter)
         target = out_dir / f"{letter}.json"
-        group[["unitid", "name", "state", "city"]].to_json(target, orient="records", indent=2)
+        cols = group[["unitid", "name", "state", "city"]]
+        write_json_artifact(target, partial(frame_json, cols), output_format, report)
 
-    manifest_path = out_dir / "manifest.json"
-    manifest_path.write_text(json.dumps(sorted(manifest), indent=2), encoding="utf-8")
+    write_json_artifact(out_dir / "manifest.json", partial(json_text, sorted(manifest)), output_format, report)
 
 
-def write_institution_details(
+def write_rank_indexes(
+    rankings: Dict[str, dict],
     out_dir: Path,
-    institutions: pd.DataFrame,
-    metrics: pd.DataFrame,
-    tuition_long: pd.DataFrame,
-    requirements: pd.DataFrame,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
 ):
+    """
+    ``<key>.json`` holds the full ranking, ``<key>.top.json`` only the first RANK_TOP_N
+    entries so a "top N" view can load with a single small request.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
-    metrics_dir = out_dir.parent / "metrics"
-    metrics_dir.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for key, rank in rankings.items():
+        top = {**rank, "unitids": rank["unitids"][:RANK_TOP_N], "values": rank["values"][:RANK_TOP_N]}
+        write_json_artifact(out_dir / f"{key}.json", partial(json_text, rank), output_format, report)
+        write_json_artifact(out_dir / f"{key}.top.json", partial(json_text, top), output_format, report)
+        manifest.append(
+            {
+                "key": key,
+                "column": rank["column"],
+                "order": rank["order"],
+                "latest_period": rank["latest_period"],
+                "count": len(rank["unitids"]),
+                "top_n": len(top["unitids"]),
+            }
+        )
+    write_json_artifact(out_dir / "manifest.json", partial(json_text, manifest), output_format, report)
+
+
+DETAIL_MANIFEST = "detail_manifest.json"
 
-    metrics_group = {k: g.sort_values("year") for k, g in metrics.groupby("unitid")}
-    tuition_group = {k: g.sort_values("tuition_year") for k, g in tuition_long.groupby("unitid")}
+
+def detail_requirements(req: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The ``requirements`` block of a detail file; institutions without a row get the defaults."""
+    req = req or {}
+    return {
+        "required": req.get("required", []),
+        "considered": req.get("considered", []),
+        "not_considered": req.get("not_considered", []),
+        "test_policy": req.get("test_policy", DEFAULT_TEST_POLICY),
+    }
+
+
+ShardResult = Tuple[str, str, int, bool, Optional[int], Dict[str, int]]
+
+
+def _write_json_shard(
+    jobs: List[Tuple[str, Any, bool, Optional[str]]],
+    output_format: str = "pretty",
+) -> List[ShardResult]:
+    """
+    Encode one shard of (path, payload, needs_scrub, previous_sha256) jobs and write the
+    files whose content changed. Returns (path, sha256, size, written, pretty_size,
+    compressed_sizes) per job; the last two are only filled in for compact output.
+    """
+    compact = output_format == "compact"
+    results = []
+    for path, payload, needs_scrub, previous in jobs:
+        if needs_scrub:
+            payload = scrub_json(payload)
+        data = dump_json(payload, pretty=not compact)
+        digest = hashlib.sha256(data).hexdigest()
+        exists = os.path.isfile(path)
+        if previous is None and exists:
+            # No manifest entry yet (first incremental run): compare against what is on disk.
+            with open(path, "rb") as f:
+                previous = hashlib.sha256(f.read()).hexdigest()
+        written = previous != digest or not exists
+        if compact:
+            written = written or not os.path.isfile(sibling(Path(path), ".gz"))
+        compressed: Dict[str, int] = {}
+        if written:
+            with open(path, "wb") as f:
+                f.write(data)
+            if compact:
+                compressed = write_compressed_siblings(Path(path), data)
+            else:
+                remove_compressed_siblings(Path(path))
+        elif compact:
+            for suffix in (".gz", ".br"):
+                target = sibling(Path(path), suffix)
+                if target.is_file():
+                    compressed[suffix] = target.stat().st_size
+        pretty_size = len(dump_json(payload)) if compact else None
+        results.append((path, digest, len(data), written, pretty_size, compressed))
+    return results
+
+
+DetailFrames = Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame], pd.DataFrame]
+
+
+def _detail_payloads(
+    institutions: pd.DataFrame,
+    metrics: pd.DataFrame,
+    tuition_long: Optional[pd.DataFrame],
+    requirements: pd.DataFrame,
+) -> Iterator[Tuple[int, dict, dict]]:
+    """(unitid, detail payload, metrics payload) per institution."""
+    metrics_group = records_by_unit(metrics, "year")
+    tuition_group = records_by_unit(tuition_long, "tuition_year")
     req_map = {row["unitid"]: row for row in requirements.to_dict(orient="records")}
 
     for inst in institutions.to_dict(orient="records"):
@@ -642,16 +873,9 @@ def write_institution_details(
             },
         }
 
-        req = req_map.get(unitid, {"required": [], "considered": [], "not_considered": [], "test_policy": "Test optional"})
-        detail_path = out_dir / f"{unitid}.json"
         detail_payload = {
             "profile": profile,
-            "requirements": {
-                "required": req.get("required", []),
-                "considered": req.get("considered", []),
-                "not_considered": req.get("not_considered", []),
-                "test_policy": req.get("test_policy", "Test optional"),
-            },
+            "requirements": detail_requirements(req_map.get(unitid)),
             "support_notes": {
                 "international_cost": None,
                 "scholarships": None,
@@ -659,16 +883,174 @@ def write_institution_details(
                 "deadlines": None,
             },
         }
-        detail_path.write_text(json.dumps(scrub_json(detail_payload), indent=2), encoding="utf-8")
-
-        metric_rows = metrics_group.get(unitid, pd.DataFrame())
-        tuition_rows = tuition_group.get(unitid, pd.DataFrame())
         metrics_payload = {
             "unitid": unitid,
-            "metrics": to_records(metric_rows),
-            "tuition": to_records(tuition_rows),
+            "metrics": metrics_group.get(unitid, []),
+            "tuition": tuition_group.get(unitid, []),
         }
-        (metrics_dir / f"{unitid}.json").write_text(json.dumps(metrics_payload, indent=2), encoding="utf-8")
+        yield unitid, detail_payload, metrics_payload
+
+
+def _write_detail_shard(
+    frames: DetailFrames,
+    manifest: Dict[str, str],
+    out_dir: Path,
+    incremental: bool = True,
+    output_format: str = "pretty",
+) -> List[ShardResult]:
+    """
+    Build and write the detail and metrics files for the institutions in ``frames``.
+    Runs in the worker, so only the frame slices and their manifest entries are pickled.
+    """
+    root = out_dir.parent
+    jobs: List[Tuple[str, Any, bool, Optional[str]]] = []
+    for unitid, detail_payload, metrics_payload in _detail_payloads(*frames):
+        for path, payload, needs_scrub in (
+            (out_dir / f"{unitid}.json", detail_payload, True),
+            (root / "metrics" / f"{unitid}.json", metrics_payload, False),
+        ):
+            previous = manifest.get(path.relative_to(root).as_posix()) if incremental else ""
+            jobs.append((str(path), payload, needs_scrub, previous))
+    return _write_json_shard(jobs, output_format)
+
+
+def _shard_frames(frames: DetailFrames, shard_count: int) -> List[DetailFrames]:
+    """Split the frames into ``shard_count`` sets holding every ``shard_count``-th institution."""
+    institutions = frames[0]
+    shard_of = pd.Series(
+        np.arange(len(institutions)) % shard_count,
+        index=institutions["unitid"].astype(int).to_numpy(),
+    )
+
+    def split(frame: Optional[pd.DataFrame]) -> List[Optional[pd.DataFrame]]:
+        if frame is None or frame.empty:
+            return [frame] * shard_count
+        groups = dict(tuple(frame.groupby(frame["unitid"].map(shard_of))))
+        return [groups.get(i, frame.iloc[:0]) for i in range(shard_count)]
+
+    parts = [[institutions.iloc[i::shard_count] for i in range(shard_count)]] + [split(f) for f in frames[1:]]
+    return [tuple(shard) for shard in zip(*parts)]
+
+
+def write_institution_details(
+    out_dir: Path,
+    institutions: pd.DataFrame,
+    metrics: pd.DataFrame,
+    tuition_long: pd.DataFrame,
+    requirements: pd.DataFrame,
+    workers: int = 1,
+    incremental: bool = True,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+):
+    """
+    Write ``<unitid>.json`` detail and metrics files and a sha256 manifest next to them.
+    In incremental mode the manifest is used to skip files whose content is unchanged.
+    Files for institutions that are no longer present are deleted. With ``workers`` > 1
+    each worker gets a slice of the frames and builds, encodes and writes its own files.
+    """
+    started = time.perf_counter()
+    # Processes beyond the CPU count only add start-up and pickling.
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    metrics_dir = out_dir.parent / "metrics"
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+
+    root = out_dir.parent
+    manifest_path = root / DETAIL_MANIFEST
+    manifest: Dict[str, str] = {}
+    if incremental and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    frames: DetailFrames = (institutions, metrics, tuition_long, requirements)
+    write_shard = partial(_write_detail_shard, out_dir=out_dir, incremental=incremental, output_format=output_format)
+    if workers <= 1 or len(institutions) < 2:
+        results = write_shard(frames, manifest)
+    else:
+        shards = _shard_frames(frames, min(len(institutions), workers * 4))
+        manifests = [
+            {
+                key: manifest[key]
+                for unitid in shard[0]["unitid"].astype(int)
+                for key in (f"{out_dir.name}/{unitid}.json", f"metrics/{unitid}.json")
+                if key in manifest
+            }
+            for shard in shards
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for shard in pool.map(write_shard, shards, manifests) for r in shard]
+
+    new_manifest = {Path(r[0]).relative_to(root).as_posix(): r[1] for r in results}
+    deleted = 0
+    for folder in (out_dir, metrics_dir):
+        for path in folder.glob("*.json"):
+            if path.relative_to(root).as_posix() not in new_manifest:
+                path.unlink()
+                remove_compressed_siblings(path)
+                deleted += 1
+
+    if report is not None and output_format == "compact":
+        for folder in (out_dir, metrics_dir):
+            rows = [r for r in results if Path(r[0]).parent == folder]
+            report.add(
+                f"{folder.name}/*.json ({len(rows)} files)",
+                sum(r[4] or 0 for r in rows),
+                sum(r[2] for r in rows),
+                sum(r[5].get(".gz", 0) for r in rows) or None,
+                sum(r[5].get(".br", 0) for r in rows) or None,
+            )
+    manifest_path.write_text(json.dumps(new_manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+    files = len(results)
+    changed = sum(1 for r in results if r[3])
+    size_mb = sum(r[2] for r in results) / 1e6
+    written_mb = sum(r[2] for r in results if r[3]) / 1e6
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"Detail/metrics files: {changed} changed, {files - changed} unchanged, {deleted} deleted"
+        f" ({written_mb:.1f} of {size_mb:.1f} MB written) in {elapsed:.1f}s with {workers} worker(s):"
+        f" {files / elapsed:,.0f} files/s, {size_mb / elapsed:.1f} MB/s"
+    )
+
+
+def write_load_bundle(
+    load_dir: Path,
+    institutions: pd.DataFrame,
+    metrics: pd.DataFrame,
+    requirements: pd.DataFrame,
+) -> Dict[str, int]:
+    """
+    Write the load_to_postgres bundle for the tables this script produces (see schema.py).
+    Values go through the same JSON encoding as the published files, so loading from the
+    bundle or from those files gives identical rows.
+    """
+    for table, frame, skip in (
+        ("institutions", institutions, URL_MERGE_COLUMNS),
+        ("institution_metrics", metrics, ()),
+    ):
+        missing = missing_sources(table, frame.columns, skip)
+        if missing:
+            print(f"Warning: no ETL output for {table} columns: {', '.join(missing)}")
+
+    req_map = {row["unitid"]: row for row in requirements.to_dict(orient="records")}
+    unitids = institutions["unitid"].astype(int).tolist()
+    counts = {
+        "institutions": write_load_table(
+            load_dir, "institutions", table_rows("institutions", json.loads(frame_json(institutions, False)))
+        ),
+        "institution_metrics": write_load_table(
+            load_dir, "institution_metrics", table_rows("institution_metrics", json.loads(frame_json(metrics, False)))
+        ),
+        "institution_requirements": write_load_table(
+            load_dir,
+            "institution_requirements",
+            (requirement_row(u, scrub_json(detail_requirements(req_map.get(u)))) for u in unitids),
+        ),
+        # The detail files' support_notes are all empty placeholders for now.
+        "institution_support_notes": write_load_table(load_dir, "institution_support_notes", ()),
+    }
+    print("Load bundle: " + ", ".join(f"{t} {n:,} rows" for t, n in counts.items()) + f" in {load_dir}")
+    return counts
 
 
 # ---------- main ----------
@@ -676,6 +1058,18 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--src", required=True, help="Folder with CSVs")
     parser.add_argument("--out", required=True, help="Output folder (e.g., public/data)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for writing per-institution files (0 = one per CPU; capped at the CPU count)",
+    )
+    parser.add_argument(
+        "--full-rewrite",
+        action="store_true",
+        help="Rewrite every per-institution file instead of only those whose content changed",
+    )
+    add_output_format_arg(parser)
     args = parser.parse_args()
 
     src = Path(args.src)
@@ -694,18 +1088,37 @@ def main():
     institutions_index = build_institutions_index(base)
     tuition_ts = tuition_long.sort_values(["unitid", "tuition_year"])
 
-    institutions.to_json(out / "institutions.json", orient="records", indent=2)
-    institutions_index.to_json(out / "institutions_index.json", orient="records", indent=2)
-    metrics_by_year.to_json(out / "metrics_by_year.json", orient="records", indent=2)
-    requirements.to_json(out / "requirements_2023.json", orient="records", indent=2)
-    tuition_ts.to_json(out / "tuition_timeseries.json", orient="records", indent=2)
-
-    write_index_slices(institutions_index, out / "indexes")
-    write_institution_details(out / "institutions", institutions, metrics_by_year, tuition_long, requirements)
+    fmt = args.output_format
+    report = SizeReport()
+    write_json_artifact(out / "institutions.json", partial(frame_json, institutions), fmt, report)
+    write_json_artifact(out / "institutions_index.json", partial(frame_json, institutions_index), fmt, report)
+    write_json_artifact(out / "metrics_by_year.json", partial(frame_json, metrics_by_year), fmt, report)
+    write_binary_artifact(out / "metrics_by_year.bin", frame_columnar(metrics_by_year), fmt, report)
+    write_json_artifact(out / "requirements_2023.json", partial(frame_json, requirements), fmt, report)
+    write_json_artifact(out / "tuition_timeseries.json", partial(frame_json, tuition_ts), fmt, report)
+
+    write_index_slices(institutions_index, out / "indexes", fmt, report)
+    write_search_index(institutions_index, out / "search", fmt, report)
+    write_rank_indexes(build_rank_indexes(institutions, metrics_by_year, tuition_long), out / "rankings", fmt, report)
+    workers = args.workers or os.cpu_count() or 1
+    write_institution_details(
+        out / "institutions",
+        institutions,
+        metrics_by_year,
+        tuition_long,
+        requirements,
+        workers=workers,
+        incremental=not args.full_rewrite,
+        output_format=fmt,
+        report=report,
+    )
+    write_load_bundle(out / "load", institutions, metrics_by_year, requirements)
+    report.print()
 
     print(
-        "Wrote institutions.json, institutions_index.json, metrics_by_year.json, requirements_2023.json, tuition_timeseries.json,"
-        " sliced search indexes, and per-institution detail files."
+        "Wrote institutions.json, institutions_index.json, metrics_by_year.json (+ columnar .bin), requirements_2023.json,"
+        " tuition_timeseries.json,"
+        " sliced and prefix-sharded search indexes, rank indexes, per-institution detail files, and the load bundle."
     )
 
 
@@ -1,9 +1,18 @@
+import argparse
 import json
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, Iterator, List, Sequence
+
+from schema import TABLES, copy_text_value, on_conflict, table_rows
 
 
 ROOT = Path(__file__).resolve().parents[1]
+TABLE = "institutions"
+# insert: one INSERT per row (the original output); values: multi-row INSERTs of
+# --batch-size rows in one transaction; copy: a COPY ... FROM stdin block for psql.
+EXPORT_FORMATS = ("insert", "values", "copy")
+DEFAULT_BATCH_SIZE = 500
+STAGE = "stage_institutions"
 
 
 def sql_literal(value: Any) -> str:
@@ -12,81 +21,99 @@ def sql_literal(value: Any) -> str:
   if isinstance(value, (int, float)) and not isinstance(value, bool):
     return str(value)
   if isinstance(value, list):
+    # Cast explicitly: Postgres cannot type an empty ARRAY[] (or one of only NULLs).
+    if not value:
+      return "'{}'::text[]"
     inner = ", ".join(sql_literal(v) for v in value)
-    return f"ARRAY[{inner}]"
+    return f"ARRAY[{inner}]::text[]"
   s = str(value).replace("'", "''")
   return f"'{s}'"
 
 
+def _values(row: Dict[str, Any], columns: Sequence[str]) -> str:
+  return "(" + ", ".join(sql_literal(row[c]) for c in columns) + ")"
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+  batch: List[Dict[str, Any]] = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+def export_lines(
+  records: Sequence[Dict[str, Any]],
+  fmt: str = "insert",
+  batch_size: int = DEFAULT_BATCH_SIZE,
+  upsert: bool = False,
+) -> Iterator[str]:
+  """
+  Lines of the SQL export for ``records`` (institutions.json entries). With ``upsert``
+  existing rows are overwritten (ON CONFLICT (unitid) DO UPDATE) instead of failing.
+  """
+  spec = TABLES[TABLE]
+  columns = spec.column_names
+  cols_sql = ", ".join(columns)
+  conflict = f" {on_conflict(columns, spec.key)}" if upsert else ""
+  rows = table_rows(TABLE, records)
+
+  if fmt == "insert":
+    yield "-- INSERTs for public.institutions, generated locally"
+    for row in rows:
+      yield f"INSERT INTO public.institutions ({cols_sql}) VALUES {_values(row, columns)}{conflict};"
+    return
+
+  if fmt == "values":
+    yield f"-- Multi-row INSERTs ({batch_size} rows each) for public.institutions, generated locally"
+    yield "BEGIN;"
+    for batch in _batches(rows, batch_size):
+      yield f"INSERT INTO public.institutions ({cols_sql}) VALUES"
+      yield ",\n".join(_values(row, columns) for row in batch) + f"{conflict};"
+    yield "COMMIT;"
+    return
+
+  if fmt == "copy":
+    yield "-- COPY block for public.institutions, generated locally (run with psql)"
+    yield "BEGIN;"
+    target = "public.institutions"
+    if upsert:
+      yield f"CREATE TEMP TABLE {STAGE} ON COMMIT DROP AS SELECT {cols_sql} FROM public.institutions WITH NO DATA;"
+      target = STAGE
+    yield f"COPY {target} ({cols_sql}) FROM stdin;"
+    for row in rows:
+      yield "\t".join(copy_text_value(row[c]) for c in columns)
+    yield "\\."
+    if upsert:
+      yield f"INSERT INTO public.institutions ({cols_sql}) SELECT {cols_sql} FROM {STAGE}{conflict};"
+    yield "COMMIT;"
+    return
+
+  raise ValueError(f"Unknown export format {fmt!r}")
+
+
 def main() -> None:
-  data_path = ROOT / "public" / "data" / "institutions.json"
-  out_path = ROOT / "data_pipeline" / "supabase_institutions.sql"
+  parser = argparse.ArgumentParser(description="Export institutions.json as SQL for the Supabase SQL editor or psql.")
+  parser.add_argument("--format", choices=EXPORT_FORMATS, default="insert", help="insert (default), values or copy")
+  parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per INSERT with --format values")
+  parser.add_argument("--upsert", action="store_true", help="Overwrite existing rows (ON CONFLICT (unitid) DO UPDATE)")
+  parser.add_argument("--out", type=Path, default=ROOT / "data_pipeline" / "supabase_institutions.sql")
+  args = parser.parse_args()
+  if args.batch_size < 1:
+    parser.error("--batch-size must be at least 1")
 
+  data_path = ROOT / "public" / "data" / "institutions.json"
   with data_path.open("r", encoding="utf-8") as f:
     data = json.load(f)
 
-  columns: List[str] = [
-    "unitid",
-    "name",
-    "city",
-    "state",
-    "control",
-    "level",
-    "carnegie_basic",
-    "acceptance_rate",
-    "yield",
-    "tuition_2023_24",
-    "tuition_2023_24_in_state",
-    "tuition_2023_24_out_of_state",
-    "grad_rate_6yr",
-    "intl_enrollment_pct",
-    "full_time_retention_rate",
-    "student_to_faculty_ratio",
-    "total_enrollment",
-    "website",
-    "admissions_url",
-    "financial_aid_url",
-    "application_url",
-    "test_policy",
-    "major_families",
-  ]
-
-  lines: List[str] = []
-  lines.append("-- INSERTs for public.institutions, generated locally")
-  for d in data:
-    values = [
-      d.get("unitid"),
-      d.get("name"),
-      d.get("city"),
-      d.get("state"),
-      d.get("control"),
-      d.get("level"),
-      d.get("carnegie_basic"),
-      d.get("acceptance_rate"),
-      d.get("yield"),
-      d.get("tuition_2023_24"),
-      d.get("tuition_2023_24_in_state"),
-      d.get("tuition_2023_24_out_of_state"),
-      d.get("grad_rate_6yr"),
-      d.get("intl_enrollment_pct"),
-      d.get("full_time_retention_rate"),
-      d.get("student_to_faculty_ratio"),
-      d.get("total_enrollment"),
-      d.get("website"),
-      d.get("admissions_url"),
-      d.get("financial_aid_url"),
-      d.get("application_url"),
-      d.get("test_policy"),
-      d.get("major_families") or [],
-    ]
-    values_sql = ", ".join(sql_literal(v) for v in values)
-    cols_sql = ", ".join(columns)
-    lines.append(f"INSERT INTO public.institutions ({cols_sql}) VALUES ({values_sql});")
-
-  out_path.write_text("\n".join(lines), encoding="utf-8")
-  print(f"Wrote {len(data)} INSERT statements to {out_path}")
+  text = "\n".join(export_lines(data, args.format, args.batch_size, args.upsert))
+  args.out.write_text(text, encoding="utf-8")
+  count = sum(1 for _ in table_rows(TABLE, data))
+  print(f"Wrote {count} rows ({args.format}{', upsert' if args.upsert else ''}) to {args.out}")
 
 
 if __name__ == "__main__":
   main()
-
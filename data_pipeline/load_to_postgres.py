@@ -1,15 +1,42 @@
 import argparse
 import csv
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 import psycopg2
 from psycopg2.extras import execute_batch
+from psycopg2.pool import ThreadedConnectionPool
+
+from schema import (
+  HASH_COLUMN,
+  HOT_QUERIES,
+  INDEXES,
+  MATERIALIZED_VIEWS,
+  TABLES,
+  Index,
+  MaterializedView,
+  copy_text_value,
+  institution_majors_rows,
+  majors_meta_rows,
+  on_conflict,
+  quote_ident,
+  read_load_table,
+  requirement_row,
+  schema_sql,
+  support_note_rows,
+  table_rows,
+)
 
 
 ROOT = Path(__file__).resolve().parents[1]
+# Per-table NDJSON written by the producing scripts (see schema.py); preferred over
+# re-parsing their JSON outputs when present.
+LOAD_DIR = ROOT / "public" / "data" / "load"
 
 
 def load_env_local() -> None:
@@ -37,602 +64,522 @@ def load_env_local() -> None:
       os.environ[key] = value
 
 
-SCHEMA_SQL = """
-CREATE TABLE IF NOT EXISTS public.institutions (
-  unitid integer PRIMARY KEY,
-  name text NOT NULL,
-  city text,
-  state text,
-  control text,
-  level text,
-  carnegie_basic text,
-  acceptance_rate numeric,
-  yield numeric,
-  tuition_2023_24 numeric,
-  tuition_2023_24_in_state numeric,
-  tuition_2023_24_out_of_state numeric,
-  grad_rate_6yr numeric,
-  intl_enrollment_pct numeric,
-  full_time_retention_rate numeric,
-  student_to_faculty_ratio numeric,
-  total_enrollment numeric,
-  website text,
-  admissions_url text,
-  financial_aid_url text,
-  application_url text,
-  test_policy text,
-  major_families text[]
-);
-
-CREATE TABLE IF NOT EXISTS public.institution_locations (
-  unitid integer PRIMARY KEY REFERENCES public.institutions(unitid) ON DELETE CASCADE,
-  location_type text,
-  location_size text,
-  title_iv_indicator text
-);
-
-CREATE TABLE IF NOT EXISTS public.institution_metrics (
-  unitid integer REFERENCES public.institutions(unitid) ON DELETE CASCADE,
-  year integer,
-  applicants_total numeric,
-  admissions_total numeric,
-  enrolled_total numeric,
-  percent_admitted_total numeric,
-  admissions_yield_total numeric,
-  graduation_rate_bachelor_6yr numeric,
-  full_time_retention_rate numeric,
-  student_to_faculty_ratio numeric,
-  total_enrollment numeric,
-  sat_evidence_based_reading_and_writing_25th_percentile_score numeric,
-  sat_evidence_based_reading_and_writing_50th_percentile_score numeric,
-  sat_evidence_based_reading_and_writing_75th_percentile_score numeric,
-  sat_math_25th_percentile_score numeric,
-  sat_math_50th_percentile_score numeric,
-  sat_math_75th_percentile_score numeric,
-  act_composite_25th_percentile_score numeric,
-  act_composite_50th_percentile_score numeric,
-  act_composite_75th_percentile_score numeric,
-  act_english_25th_percentile_score numeric,
-  act_english_50th_percentile_score numeric,
-  act_english_75th_percentile_score numeric,
-  act_math_25th_percentile_score numeric,
-  act_math_50th_percentile_score numeric,
-  act_math_75th_percentile_score numeric,
-  sat_submitters_count numeric,
-  sat_submitters_percent numeric,
-  act_submitters_count numeric,
-  act_submitters_percent numeric,
-  percent_of_total_enrollment_that_are_u_s_nonresident numeric,
-  admitted_est numeric,
-  enrolled_est numeric,
-  PRIMARY KEY (unitid, year)
-);
-
-CREATE TABLE IF NOT EXISTS public.majors_meta (
-  cip_code text PRIMARY KEY,
-  cip_level text NOT NULL,
-  title text NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS public.institution_majors (
-  unitid integer REFERENCES public.institutions(unitid) ON DELETE CASCADE,
-  cip_level text NOT NULL,
-  cip_code text NOT NULL,
-  PRIMARY KEY (unitid, cip_level, cip_code),
-  FOREIGN KEY (cip_code) REFERENCES public.majors_meta(cip_code) ON DELETE CASCADE
-);
-
-CREATE TABLE IF NOT EXISTS public.institution_requirements (
-  unitid integer PRIMARY KEY REFERENCES public.institutions(unitid) ON DELETE CASCADE,
-  test_policy text,
-  required text[],
-  considered text[],
-  not_considered text[]
-);
-
-CREATE TABLE IF NOT EXISTS public.institution_support_notes (
-  unitid integer REFERENCES public.institutions(unitid) ON DELETE CASCADE,
-  key text NOT NULL,
-  note text NOT NULL,
-  PRIMARY KEY (unitid, key)
-);
-"""
-
-
-def get_db_conn():
-  load_env_local()
-  url = os.getenv("SUPABASE_DB_URL") or os.getenv("DATABASE_URL")
-  if not url:
-    raise SystemExit(
-      "Missing SUPABASE_DB_URL or DATABASE_URL environment variable.\n"
-      "Create a Postgres connection string in Supabase (Project settings → Database) "
-      "and set SUPABASE_DB_URL in your .env.local."
-    )
-  return psycopg2.connect(url)
+LOAD_MODES = ("batch", "copy")
 
 
-def create_tables(conn) -> None:
-  with conn.cursor() as cur:
-    cur.execute(SCHEMA_SQL)
-  conn.commit()
+class TableLoad(NamedTuple):
+  table: str
+  rows: int
+  seconds: float
+  # Diff counts; None when every row was upserted without consulting stored hashes.
+  inserted: Optional[int] = None
+  updated: Optional[int] = None
+  unchanged: Optional[int] = None
+  deleted: Optional[int] = None
 
 
-def load_institutions(conn) -> None:
-  path = ROOT / "public" / "data" / "institutions.json"
-  with path.open("r", encoding="utf-8") as f:
-    data = json.load(f)
-
-  rows: List[Dict[str, Any]] = []
-  for d in data:
-    unitid = int(d["unitid"])
-    rows.append(
-      {
-        "unitid": unitid,
-        "name": d.get("name"),
-        "city": d.get("city"),
-        "state": d.get("state"),
-        "control": d.get("control"),
-        "level": d.get("level"),
-        "carnegie_basic": d.get("carnegie_basic"),
-        "acceptance_rate": d.get("acceptance_rate"),
-        "yield": d.get("yield"),
-        "tuition_2023_24": d.get("tuition_2023_24"),
-        "tuition_2023_24_in_state": d.get("tuition_2023_24_in_state"),
-        "tuition_2023_24_out_of_state": d.get("tuition_2023_24_out_of_state"),
-        "grad_rate_6yr": d.get("grad_rate_6yr"),
-        "intl_enrollment_pct": d.get("intl_enrollment_pct"),
-        "full_time_retention_rate": d.get("full_time_retention_rate"),
-        "student_to_faculty_ratio": d.get("student_to_faculty_ratio"),
-        "total_enrollment": d.get("total_enrollment"),
-        "website": d.get("website"),
-        "admissions_url": d.get("admissions_url"),
-        "financial_aid_url": d.get("financial_aid_url"),
-        "application_url": d.get("application_url"),
-        "test_policy": d.get("test_policy"),
-        "major_families": d.get("major_families") or [],
-      }
-    )
+class _CopyStream:
+  """File-like reader over COPY text lines, so rows are streamed rather than buffered."""
 
-  sql = """
-    INSERT INTO public.institutions (
-      unitid, name, city, state, control, level, carnegie_basic,
-      acceptance_rate, yield, tuition_2023_24, tuition_2023_24_in_state,
-      tuition_2023_24_out_of_state, grad_rate_6yr, intl_enrollment_pct,
-      full_time_retention_rate, student_to_faculty_ratio, total_enrollment,
-      website, admissions_url, financial_aid_url, application_url,
-      test_policy, major_families
-    )
-    VALUES (
-      %(unitid)s, %(name)s, %(city)s, %(state)s, %(control)s, %(level)s, %(carnegie_basic)s,
-      %(acceptance_rate)s, %(yield)s, %(tuition_2023_24)s, %(tuition_2023_24_in_state)s,
-      %(tuition_2023_24_out_of_state)s, %(grad_rate_6yr)s, %(intl_enrollment_pct)s,
-      %(full_time_retention_rate)s, %(student_to_faculty_ratio)s, %(total_enrollment)s,
-      %(website)s, %(admissions_url)s, %(financial_aid_url)s, %(application_url)s,
-      %(test_policy)s, %(major_families)s
+  def __init__(self, rows: Iterable[Dict[str, Any]], columns: Sequence[str]):
+    self._lines = (
+      "\t".join(copy_text_value(row.get(c)) for c in columns) + "\n" for row in rows
     )
-    ON CONFLICT (unitid) DO UPDATE SET
-      name = EXCLUDED.name,
-      city = EXCLUDED.city,
-      state = EXCLUDED.state,
-      control = EXCLUDED.control,
-      level = EXCLUDED.level,
-      carnegie_basic = EXCLUDED.carnegie_basic,
-      acceptance_rate = EXCLUDED.acceptance_rate,
-      yield = EXCLUDED.yield,
-      tuition_2023_24 = EXCLUDED.tuition_2023_24,
-      tuition_2023_24_in_state = EXCLUDED.tuition_2023_24_in_state,
-      tuition_2023_24_out_of_state = EXCLUDED.tuition_2023_24_out_of_state,
-      grad_rate_6yr = EXCLUDED.grad_rate_6yr,
-      intl_enrollment_pct = EXCLUDED.intl_enrollment_pct,
-      full_time_retention_rate = EXCLUDED.full_time_retention_rate,
-      student_to_faculty_ratio = EXCLUDED.student_to_faculty_ratio,
-      total_enrollment = EXCLUDED.total_enrollment,
-      website = EXCLUDED.website,
-      admissions_url = EXCLUDED.admissions_url,
-      financial_aid_url = EXCLUDED.financial_aid_url,
-      application_url = EXCLUDED.application_url,
-      test_policy = EXCLUDED.test_policy,
-      major_families = EXCLUDED.major_families;
+    self._buf = ""
+
+  def read(self, size: int = -1) -> str:
+    while size < 0 or len(self._buf) < size:
+      line = next(self._lines, None)
+      if line is None:
+        break
+      self._buf += line
+    if size < 0:
+      out, self._buf = self._buf, ""
+    else:
+      out, self._buf = self._buf[:size], self._buf[size:]
+    return out
+
+
+def row_hash(row: Dict[str, Any], columns: Sequence[str]) -> str:
+  payload = json.dumps([row.get(c) for c in columns], separators=(",", ":"), ensure_ascii=False, default=str)
+  return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def _dedupe_last(rows: List[Dict[str, Any]], key: Sequence[str]) -> Iterator[Dict[str, Any]]:
+  """
+  Keep the last row per key. Row-by-row upserts let a later duplicate win; a single
+  INSERT ... ON CONFLICT DO UPDATE refuses to touch the same row twice.
   """
+  latest: Dict[tuple, Dict[str, Any]] = {}
+  for row in rows:
+    k = tuple(row.get(c) for c in key)
+    latest.pop(k, None)
+    latest[k] = row
+  return iter(latest.values())
 
-  with conn.cursor() as cur:
-    execute_batch(cur, sql, rows, page_size=1000)
-  conn.commit()
+
+def upsert_sql(table: str, columns: Sequence[str], key: Sequence[str], update: bool, source: Optional[str] = None) -> str:
+  """
+  INSERT ... ON CONFLICT for ``table``. With ``source`` the rows are selected from that
+  (staging) table; otherwise the statement takes one row of %(column)s parameters.
+  """
+  cols = ", ".join(quote_ident(c) for c in columns)
+  if source:
+    body = f"SELECT {cols} FROM {source}"
+  else:
+    body = "VALUES (" + ", ".join(f"%({c})s" for c in columns) + ")"
+  return f"INSERT INTO public.{quote_ident(table)} ({cols}) {body} {on_conflict(columns, key, update)};"
+
+
+def _stage(cur, name: str, table: str, columns: Sequence[str], rows: Iterable[Dict[str, Any]]) -> str:
+  """COPY ``rows`` into a temp table shaped like ``columns`` of ``public.<table>``."""
+  stage = quote_ident(name)
+  cols = ", ".join(quote_ident(c) for c in columns)
+  cur.execute(
+    f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {cols} FROM public.{quote_ident(table)} WITH NO DATA;"
+  )
+  cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", _CopyStream(rows, columns))
+  return stage
 
 
-def load_institution_locations(conn) -> None:
-  path = ROOT / "public" / "data" / "uni_location_size.csv"
-  if not path.exists():
+def _write(cur, table: str, columns: Sequence[str], rows: List[Dict[str, Any]], key: Sequence[str], mode: str, update: bool) -> None:
+  if not rows:
     return
+  if mode == "copy":
+    stage = _stage(cur, f"stage_{table}", table, columns, rows)
+    cur.execute(upsert_sql(table, columns, key, update, source=stage))
+  else:
+    execute_batch(cur, upsert_sql(table, columns, key, update), rows, page_size=1000)
 
-  rows: List[Dict[str, Any]] = []
-  with path.open("r", encoding="utf-8", newline="") as f:
-    reader = csv.DictReader(f)
-    for raw in reader:
-      if not raw.get("unitid"):
-        continue
-      try:
-        unitid = int(raw["unitid"])
-      except ValueError:
-        continue
-      rows.append(
-        {
-          "unitid": unitid,
-          "location_type": (raw.get("UniLocation") or "").strip() or None,
-          "location_size": (raw.get("LocationSize") or "").strip() or None,
-          "title_iv_indicator": (
-            raw.get("HD2024.Postsecondary and Title IV institution indicator") or ""
-          ).strip()
-          or None,
-        }
-      )
 
-  if not rows:
+def _delete(cur, table: str, key: Sequence[str], keys: List[tuple], mode: str) -> None:
+  if not keys:
     return
+  if mode == "copy":
+    stage = _stage(cur, f"gone_{table}", table, key, (dict(zip(key, k)) for k in keys))
+    match = " AND ".join(f"t.{quote_ident(c)} = g.{quote_ident(c)}" for c in key)
+    cur.execute(f"DELETE FROM public.{quote_ident(table)} t USING {stage} g WHERE {match};")
+  else:
+    match = " AND ".join(f"{quote_ident(c)} = %s" for c in key)
+    execute_batch(cur, f"DELETE FROM public.{quote_ident(table)} WHERE {match};", keys, page_size=1000)
+
+
+def upsert_rows(
+  conn,
+  table: str,
+  rows: List[Dict[str, Any]],
+  key: Sequence[str],
+  mode: str = "batch",
+  update: bool = True,
+  diff: bool = True,
+) -> TableLoad:
+  """
+  Upsert ``rows`` (dicts sharing the same keys) into ``public.<table>`` and commit.
+  Every row is stored with a content hash in ``row_hash``.
 
-  sql = """
-    INSERT INTO public.institution_locations (
-      unitid, location_type, location_size, title_iv_indicator
-    )
-    VALUES (%(unitid)s, %(location_type)s, %(location_size)s, %(title_iv_indicator)s)
-    ON CONFLICT (unitid) DO UPDATE SET
-      location_type = EXCLUDED.location_type,
-      location_size = EXCLUDED.location_size,
-      title_iv_indicator = EXCLUDED.title_iv_indicator;
+  batch: execute_batch of one INSERT ... ON CONFLICT per row (page_size=1000).
+  copy:  COPY the rows into a temp staging table, then merge them with one set-based
+         INSERT ... SELECT ... ON CONFLICT, so the target is only written (and locked)
+         by a single statement.
+
+  With ``diff`` the stored (key, row_hash) pairs are fetched first: only new and changed
+  rows are written, and rows whose key is no longer in ``rows`` are deleted. An empty
+  ``rows`` never deletes anything.
   """
+  if not rows:
+    return TableLoad(table, 0, 0.0)
+  start = time.perf_counter()
+  columns = list(rows[0].keys())
+  hashed = []
+  for row in _dedupe_last(rows, key):
+    row = dict(row)
+    row[HASH_COLUMN] = row_hash(row, columns)
+    hashed.append(row)
+  columns.append(HASH_COLUMN)
 
   with conn.cursor() as cur:
-    execute_batch(cur, sql, rows, page_size=1000)
+    if not diff:
+      _write(cur, table, columns, hashed, key, mode, update)
+      conn.commit()
+      return TableLoad(table, len(hashed), time.perf_counter() - start)
+
+    cur.execute(f"SELECT {', '.join(quote_ident(c) for c in key)}, {HASH_COLUMN} FROM public.{quote_ident(table)};")
+    stored = {tuple(r[:-1]): r[-1] for r in cur.fetchall()}
+    changed: List[Dict[str, Any]] = []
+    inserted = updated = 0
+    for row in hashed:
+      k = tuple(row[c] for c in key)
+      if k not in stored:
+        inserted += 1
+        changed.append(row)
+      elif stored.pop(k) != row[HASH_COLUMN]:
+        updated += 1
+        changed.append(row)
+    vanished = list(stored)
+    _write(cur, table, columns, changed, key, mode, update)
+    _delete(cur, table, key, vanished, mode)
   conn.commit()
+  unchanged = len(hashed) - inserted - updated
+  return TableLoad(table, len(hashed), time.perf_counter() - start, inserted, updated, unchanged, len(vanished))
 
 
-def load_institution_metrics(conn) -> None:
-  path = ROOT / "public" / "data" / "metrics_by_year.json"
-  if not path.exists():
-    return
-  with path.open("r", encoding="utf-8") as f:
-    data = json.load(f)
-
-  rows: List[Dict[str, Any]] = []
-  for d in data:
-    try:
-      unitid = int(d["unitid"])
-      year = int(d["year"])
-    except (KeyError, ValueError):
-      continue
-    rows.append(
-      {
-        "unitid": unitid,
-        "year": year,
-        "applicants_total": d.get("applicants_total"),
-        "admissions_total": d.get("admissions_total"),
-        "enrolled_total": d.get("enrolled_total"),
-        "percent_admitted_total": d.get("percent_admitted_total"),
-        "admissions_yield_total": d.get("admissions_yield_total"),
-        "graduation_rate_bachelor_6yr": d.get("graduation_rate_bachelor_degree_within_6_years_total"),
-        "full_time_retention_rate": d.get("full_time_retention_rate"),
-        "student_to_faculty_ratio": d.get("student_to_faculty_ratio"),
-        "total_enrollment": d.get("total_enrollment"),
-        "sat_evidence_based_reading_and_writing_25th_percentile_score": d.get(
-          "sat_evidence_based_reading_and_writing_25th_percentile_score"
-        ),
-        "sat_evidence_based_reading_and_writing_50th_percentile_score": d.get(
-          "sat_evidence_based_reading_and_writing_50th_percentile_score"
-        ),
-        "sat_evidence_based_reading_and_writing_75th_percentile_score": d.get(
-          "sat_evidence_based_reading_and_writing_75th_percentile_score"
-        ),
-        "sat_math_25th_percentile_score": d.get("sat_math_25th_percentile_score"),
-        "sat_math_50th_percentile_score": d.get("sat_math_50th_percentile_score"),
-        "sat_math_75th_percentile_score": d.get("sat_math_75th_percentile_score"),
-        "act_composite_25th_percentile_score": d.get("act_composite_25th_percentile_score"),
-        "act_composite_50th_percentile_score": d.get("act_composite_50th_percentile_score"),
-        "act_composite_75th_percentile_score": d.get("act_composite_75th_percentile_score"),
-        "act_english_25th_percentile_score": d.get("act_english_25th_percentile_score"),
-        "act_english_50th_percentile_score": d.get("act_english_50th_percentile_score"),
-        "act_english_75th_percentile_score": d.get("act_english_75th_percentile_score"),
-        "act_math_25th_percentile_score": d.get("act_math_25th_percentile_score"),
-        "act_math_50th_percentile_score": d.get("act_math_50th_percentile_score"),
-        "act_math_75th_percentile_score": d.get("act_math_75th_percentile_score"),
-        "sat_submitters_count": d.get(
-          "number_of_first_time_degree_certificate_seeking_students_submitting_sat_scores"
-        ),
-        "sat_submitters_percent": d.get(
-          "percent_of_first_time_degree_certificate_seeking_students_submitting_sat_scores"
-        ),
-        "act_submitters_count": d.get(
-          "number_of_first_time_degree_certificate_seeking_students_submitting_act_scores"
-        ),
-        "act_submitters_percent": d.get(
-          "percent_of_first_time_degree_certificate_seeking_students_submitting_act_scores"
-        ),
-        "percent_of_total_enrollment_that_are_u_s_nonresident": d.get(
-          "percent_of_total_enrollment_that_are_u_s_nonresident"
-        ),
-        "admitted_est": d.get("admitted_est"),
-        "enrolled_est": d.get("enrolled_est"),
-      }
-    )
+SCHEMA_SQL = schema_sql()
 
-  if not rows:
-    return
 
-  sql = """
-    INSERT INTO public.institution_metrics (
-      unitid,
-      year,
-      applicants_total,
-      admissions_total,
-      enrolled_total,
-      percent_admitted_total,
-      admissions_yield_total,
-      graduation_rate_bachelor_6yr,
-      full_time_retention_rate,
-      student_to_faculty_ratio,
-      total_enrollment,
-      sat_evidence_based_reading_and_writing_25th_percentile_score,
-      sat_evidence_based_reading_and_writing_50th_percentile_score,
-      sat_evidence_based_reading_and_writing_75th_percentile_score,
-      sat_math_25th_percentile_score,
-      sat_math_50th_percentile_score,
-      sat_math_75th_percentile_score,
-      act_composite_25th_percentile_score,
-      act_composite_50th_percentile_score,
-      act_composite_75th_percentile_score,
-      act_english_25th_percentile_score,
-      act_english_50th_percentile_score,
-      act_english_75th_percentile_score,
-      act_math_25th_percentile_score,
-      act_math_50th_percentile_score,
-      act_math_75th_percentile_score,
-      sat_submitters_count,
-      sat_submitters_percent,
-      act_submitters_count,
-      act_submitters_percent,
-      percent_of_total_enrollment_that_are_u_s_nonresident,
-      admitted_est,
-      enrolled_est
-    )
-    VALUES (
-      %(unitid)s,
-      %(year)s,
-      %(applicants_total)s,
-      %(admissions_total)s,
-      %(enrolled_total)s,
-      %(percent_admitted_total)s,
-      %(admissions_yield_total)s,
-      %(graduation_rate_bachelor_6yr)s,
-      %(full_time_retention_rate)s,
-      %(student_to_faculty_ratio)s,
-      %(total_enrollment)s,
-      %(sat_evidence_based_reading_and_writing_25th_percentile_score)s,
-      %(sat_evidence_based_reading_and_writing_50th_percentile_score)s,
-      %(sat_evidence_based_reading_and_writing_75th_percentile_score)s,
-      %(sat_math_25th_percentile_score)s,
-      %(sat_math_50th_percentile_score)s,
-      %(sat_math_75th_percentile_score)s,
-      %(act_composite_25th_percentile_score)s,
-      %(act_composite_50th_percentile_score)s,
-      %(act_composite_75th_percentile_score)s,
-      %(act_english_25th_percentile_score)s,
-      %(act_english_50th_percentile_score)s,
-      %(act_english_75th_percentile_score)s,
-      %(act_math_25th_percentile_score)s,
-      %(act_math_50th_percentile_score)s,
-      %(act_math_75th_percentile_score)s,
-      %(sat_submitters_count)s,
-      %(sat_submitters_percent)s,
-      %(act_submitters_count)s,
-      %(act_submitters_percent)s,
-      %(percent_of_total_enrollment_that_are_u_s_nonresident)s,
-      %(admitted_est)s,
-      %(enrolled_est)s
+def get_db_url() -> str:
+  load_env_local()
+  url = os.getenv("SUPABASE_DB_URL") or os.getenv("DATABASE_URL")
+  if not url:
+    raise SystemExit(
+      "Missing SUPABASE_DB_URL or DATABASE_URL environment variable.\n"
+      "Create a Postgres connection string in Supabase (Project settings → Database) "
+      "and set SUPABASE_DB_URL in your .env.local."
     )
-    ON CONFLICT (unitid, year) DO UPDATE SET
-      applicants_total = EXCLUDED.applicants_total,
-      admissions_total = EXCLUDED.admissions_total,
-      enrolled_total = EXCLUDED.enrolled_total,
-      percent_admitted_total = EXCLUDED.percent_admitted_total,
-      admissions_yield_total = EXCLUDED.admissions_yield_total,
-      graduation_rate_bachelor_6yr = EXCLUDED.graduation_rate_bachelor_6yr,
-      full_time_retention_rate = EXCLUDED.full_time_retention_rate,
-      student_to_faculty_ratio = EXCLUDED.student_to_faculty_ratio,
-      total_enrollment = EXCLUDED.total_enrollment,
-      sat_evidence_based_reading_and_writing_25th_percentile_score = EXCLUDED.sat_evidence_based_reading_and_writing_25th_percentile_score,
-      sat_evidence_based_reading_and_writing_50th_percentile_score = EXCLUDED.sat_evidence_based_reading_and_writing_50th_percentile_score,
-      sat_evidence_based_reading_and_writing_75th_percentile_score = EXCLUDED.sat_evidence_based_reading_and_writing_75th_percentile_score,
-      sat_math_25th_percentile_score = EXCLUDED.sat_math_25th_percentile_score,
-      sat_math_50th_percentile_score = EXCLUDED.sat_math_50th_percentile_score,
-      sat_math_75th_percentile_score = EXCLUDED.sat_math_75th_percentile_score,
-      act_composite_25th_percentile_score = EXCLUDED.act_composite_25th_percentile_score,
-      act_composite_50th_percentile_score = EXCLUDED.act_composite_50th_percentile_score,
-      act_composite_75th_percentile_score = EXCLUDED.act_composite_75th_percentile_score,
-      act_english_25th_percentile_score = EXCLUDED.act_english_25th_percentile_score,
-      act_english_50th_percentile_score = EXCLUDED.act_english_50th_percentile_score,
-      act_english_75th_percentile_score = EXCLUDED.act_english_75th_percentile_score,
-      act_math_25th_percentile_score = EXCLUDED.act_math_25th_percentile_score,
-      act_math_50th_percentile_score = EXCLUDED.act_math_50th_percentile_score,
-      act_math_75th_percentile_score = EXCLUDED.act_math_75th_percentile_score,
-      sat_submitters_count = EXCLUDED.sat_submitters_count,
-      sat_submitters_percent = EXCLUDED.sat_submitters_percent,
-      act_submitters_count = EXCLUDED.act_submitters_count,
-      act_submitters_percent = EXCLUDED.act_submitters_percent,
-      percent_of_total_enrollment_that_are_u_s_nonresident = EXCLUDED.percent_of_total_enrollment_that_are_u_s_nonresident,
-      admitted_est = EXCLUDED.admitted_est,
-      enrolled_est = EXCLUDED.enrolled_est;
-  """
+  return url
 
+
+def create_tables(conn) -> None:
   with conn.cursor() as cur:
-    execute_batch(cur, sql, rows, page_size=1000)
+    cur.execute(SCHEMA_SQL)
   conn.commit()
 
 
-def load_majors_meta(conn) -> None:
-  path = ROOT / "public" / "data" / "majors_bachelor_meta.json"
-  if not path.exists():
-    return
+def _load_table(
+  conn,
+  table: str,
+  fallback: Callable[[], Optional[Iterable[Dict[str, Any]]]],
+  mode: str,
+  diff: bool,
+) -> List[TableLoad]:
+  """Upsert ``table`` from the load bundle, or from ``fallback()`` when the bundle lacks it."""
+  rows = read_load_table(LOAD_DIR, table)
+  if rows is None:
+    rows = fallback()
+    if rows is None:
+      return []
+  return [upsert_rows(conn, table, list(rows), TABLES[table].key, mode, diff=diff)]
+
+
+def _read_json(path: Path) -> Any:
   with path.open("r", encoding="utf-8") as f:
-    data = json.load(f)
-
-  rows: List[Dict[str, Any]] = []
-  for level_key, level_label in [
-    ("two_digit", "2-digit"),
-    ("four_digit", "4-digit"),
-    ("six_digit", "6-digit"),
-  ]:
-    mapping: Optional[Dict[str, Any]] = data.get(level_key)
-    if not isinstance(mapping, dict):
-      continue
-    for code, title in mapping.items():
-      if not code:
-        continue
-      t = (str(title) if title is not None else "").strip()
-      if not t:
-        continue
-      rows.append(
-        {
-          "cip_code": str(code),
-          "cip_level": level_label,
-          "title": t,
-        }
-      )
+    return json.load(f)
 
-  if not rows:
-    return
 
-  sql = """
-    INSERT INTO public.majors_meta (cip_code, cip_level, title)
-    VALUES (%(cip_code)s, %(cip_level)s, %(title)s)
-    ON CONFLICT (cip_code) DO UPDATE SET
-      cip_level = EXCLUDED.cip_level,
-      title = EXCLUDED.title;
-  """
+def load_institutions(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  def fallback():
+    return table_rows("institutions", _read_json(ROOT / "public" / "data" / "institutions.json"))
 
-  with conn.cursor() as cur:
-    execute_batch(cur, sql, rows, page_size=1000)
-  conn.commit()
+  return _load_table(conn, "institutions", fallback, mode, diff)
 
 
-def load_institution_majors(conn) -> None:
-  path = ROOT / "public" / "data" / "majors_bachelor_by_institution.json"
-  if not path.exists():
-    return
-  with path.open("r", encoding="utf-8") as f:
-    data = json.load(f)
+def load_institution_locations(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  def fallback():
+    path = ROOT / "public" / "data" / "uni_location_size.csv"
+    if not path.exists():
+      return None
+    with path.open("r", encoding="utf-8", newline="") as f:
+      records = [
+        {k: (v or "").strip() or None for k, v in raw.items() if k is not None}
+        for raw in csv.DictReader(f)
+      ]
+    return table_rows("institution_locations", records)
 
-  rows: List[Dict[str, Any]] = []
-  level_map = {
-    "two_digit": "2-digit",
-    "four_digit": "4-digit",
-    "six_digit": "6-digit",
-  }
+  return _load_table(conn, "institution_locations", fallback, mode, diff)
 
-  for unitid_str, payload in data.items():
-    try:
-      unitid = int(unitid_str)
-    except ValueError:
-      continue
-    if not isinstance(payload, dict):
-      continue
-    for k, level_label in level_map.items():
-      codes = payload.get(k) or []
-      if not isinstance(codes, list):
-        continue
-      for code in codes:
-        if not code:
-          continue
-        rows.append(
-          {
-            "unitid": unitid,
-            "cip_level": level_label,
-            "cip_code": str(code),
-          }
-        )
 
-  if not rows:
-    return
+def load_institution_metrics(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  def fallback():
+    path = ROOT / "public" / "data" / "metrics_by_year.json"
+    return table_rows("institution_metrics", _read_json(path)) if path.exists() else None
 
-  sql = """
-    INSERT INTO public.institution_majors (unitid, cip_level, cip_code)
-    VALUES (%(unitid)s, %(cip_level)s, %(cip_code)s)
-    ON CONFLICT (unitid, cip_level, cip_code) DO NOTHING;
-  """
+  return _load_table(conn, "institution_metrics", fallback, mode, diff)
+
+
+def load_majors_meta(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  def fallback():
+    path = ROOT / "public" / "data" / "majors_bachelor_meta.json"
+    return majors_meta_rows(_read_json(path)) if path.exists() else None
+
+  return _load_table(conn, "majors_meta", fallback, mode, diff)
 
-  with conn.cursor() as cur:
-    execute_batch(cur, sql, rows, page_size=1000)
-  conn.commit()
 
+def load_institution_majors(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  def fallback():
+    path = ROOT / "public" / "data" / "majors_bachelor_by_institution.json"
+    return institution_majors_rows(_read_json(path)) if path.exists() else None
 
-def load_institution_requirements_and_support(conn) -> None:
+  return _load_table(conn, "institution_majors", fallback, mode, diff)
+
+
+def _detail_file_rows() -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+  """Requirement and support-note rows parsed from every per-institution detail file."""
   base_dir = ROOT / "public" / "data" / "institutions"
   if not base_dir.exists():
-    return
-
+    return None
   req_rows: List[Dict[str, Any]] = []
   notes_rows: List[Dict[str, Any]] = []
-
   for path in base_dir.glob("*.json"):
-    with path.open("r", encoding="utf-8") as f:
-      data = json.load(f)
+    data = _read_json(path)
     profile = data.get("profile") or {}
     try:
       unitid = int(profile["unitid"])
     except Exception:
       continue
+    req_rows.append(requirement_row(unitid, data.get("requirements") or {}))
+    notes_rows.extend(support_note_rows(unitid, data.get("support_notes") or {}))
+  return req_rows, notes_rows
+
+
+def load_institution_requirements_and_support(conn, mode: str = "batch", diff: bool = True) -> List[TableLoad]:
+  req_rows = read_load_table(LOAD_DIR, "institution_requirements")
+  notes_rows = read_load_table(LOAD_DIR, "institution_support_notes")
+  if req_rows is None or notes_rows is None:
+    parsed = _detail_file_rows()
+    if parsed is None:
+      return []
+    req_rows, notes_rows = parsed
+  return [
+    upsert_rows(conn, "institution_requirements", list(req_rows), TABLES["institution_requirements"].key, mode, diff=diff),
+    upsert_rows(conn, "institution_support_notes", list(notes_rows), TABLES["institution_support_notes"].key, mode, diff=diff),
+  ]
+
+
+# Loader -> loaders it must wait for. Only institutions and majors_meta are
+# foreign-key parents; every other table can load concurrently once they are in.
+LOADERS: Dict[str, Tuple[Callable[..., List[TableLoad]], Tuple[str, ...]]] = {
+  "institutions": (load_institutions, ()),
+  "majors_meta": (load_majors_meta, ()),
+  "institution_locations": (load_institution_locations, ("institutions",)),
+  "institution_metrics": (load_institution_metrics, ("institutions",)),
+  "institution_majors": (load_institution_majors, ("institutions", "majors_meta")),
+  "institution_requirements_and_support": (load_institution_requirements_and_support, ("institutions",)),
+}
+
+
+def _run_loader(pool: ThreadedConnectionPool, name: str, mode: str, diff: bool) -> Tuple[List[TableLoad], float]:
+  loader, _ = LOADERS[name]
+  conn = pool.getconn()
+  ok = False
+  try:
+    start = time.perf_counter()
+    loads = loader(conn, mode, diff)
+    ok = True
+    return loads, time.perf_counter() - start
+  finally:
+    # A connection whose loader failed may be mid-transaction; don't hand it out again.
+    pool.putconn(conn, close=not ok)
 
-    # Requirements
-    req = data.get("requirements") or {}
-    req_rows.append(
-      {
-        "unitid": unitid,
-        "test_policy": req.get("test_policy"),
-        "required": req.get("required") or [],
-        "considered": req.get("considered") or [],
-        "not_considered": req.get("not_considered") or [],
-      }
-    )
 
-    # Support notes (skip null/empty)
-    support = data.get("support_notes") or {}
-    if isinstance(support, dict):
-      for key, value in support.items():
-        text = ("" if value is None else str(value)).strip()
-        if not text:
-          continue
-        notes_rows.append(
-          {
-            "unitid": unitid,
-            "key": str(key),
-            "note": text,
-          }
-        )
-
-  if req_rows:
-    sql_req = """
-      INSERT INTO public.institution_requirements (
-        unitid, test_policy, required, considered, not_considered
+def run_loaders(
+  pool: ThreadedConnectionPool,
+  mode: str = "batch",
+  jobs: int = 4,
+  diff: bool = True,
+) -> List[Tuple[str, List[TableLoad], float]]:
+  """
+  Run every loader as soon as the loaders it depends on have finished, at most
+  ``jobs`` at a time, each on its own pooled connection. Returns
+  (loader, table loads, loader seconds) in completion order.
+  """
+  pending = dict(LOADERS)
+  done: set = set()
+  results: List[Tuple[str, List[TableLoad], float]] = []
+  with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+    running: Dict[Any, str] = {}
+    while pending or running:
+      for name in [n for n, (_, deps) in pending.items() if all(d in done for d in deps)]:
+        del pending[name]
+        running[executor.submit(_run_loader, pool, name, mode, diff)] = name
+      if not running:
+        raise RuntimeError(f"Loader dependencies cannot be satisfied: {sorted(pending)}")
+      finished, _ = wait(running, return_when=FIRST_COMPLETED)
+      for future in finished:
+        name = running.pop(future)
+        loads, seconds = future.result()
+        done.add(name)
+        results.append((name, loads, seconds))
+  return results
+
+
+def print_load_report(results: List[Tuple[str, List[TableLoad], float]], wall: float) -> None:
+  def fmt(n: Optional[int]) -> str:
+    return "-" if n is None else f"{n:,}"
+
+  print(
+    f"{'table':<36} {'rows':>10} {'inserted':>9} {'updated':>9} {'unchanged':>10} {'deleted':>8}"
+    f" {'write':>9} {'loader':>9}"
+  )
+  for name, loads, seconds in results:
+    if not loads:
+      print(f"{name:<36} {'-':>10} {'':>9} {'':>9} {'':>10} {'':>8} {'-':>9} {seconds:8.2f}s  (no input)")
+    for load in loads:
+      print(
+        f"{load.table:<36} {load.rows:>10,} {fmt(load.inserted):>9} {fmt(load.updated):>9}"
+        f" {fmt(load.unchanged):>10} {fmt(load.deleted):>8} {load.seconds:8.2f}s {seconds:8.2f}s"
       )
-      VALUES (%(unitid)s, %(test_policy)s, %(required)s, %(considered)s, %(not_considered)s)
-      ON CONFLICT (unitid) DO UPDATE SET
-        test_policy = EXCLUDED.test_policy,
-        required = EXCLUDED.required,
-        considered = EXCLUDED.considered,
-        not_considered = EXCLUDED.not_considered;
-    """
-    with conn.cursor() as cur:
-      execute_batch(cur, sql_req, req_rows, page_size=1000)
-    conn.commit()
+  total = sum(load.rows for _, loads, _ in results for load in loads)
+  print(f"{'total':<36} {total:>10,} {'':>9} {'':>9} {'':>10} {'':>8} {'':>9} {wall:8.2f}s wall")
+
+
+MANAGED_COMMENT = "managed by load_to_postgres.py: "
+API_ROLES = ("anon", "authenticated")
+
 
-  if notes_rows:
-    sql_notes = """
-      INSERT INTO public.institution_support_notes (unitid, key, note)
-      VALUES (%(unitid)s, %(key)s, %(note)s)
-      ON CONFLICT (unitid, key) DO UPDATE SET
-        note = EXCLUDED.note;
-    """
+def _fingerprint(sql: str) -> str:
+  return MANAGED_COMMENT + hashlib.md5(sql.encode("utf-8")).hexdigest()
+
+
+def _comment(cur, name: str) -> Optional[str]:
+  """The comment on ``public.<name>``; "" when it has none and None when it does not exist."""
+  cur.execute("SELECT to_regclass(%s)::oid", (f"public.{name}",))
+  oid = cur.fetchone()[0]
+  if oid is None:
+    return None
+  cur.execute("SELECT obj_description(%s, 'pg_class')", (oid,))
+  return cur.fetchone()[0] or ""
+
+
+def _same_indexdef(cur, index: Index) -> bool:
+  """True when the existing ``public.<index.name>`` is the index ``index`` declares."""
+  cur.execute("SELECT pg_get_indexdef(to_regclass(%s))", (f"public.{index.name}",))
+  existing = cur.fetchone()[0] or ""
+  declared = index.sql().replace(" IF NOT EXISTS ", " ", 1)
+  return existing.split() == declared.split()
+
+
+def _ensure_index(cur, index: Index) -> bool:
+  """
+  Create ``index``, or rebuild it when its declared definition changed. Returns True if
+  built. A same-named index without the managed fingerprint was made by hand: it is
+  never dropped, and only reported when it differs from the declared one.
+  """
+  sql = index.sql()
+  current = _comment(cur, index.name)
+  if current == _fingerprint(sql):
+    return False
+  if current is not None and not current.startswith(MANAGED_COMMENT):
+    if not _same_indexdef(cur, index):
+      print(f"Warning: index {index.name} was not created by this script and differs from schema.py; left as is")
+    return False
+  if current is not None:
+    cur.execute(f"DROP INDEX public.{quote_ident(index.name)};")
+  cur.execute(sql + ";")
+  cur.execute(f"COMMENT ON INDEX public.{quote_ident(index.name)} IS %s;", (_fingerprint(sql),))
+  return True
+
+
+def _view_sql(view: MaterializedView) -> str:
+  return f"CREATE MATERIALIZED VIEW public.{quote_ident(view.name)} AS\n{view.query}\nWITH DATA"
+
+
+def _ensure_view(cur, view: MaterializedView) -> bool:
+  """Create ``view`` (populated) and its indexes, or rebuild it when its definition changed."""
+  sql = _view_sql(view)
+  current = _comment(cur, view.name)
+  rebuilt = current != _fingerprint(sql)
+  if rebuilt:
+    if current is not None:
+      cur.execute(f"DROP MATERIALIZED VIEW public.{quote_ident(view.name)} CASCADE;")
+    cur.execute(sql + ";")
+    cur.execute(f"COMMENT ON MATERIALIZED VIEW public.{quote_ident(view.name)} IS %s;", (_fingerprint(sql),))
+    # Expose to the API when running against Supabase (PostgREST needs the grant).
+    cur.execute("SELECT rolname FROM pg_roles WHERE rolname = ANY(%s)", (list(API_ROLES),))
+    roles = [r[0] for r in cur.fetchall()]
+    if roles:
+      cur.execute(f"GRANT SELECT ON public.{quote_ident(view.name)} TO {', '.join(quote_ident(r) for r in roles)};")
+  for index in view.indexes:
+    _ensure_index(cur, index)
+  return rebuilt
+
+
+def provision_indexes_and_views(conn) -> List[str]:
+  """
+  Bring the declared secondary indexes and materialized views (schema.py) up to date.
+  Each is tagged with a fingerprint of its definition, so unchanged ones are left alone
+  and changed ones are rebuilt. Returns the names of views built in this call.
+  """
+  built_indexes: List[str] = []
+  built_views: List[str] = []
+  with conn.cursor() as cur:
+    extensions_ok = {}
+    for index in INDEXES:
+      ext = index.extension
+      if ext and ext not in extensions_ok:
+        cur.execute("SAVEPOINT ext;")
+        try:
+          cur.execute(f"CREATE EXTENSION IF NOT EXISTS {quote_ident(ext)};")
+          extensions_ok[ext] = True
+        except psycopg2.Error as e:
+          cur.execute("ROLLBACK TO SAVEPOINT ext;")
+          extensions_ok[ext] = False
+          print(f"Warning: extension {ext} unavailable ({e.pgerror or e}); skipping indexes that need it")
+      if ext and not extensions_ok[ext]:
+        continue
+      if _ensure_index(cur, index):
+        built_indexes.append(index.name)
+    for view in MATERIALIZED_VIEWS:
+      if _ensure_view(cur, view):
+        built_views.append(view.name)
+  conn.commit()
+  print(
+    f"Indexes: {len(built_indexes)} built ({', '.join(built_indexes) or 'none'}),"
+    f" {len(INDEXES) - len(built_indexes)} up to date."
+    f" Materialized views built: {', '.join(built_views) or 'none'}"
+  )
+  return built_views
+
+
+def refresh_views(conn, results: List[Tuple[str, List[TableLoad], float]], skip: Sequence[str] = ()) -> None:
+  """REFRESH ... CONCURRENTLY every view whose source tables changed in this load."""
+  changed = set()
+  for _, loads, _ in results:
+    for load in loads:
+      if load.inserted is None:
+        if load.rows:
+          changed.add(load.table)
+      elif load.inserted or load.updated or load.deleted:
+        changed.add(load.table)
+  for view in MATERIALIZED_VIEWS:
+    if view.name in skip:
+      continue
+    if not changed.intersection(view.sources):
+      print(f"View {view.name}: sources unchanged, not refreshed")
+      continue
+    start = time.perf_counter()
     with conn.cursor() as cur:
-      execute_batch(cur, sql_notes, notes_rows, page_size=1000)
+      cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY public.{quote_ident(view.name)};")
     conn.commit()
+    print(f"View {view.name}: refreshed concurrently in {time.perf_counter() - start:.2f}s")
+
+
+def _plan_indexes(node: Dict[str, Any]) -> Set[str]:
+  found = {node["Index Name"]} if "Index Name" in node else set()
+  for child in node.get("Plans", []):
+    found |= _plan_indexes(child)
+  return found
+
+
+def check_hot_queries(conn) -> List[str]:
+  """
+  EXPLAIN each declared hot query and check its plan uses one of the expected indexes.
+  Sequential scans are disabled for the check, so a tiny table still shows whether the
+  index is usable at all. Returns the labels of queries that do not use one.
+  """
+  failures = []
+  with conn.cursor() as cur:
+    cur.execute("SET LOCAL enable_seqscan = off;")
+    for query in HOT_QUERIES:
+      cur.execute("EXPLAIN (FORMAT JSON) " + query.sql)
+      plan = cur.fetchone()[0]
+      if isinstance(plan, str):
+        plan = json.loads(plan)
+      used = _plan_indexes(plan[0]["Plan"])
+      ok = bool(used.intersection(query.expects))
+      print(f"  plan check {query.label:<36} {'ok' if ok else 'NOT USING ' + ' / '.join(query.expects)}")
+      if not ok:
+        failures.append(query.label)
+  conn.rollback()
+  return failures
 
 
 def main() -> None:
@@ -640,20 +587,50 @@ def main() -> None:
   parser.add_argument(
     "--create-tables-only",
     action="store_true",
-    help="Only create tables, do not load any data.",
+    help="Only create tables, indexes and views; do not load any data.",
+  )
+  parser.add_argument(
+    "--mode",
+    choices=LOAD_MODES,
+    default="batch",
+    help="batch: row-by-row upserts via execute_batch (default); "
+    "copy: COPY into a temp staging table, then one INSERT ... SELECT ... ON CONFLICT per table",
+  )
+  parser.add_argument(
+    "--jobs",
+    type=int,
+    default=4,
+    help="Connections used to load independent tables concurrently (default 4; 1 loads serially)",
+  )
+  parser.add_argument(
+    "--full-reload",
+    action="store_true",
+    help="Upsert every row regardless of stored row hashes, and delete nothing.",
   )
   args = parser.parse_args()
 
-  conn = get_db_conn()
+  url = get_db_url()
+  conn = psycopg2.connect(url)
   try:
     create_tables(conn)
-    if not args.create_tables_only:
-      load_institutions(conn)
-      load_institution_locations(conn)
-      load_institution_metrics(conn)
-      load_majors_meta(conn)
-      load_institution_majors(conn)
-      load_institution_requirements_and_support(conn)
+    if args.create_tables_only:
+      provision_indexes_and_views(conn)
+      return
+
+    pool = ThreadedConnectionPool(1, max(1, args.jobs), url)
+    try:
+      start = time.perf_counter()
+      results = run_loaders(pool, args.mode, args.jobs, diff=not args.full_reload)
+      print_load_report(results, time.perf_counter() - start)
+    finally:
+      pool.closeall()
+
+    # Views are created populated, so only existing ones need a refresh.
+    built = provision_indexes_and_views(conn)
+    refresh_views(conn, results, skip=built)
+    failures = check_hot_queries(conn)
+    if failures:
+      print(f"Warning: {len(failures)} hot queries do not use their index: {', '.join(failures)}")
   finally:
     conn.close()
 
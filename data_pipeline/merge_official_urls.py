@@ -5,8 +5,13 @@ import json
 import os
 import re
 import sys
+from functools import partial
+from pathlib import Path
 from urllib.parse import urlparse, urlunparse
 
+from artifacts import SizeReport, add_output_format_arg, json_text, write_json_artifact
+from schema import table_rows, write_load_table
+
 
 def sniff_dialect(path: str):
   with open(path, "r", encoding="utf-8", errors="replace") as f:
@@ -69,6 +74,11 @@ def main() -> int:
     "--backup", action="store_true", help="write institutions.json.bak before saving"
   )
   ap.add_argument("--dry_run", action="store_true")
+  ap.add_argument(
+    "--load_dir",
+    help="load_to_postgres bundle to refresh (default: load/ next to --institutions)",
+  )
+  add_output_format_arg(ap)
   args = ap.parse_args()
 
   # load institutions json
@@ -156,9 +166,14 @@ def main() -> int:
       json.dump(institutions, bf, indent=2, ensure_ascii=False)
     print(f"Wrote backup: {bak}")
 
-  with open(args.institutions, "w", encoding="utf-8") as f:
-    json.dump(institutions, f, indent=2, ensure_ascii=False)
+  report = SizeReport()
+  write_json_artifact(Path(args.institutions), partial(json_text, institutions), args.output_format, report)
   print(f"Wrote updated: {args.institutions}")
+
+  load_dir = Path(args.load_dir or os.path.join(os.path.dirname(args.institutions), "load"))
+  count = write_load_table(load_dir, "institutions", table_rows("institutions", institutions))
+  print(f"Wrote load bundle: institutions {count:,} rows in {load_dir}")
+  report.print()
   return 0
 
 
@@ -0,0 +1,470 @@
+"""
+The Postgres tables the pipeline loads, defined once.
+
+``load_to_postgres.SCHEMA_SQL``, ``export_institutions_sql.py`` and the scripts that
+produce the data all take their column lists from ``TABLES``. The row builders below
+turn ETL output records into table rows for every producer and for the loader.
+``INDEXES``, ``MATERIALIZED_VIEWS`` and ``HOT_QUERIES`` declare the secondary indexes
+and latest-year views the loader provisions, and the queries that must use them.
+
+Producers also write a load bundle: one ``<load dir>/<table>.ndjson`` per table,
+whose first line is a header naming the table and its columns, followed by one JSON
+array of values per row in that column order. The loader streams these files instead
+of re-parsing the aggregate JSON and thousands of per-institution files.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+BUNDLE_VERSION = 1
+HASH_COLUMN = "row_hash"
+MAJOR_LEVELS = (("two_digit", "2-digit"), ("four_digit", "4-digit"), ("six_digit", "6-digit"))
+
+
+class Column(NamedTuple):
+    name: str
+    ddl: str  # type and column constraints, as written in CREATE TABLE
+    source: Optional[str] = None  # field in the ETL output, when it differs from ``name``
+
+
+class Table(NamedTuple):
+    name: str
+    columns: Tuple[Column, ...]
+    key: Tuple[str, ...]
+    constraints: Tuple[str, ...] = ()
+
+    @property
+    def column_names(self) -> List[str]:
+        return [c.name for c in self.columns]
+
+
+def _numeric(*names: str) -> Tuple[Column, ...]:
+    return tuple(Column(n, "numeric") for n in names)
+
+
+SAT_ACT_SCORES = tuple(
+    f"{test}_{p}th_percentile_score"
+    for test in (
+        "sat_evidence_based_reading_and_writing",
+        "sat_math",
+        "act_composite",
+        "act_english",
+        "act_math",
+    )
+    for p in (25, 50, 75)
+)
+
+TABLES: Dict[str, Table] = {
+    t.name: t
+    for t in (
+        Table(
+            "institutions",
+            (
+                Column("unitid", "integer PRIMARY KEY"),
+                Column("name", "text NOT NULL"),
+                Column("city", "text"),
+                Column("state", "text"),
+                Column("control", "text"),
+                Column("level", "text"),
+                Column("carnegie_basic", "text"),
+            )
+            + _numeric(
+                "acceptance_rate",
+                "yield",
+                "tuition_2023_24",
+                "tuition_2023_24_in_state",
+                "tuition_2023_24_out_of_state",
+                "grad_rate_6yr",
+                "intl_enrollment_pct",
+                "full_time_retention_rate",
+                "student_to_faculty_ratio",
+                "total_enrollment",
+            )
+            + (
+                Column("website", "text"),
+                Column("admissions_url", "text"),
+                Column("financial_aid_url", "text"),
+                Column("application_url", "text"),
+                Column("test_policy", "text"),
+                Column("major_families", "text[]"),
+            ),
+            ("unitid",),
+        ),
+        Table(
+            "institution_locations",
+            (
+                Column("unitid", "integer PRIMARY KEY REFERENCES public.institutions(unitid) ON DELETE CASCADE"),
+                Column("location_type", "text", "UniLocation"),
+                Column("location_size", "text", "LocationSize"),
+                Column("title_iv_indicator", "text", "HD2024.Postsecondary and Title IV institution indicator"),
+            ),
+            ("unitid",),
+        ),
+        Table(
+            "institution_metrics",
+            (
+                Column("unitid", "integer REFERENCES public.institutions(unitid) ON DELETE CASCADE"),
+                Column("year", "integer"),
+            )
+            + _numeric(
+                "applicants_total",
+                "admissions_total",
+                "enrolled_total",
+                "percent_admitted_total",
+                "admissions_yield_total",
+            )
+            + (Column("graduation_rate_bachelor_6yr", "numeric", "graduation_rate_bachelor_degree_within_6_years_total"),)
+            + _numeric("full_time_retention_rate", "student_to_faculty_ratio", "total_enrollment")
+            + _numeric(*SAT_ACT_SCORES)
+            + (
+                Column(
+                    "sat_submitters_count",
+                    "numeric",
+                    "number_of_first_time_degree_certificate_seeking_students_submitting_sat_scores",
+                ),
+                Column(
+                    "sat_submitters_percent",
+                    "numeric",
+                    "percent_of_first_time_degree_certificate_seeking_students_submitting_sat_scores",
+                ),
+                Column(
+                    "act_submitters_count",
+                    "numeric",
+                    "number_of_first_time_degree_certificate_seeking_students_submitting_act_scores",
+                ),
+                Column(
+                    "act_submitters_percent",
+                    "numeric",
+                    "percent_of_first_time_degree_certificate_seeking_students_submitting_act_scores",
+                ),
+            )
+            + _numeric("percent_of_total_enrollment_that_are_u_s_nonresident", "admitted_est", "enrolled_est"),
+            ("unitid", "year"),
+            ("PRIMARY KEY (unitid, year)",),
+        ),
+        Table(
+            "majors_meta",
+            (
+                Column("cip_code", "text PRIMARY KEY"),
+                Column("cip_level", "text NOT NULL"),
+                Column("title", "text NOT NULL"),
+            ),
+            ("cip_code",),
+        ),
+        Table(
+            "institution_majors",
+            (
+                Column("unitid", "integer REFERENCES public.institutions(unitid) ON DELETE CASCADE"),
+                Column("cip_level", "text NOT NULL"),
+                Column("cip_code", "text NOT NULL"),
+            ),
+            ("unitid", "cip_level", "cip_code"),
+            (
+                "PRIMARY KEY (unitid, cip_level, cip_code)",
+                "FOREIGN KEY (cip_code) REFERENCES public.majors_meta(cip_code) ON DELETE CASCADE",
+            ),
+        ),
+        Table(
+            "institution_requirements",
+            (
+                Column("unitid", "integer PRIMARY KEY REFERENCES public.institutions(unitid) ON DELETE CASCADE"),
+                Column("test_policy", "text"),
+                Column("required", "text[]"),
+                Column("considered", "text[]"),
+                Column("not_considered", "text[]"),
+            ),
+            ("unitid",),
+        ),
+        Table(
+            "institution_support_notes",
+            (
+                Column("unitid", "integer REFERENCES public.institutions(unitid) ON DELETE CASCADE"),
+                Column("key", "text NOT NULL"),
+                Column("note", "text NOT NULL"),
+            ),
+            ("unitid", "key"),
+            ("PRIMARY KEY (unitid, key)",),
+        ),
+    )
+}
+
+
+# ---------- SQL rendering ----------
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def copy_text_value(value: Any) -> str:
+    """Render one value in COPY text format (NULL is \\N; arrays become text[] literals)."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        items = []
+        for v in value:
+            if v is None:
+                items.append("NULL")
+            else:
+                items.append('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"')
+        value = "{" + ",".join(items) + "}"
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def on_conflict(columns: Sequence[str], key: Sequence[str], update: bool = True) -> str:
+    """ON CONFLICT clause that overwrites every non-key column (or does nothing)."""
+    updates = [c for c in columns if c not in key]
+    if update and updates:
+        action = "DO UPDATE SET " + ", ".join(f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in updates)
+    else:
+        action = "DO NOTHING"
+    return f"ON CONFLICT ({', '.join(quote_ident(c) for c in key)}) {action}"
+
+
+class Index(NamedTuple):
+    name: str
+    table: str  # table or materialized view in ``public``
+    using: str  # access method and columns, e.g. "btree (state)"
+    unique: bool = False
+    extension: Optional[str] = None  # extension the operator class comes from
+
+    def sql(self) -> str:
+        unique = "UNIQUE " if self.unique else ""
+        return f"CREATE {unique}INDEX IF NOT EXISTS {self.name} ON public.{self.table} USING {self.using}"
+
+
+class MaterializedView(NamedTuple):
+    name: str
+    query: str
+    indexes: Tuple[Index, ...]  # must include a unique index for REFRESH ... CONCURRENTLY
+    sources: Tuple[str, ...]  # tables whose changes make the view stale
+
+
+class HotQuery(NamedTuple):
+    label: str
+    sql: str
+    expects: Tuple[str, ...]  # index names; the plan must use at least one
+
+
+INDEXES: Tuple[Index, ...] = (
+    Index("institutions_state_idx", "institutions", "btree (state)"),
+    Index("institutions_control_idx", "institutions", "btree (control)"),
+    Index("institutions_test_policy_idx", "institutions", "btree (test_policy)"),
+    Index("institutions_acceptance_rate_idx", "institutions", "btree (acceptance_rate)"),
+    Index("institutions_major_families_idx", "institutions", "gin (major_families)"),
+    Index("institutions_name_trgm_idx", "institutions", "gin (name gin_trgm_ops)", extension="pg_trgm"),
+    Index("institution_majors_cip_code_idx", "institution_majors", "btree (cip_code, cip_level)"),
+)
+
+_METRIC_COLUMNS = ", ".join(TABLES["institution_metrics"].column_names)
+
+MATERIALIZED_VIEWS: Tuple[MaterializedView, ...] = (
+    MaterializedView(
+        "top_applicants_latest",
+        """SELECT DISTINCT ON (m.unitid) m.unitid, m.year, m.applicants_total
+FROM public.institution_metrics m
+WHERE m.applicants_total IS NOT NULL
+ORDER BY m.unitid, m.year DESC""",
+        (
+            Index("top_applicants_latest_unitid_idx", "top_applicants_latest", "btree (unitid)", unique=True),
+            # PostgREST's order=applicants_total.desc is DESC NULLS FIRST; match it exactly.
+            Index("top_applicants_latest_applicants_total_idx", "top_applicants_latest", "btree (applicants_total DESC)"),
+        ),
+        ("institution_metrics", "institutions"),
+    ),
+    MaterializedView(
+        "institution_metrics_latest",
+        f"""SELECT DISTINCT ON (unitid) {_METRIC_COLUMNS}
+FROM public.institution_metrics
+ORDER BY unitid, year DESC""",
+        (Index("institution_metrics_latest_unitid_idx", "institution_metrics_latest", "btree (unitid)", unique=True),),
+        ("institution_metrics", "institutions"),
+    ),
+)
+
+HOT_QUERIES: Tuple[HotQuery, ...] = (
+    HotQuery(
+        "top applicants",
+        "SELECT unitid FROM public.top_applicants_latest ORDER BY applicants_total DESC LIMIT 1000",
+        ("top_applicants_latest_applicants_total_idx",),
+    ),
+    HotQuery(
+        "latest metrics for one institution",
+        "SELECT * FROM public.institution_metrics_latest WHERE unitid = 100654",
+        ("institution_metrics_latest_unitid_idx",),
+    ),
+    HotQuery("filter by state", "SELECT unitid FROM public.institutions WHERE state = 'CA'", ("institutions_state_idx",)),
+    HotQuery(
+        "filter by control and test policy",
+        "SELECT unitid FROM public.institutions WHERE control = 'Public' AND test_policy = 'Test optional'",
+        ("institutions_control_idx", "institutions_test_policy_idx"),
+    ),
+    HotQuery(
+        "acceptance-rate range",
+        "SELECT unitid FROM public.institutions WHERE acceptance_rate BETWEEN 10 AND 30",
+        ("institutions_acceptance_rate_idx",),
+    ),
+    HotQuery(
+        "major family",
+        "SELECT unitid FROM public.institutions WHERE major_families @> ARRAY['Engineering']",
+        ("institutions_major_families_idx",),
+    ),
+    HotQuery(
+        "name substring",
+        "SELECT unitid FROM public.institutions WHERE name ILIKE '%state univ%'",
+        ("institutions_name_trgm_idx",),
+    ),
+    HotQuery(
+        "institutions offering a major",
+        "SELECT unitid FROM public.institution_majors WHERE cip_code = '14.08'",
+        ("institution_majors_cip_code_idx",),
+    ),
+)
+
+
+def schema_sql() -> str:
+    creates = []
+    for table in TABLES.values():
+        lines = [f"  {c.name} {c.ddl}" for c in table.columns] + [f"  {c}" for c in table.constraints]
+        creates.append(f"CREATE TABLE IF NOT EXISTS public.{table.name} (\n" + ",\n".join(lines) + "\n);")
+    alters = [f"ALTER TABLE public.{name} ADD COLUMN IF NOT EXISTS {HASH_COLUMN} text;" for name in TABLES]
+    return (
+        "\n\n".join(creates)
+        + "\n\n-- Content hash of each row as last loaded, so reloads can skip unchanged rows.\n"
+        + "\n".join(alters)
+        + "\n"
+    )
+
+
+def missing_sources(table: str, fields: Iterable[str], skip: Iterable[str] = ()) -> List[str]:
+    """Schema columns of ``table`` whose source field is not among ``fields``."""
+    present = set(fields)
+    skipped = set(skip)
+    return [
+        c.name
+        for c in TABLES[table].columns
+        if c.name not in skipped and (c.source or c.name) not in present
+    ]
+
+
+# ---------- row builders ----------
+def table_row(table: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Map one output record onto ``table``'s columns. Integer key columns are coerced to
+    int (rows where that fails are dropped, returning None); missing arrays become [].
+    """
+    row: Dict[str, Any] = {}
+    spec = TABLES[table]
+    for col in spec.columns:
+        value = record.get(col.source or col.name)
+        if col.name in spec.key and col.ddl.startswith("integer"):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None
+        elif col.ddl.startswith("text[]"):
+            value = value or []
+        row[col.name] = value
+    return row
+
+
+def table_rows(table: str, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for record in records:
+        row = table_row(table, record)
+        if row is not None:
+            yield row
+
+
+def majors_meta_rows(meta: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Rows for majors_meta from majors_bachelor_meta.json; codes without a title are skipped."""
+    for level_key, level_label in MAJOR_LEVELS:
+        mapping = meta.get(level_key)
+        if not isinstance(mapping, dict):
+            continue
+        for code, title in mapping.items():
+            if not code:
+                continue
+            t = (str(title) if title is not None else "").strip()
+            if not t:
+                continue
+            yield {"cip_code": str(code), "cip_level": level_label, "title": t}
+
+
+def institution_majors_rows(by_inst: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Rows for institution_majors from majors_bachelor_by_institution.json."""
+    for unitid_str, payload in by_inst.items():
+        try:
+            unitid = int(unitid_str)
+        except ValueError:
+            continue
+        if not isinstance(payload, dict):
+            continue
+        for level_key, level_label in MAJOR_LEVELS:
+            codes = payload.get(level_key) or []
+            if not isinstance(codes, list):
+                continue
+            for code in codes:
+                if code:
+                    yield {"unitid": unitid, "cip_level": level_label, "cip_code": str(code)}
+
+
+def requirement_row(unitid: int, requirements: Dict[str, Any]) -> Dict[str, Any]:
+    """Row for institution_requirements from a detail file's ``requirements`` block."""
+    return table_row("institution_requirements", {"unitid": unitid, **requirements})
+
+
+def support_note_rows(unitid: int, support: Any) -> Iterator[Dict[str, Any]]:
+    """Rows for institution_support_notes from a detail file's ``support_notes``; empty notes are skipped."""
+    if not isinstance(support, dict):
+        return
+    for key, value in support.items():
+        text = ("" if value is None else str(value)).strip()
+        if text:
+            yield {"unitid": unitid, "key": str(key), "note": text}
+
+
+# ---------- load bundle ----------
+def bundle_path(load_dir: Path, table: str) -> Path:
+    return Path(load_dir) / f"{table}.ndjson"
+
+
+def write_load_table(load_dir: Path, table: str, rows: Iterable[Dict[str, Any]]) -> int:
+    """Write ``rows`` (dicts keyed by column) as ``<table>.ndjson``; returns the row count."""
+    columns = TABLES[table].column_names
+    path = bundle_path(load_dir, table)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp.open("w", encoding="utf-8", newline="\n") as f:
+        header = {"table": table, "version": BUNDLE_VERSION, "columns": columns}
+        f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for row in rows:
+            f.write(json.dumps([row[c] for c in columns], separators=(",", ":"), ensure_ascii=False) + "\n")
+            count += 1
+    tmp.replace(path)
+    return count
+
+
+def read_load_table(load_dir: Path, table: str) -> Optional[Iterator[Dict[str, Any]]]:
+    """
+    Stream the rows of ``<table>.ndjson`` as dicts, or return None when the bundle has
+    no file for ``table``. A file written for different columns raises ValueError.
+    """
+    path = bundle_path(load_dir, table)
+    if not path.exists():
+        return None
+    columns = TABLES[table].column_names
+    with path.open("r", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+    if header.get("version") != BUNDLE_VERSION or header.get("columns") != columns:
+        raise ValueError(f"{path} does not match the current schema for {table}; regenerate it")
+
+    def rows() -> Iterator[Dict[str, Any]]:
+        with path.open("r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                if line.strip():
+                    yield dict(zip(columns, json.loads(line)))
+
+    return rows()
@@ -0,0 +1,304 @@
+"""
+Prefix-sharded search index over institutions_index (name, city, state).
+
+Names are normalized (accents folded, lower-cased, punctuation -> spaces) and split
+into tokens. Every token of two or more characters that is not a stopword is posted
+to the shard named by its first two characters, e.g. ``chicago`` -> ``search/ch.json``:
+
+    {"prefix": "ch",
+     "docs": [[unitid, name, city, state], ...],
+     "tokens": {"chicago": [0, 5, ...], "chapel": [3], ...}}   # local doc positions
+
+Shards holding more than MAX_SHARD_DOCS docs are split by one more character (up to
+MAX_PREFIX_LEN), so common prefixes such as "co" become "col", "com", ...; a token
+always lives in the shard with the longest key that is a prefix of it.
+
+Tokens found in more than MAX_TOKEN_DOCS docs ("university", "college") are not posted:
+their shards would copy most of the table. They are listed in the manifest as
+``common`` and still count when matching and ranking, but cannot pick the shards.
+
+``search/manifest.json`` lists every shard with its doc count and byte size. To answer
+a query the client normalizes it and, for each query token that no common token starts
+with, works out which shards could hold tokens starting with it (``shards_for_token``).
+It fetches the cheapest such set, takes the docs posted under tokens starting with that
+token, keeps those whose fields match *every* query token by prefix, and ranks them with
+``score``. A query made only of common tokens (or prefixes of them) returns nothing.
+``SearchIndex.search`` below is the reference implementation.
+"""
+import json
+import re
+import unicodedata
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from artifacts import SizeReport, json_text, remove_compressed_siblings, write_json_artifact
+
+VERSION = 2
+PREFIX_LEN = 2
+MAX_PREFIX_LEN = 4
+MAX_SHARD_DOCS = 300
+MAX_TOKEN_DOCS = 1000
+STOPWORDS = frozenset({"of", "the", "and", "at", "in", "for", "de", "la", "los", "las", "del", "y"})
+
+Doc = Tuple[int, str, Optional[str], Optional[str]]
+
+
+def normalize(text: Optional[str]) -> str:
+    if not isinstance(text, str):
+        return ""
+    folded = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch)).lower()
+    return re.sub(r"[^a-z0-9]+", " ", folded).strip()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return normalize(text).split()
+
+
+def index_tokens(text: Optional[str]) -> List[str]:
+    return [t for t in tokenize(text) if len(t) >= PREFIX_LEN and t not in STOPWORDS]
+
+
+def doc_tokens(text: Optional[str]) -> List[str]:
+    """Tokens a document can be matched on: like index_tokens, but short tokens count too."""
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def common_tokens(postings: Dict[str, List[int]]) -> List[str]:
+    """Tokens posted under more than MAX_TOKEN_DOCS docs, which the index leaves out."""
+    return sorted(tok for tok, ids in postings.items() if len(ids) > MAX_TOKEN_DOCS)
+
+
+def _postings(docs: Iterable[Sequence]) -> Dict[str, List[int]]:
+    postings: Dict[str, List[int]] = {}
+    for doc_id, (_, name, city, state) in enumerate(docs):
+        tokens = set(index_tokens(name)) | set(index_tokens(city)) | set(index_tokens(state))
+        for token in tokens:
+            postings.setdefault(token, []).append(doc_id)
+    return postings
+
+
+# ---------- build ----------
+def _place(key: str, by_token: Dict[str, List[int]], placed: Dict[str, Dict[str, List[int]]]) -> None:
+    """Assign tokens to ``key``, splitting it by the next character while it is too large."""
+    doc_count = len({d for ids in by_token.values() for d in ids})
+    if doc_count <= MAX_SHARD_DOCS or len(key) >= MAX_PREFIX_LEN:
+        placed[key] = by_token
+        return
+    exact = {tok: ids for tok, ids in by_token.items() if tok == key}
+    if exact:
+        placed[key] = exact
+    children: Dict[str, Dict[str, List[int]]] = {}
+    for tok, ids in by_token.items():
+        if tok != key:
+            children.setdefault(tok[: len(key) + 1], {})[tok] = ids
+    for child, sub in children.items():
+        _place(child, sub, placed)
+
+
+def index_docs(index_df: pd.DataFrame) -> List[Doc]:
+    """The named institutions of an institutions_index frame, by unitid."""
+    frame = index_df.dropna(subset=["name"]).sort_values("unitid", kind="stable")
+    return [
+        (
+            int(row.unitid),
+            row.name,
+            row.city if isinstance(row.city, str) else None,
+            row.state if isinstance(row.state, str) else None,
+        )
+        for row in frame[["unitid", "name", "city", "state"]].itertuples(index=False)
+    ]
+
+
+def build_search_index(index_df: pd.DataFrame) -> Tuple[dict, Dict[str, dict]]:
+    """Return (manifest, shards) for an institutions_index frame."""
+    docs = index_docs(index_df)
+    postings = _postings(docs)
+    common = common_tokens(postings)
+    for token in common:
+        del postings[token]
+
+    grouped: Dict[str, Dict[str, List[int]]] = {}
+    for token, ids in postings.items():
+        grouped.setdefault(token[:PREFIX_LEN], {})[token] = ids
+    placed: Dict[str, Dict[str, List[int]]] = {}
+    for key, by_token in grouped.items():
+        _place(key, by_token, placed)
+
+    shards: Dict[str, dict] = {}
+    for key in sorted(placed):
+        by_token = placed[key]
+        members = sorted({d for ids in by_token.values() for d in ids})
+        local = {d: i for i, d in enumerate(members)}
+        shards[key] = {
+            "prefix": key,
+            "docs": [list(docs[d]) for d in members],
+            "tokens": {tok: [local[d] for d in ids] for tok, ids in sorted(by_token.items())},
+        }
+
+    manifest = {
+        "version": VERSION,
+        "prefix_len": PREFIX_LEN,
+        "max_prefix_len": MAX_PREFIX_LEN,
+        "stopwords": sorted(STOPWORDS),
+        "common": common,
+        "doc_count": len(docs),
+        "shards": {key: {"docs": len(shard["docs"])} for key, shard in shards.items()},
+    }
+    return manifest, shards
+
+
+def write_search_index(
+    index_df: pd.DataFrame,
+    out_dir: Path,
+    output_format: str = "pretty",
+    report: Optional[SizeReport] = None,
+) -> Tuple[dict, Dict[str, dict]]:
+    """Write one file per shard plus the manifest, which records each shard's minified size."""
+    manifest, shards = build_search_index(index_df)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for key, shard in shards.items():
+        manifest["shards"][key]["bytes"] = len(json_text(shard, pretty=False).encode("utf-8"))
+        write_json_artifact(out_dir / f"{key}.json", partial(json_text, shard), output_format, report)
+    write_json_artifact(out_dir / "manifest.json", partial(json_text, manifest), output_format, report)
+
+    keep = {f"{key}.json" for key in shards} | {"manifest.json"}
+    for path in out_dir.glob("*.json"):
+        if path.name not in keep:
+            path.unlink()
+            remove_compressed_siblings(path)
+    return manifest, shards
+
+
+# ---------- query ----------
+def query_tokens(query: str) -> List[str]:
+    return [t for t in tokenize(query) if t not in STOPWORDS]
+
+
+def shards_for_token(manifest: dict, token: str) -> List[str]:
+    """Keys of every shard that can hold a token starting with ``token``."""
+    keys = manifest["shards"]
+    chosen = [k for k in keys if len(k) > len(token) and k.startswith(token)]
+    covering = [k for k in keys if token.startswith(k)]
+    if covering:
+        chosen.append(max(covering, key=len))
+    return sorted(chosen)
+
+
+def pivot_candidates(tokens: Sequence[str], common: Sequence[str]) -> List[str]:
+    """Query tokens whose matching docs are all posted: long enough, and no common token starts with them."""
+    return [t for t in tokens if len(t) >= PREFIX_LEN and not any(c.startswith(t) for c in common)]
+
+
+def choose_pivot(manifest: dict, tokens: Sequence[str]) -> Optional[str]:
+    """The query token whose shards hold the fewest docs in total."""
+    candidates = pivot_candidates(tokens, manifest["common"])
+    if not candidates:
+        return None
+
+    def cost(token: str) -> Tuple[int, int]:
+        return sum(manifest["shards"][k]["docs"] for k in shards_for_token(manifest, token)), -len(token)
+
+    return min(candidates, key=cost)
+
+
+def _field_score(query_token: str, fields: Sequence[Tuple[List[str], float]]) -> float:
+    best = 0.0
+    for tokens, weight in fields:
+        for tok in tokens:
+            if tok == query_token:
+                best = max(best, 2.0 * weight)
+            elif tok.startswith(query_token):
+                best = max(best, 1.5 * weight)
+    return best
+
+
+def score(doc: Sequence, tokens: Sequence[str], query_text: str) -> float:
+    """
+    0 when some query token matches no name/city/state token by prefix; otherwise
+    exact > prefix, name > city > state, plus bonuses when the whole query matches the
+    start of (or all of) the normalized name.
+    """
+    _, name, city, state = doc
+    fields = [(doc_tokens(name), 2.0), (doc_tokens(city), 1.0), (doc_tokens(state), 0.5)]
+    total = 0.0
+    for token in tokens:
+        s = _field_score(token, fields)
+        if s == 0.0:
+            return 0.0
+        total += s
+    norm_name = normalize(name)
+    if query_text and norm_name == query_text:
+        total += 10.0
+    elif query_text and norm_name.startswith(query_text):
+        total += 5.0
+    return total
+
+
+def rank(docs: Iterable[Sequence], query: str, limit: int = 20) -> List[dict]:
+    """Score ``docs`` against ``query``; best first, then shorter names, then unitid."""
+    tokens = query_tokens(query)
+    query_text = normalize(query)
+    ranked = []
+    for doc in docs:
+        s = score(doc, tokens, query_text)
+        if s > 0:
+            ranked.append((-s, len(doc[1]), doc[0], doc))
+    ranked.sort(key=lambda r: r[:3])
+    return [
+        {"unitid": doc[0], "name": doc[1], "city": doc[2], "state": doc[3], "score": -neg}
+        for neg, _, _, doc in ranked[:limit]
+    ]
+
+
+def search_shards(shards: Sequence[dict], pivot: str, query: str, limit: int = 20) -> List[dict]:
+    """Rank the docs of ``shards`` posted under tokens starting with ``pivot``."""
+    candidates: Dict[int, Sequence] = {}
+    for shard in shards:
+        for tok, ids in shard["tokens"].items():
+            if tok.startswith(pivot):
+                for d in ids:
+                    doc = shard["docs"][d]
+                    candidates[doc[0]] = doc
+    return rank(candidates.values(), query, limit)
+
+
+class SearchIndex:
+    """Reads a written index lazily, loading (and caching) only the shards a query needs."""
+
+    def __init__(self, index_dir: Path, loader: Optional[Callable[[Path], dict]] = None):
+        self.index_dir = Path(index_dir)
+        self._load = loader or (lambda p: json.loads(p.read_text(encoding="utf-8")))
+        self.manifest = self._load(self.index_dir / "manifest.json")
+        self._shards: Dict[str, dict] = {}
+        self.shards_loaded: List[str] = []
+
+    def shard(self, key: str) -> Optional[dict]:
+        if key not in self.manifest["shards"]:
+            return None
+        if key not in self._shards:
+            self._shards[key] = self._load(self.index_dir / f"{key}.json")
+            self.shards_loaded.append(key)
+        return self._shards[key]
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        pivot = choose_pivot(self.manifest, query_tokens(query))
+        if pivot is None:
+            return []
+        shards = [self.shard(key) for key in shards_for_token(self.manifest, pivot)]
+        return search_shards([s for s in shards if s], pivot, query, limit)
+
+
+def search(index_dir: Path, query: str, limit: int = 20) -> List[dict]:
+    return SearchIndex(index_dir).search(query, limit)
+
+
+def brute_force_search(docs: Iterable[Sequence], query: str, limit: int = 20) -> List[dict]:
+    """Scores every doc; used to check that shard lookups return the same results."""
+    docs = list(docs)
+    if not pivot_candidates(query_tokens(query), common_tokens(_postings(docs))):
+        return []
+    return rank(docs, query, limit)
@@ -1,15 +1,25 @@
+import asyncio
+import hashlib
 import json
+import logging
+import math
 import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
-import google.generativeai as genai
-from dotenv import load_dotenv
-from supabase import Client, create_client
+from adcom_retrieval import CHARS_PER_TOKEN, BM25Index, build_index, estimate_tokens, profile_query, render_context
 
 
 ROOT = Path(__file__).resolve().parent
+logger = logging.getLogger(__name__)
 
 
 def _load_env() -> None:
@@ -17,6 +27,8 @@ def _load_env() -> None:
   Load environment variables from .env.local (if present) plus the
   standard .env chain, without overwriting existing vars.
   """
+  from dotenv import load_dotenv
+
   env_local = ROOT / ".env.local"
   if env_local.exists():
     load_dotenv(dotenv_path=env_local, override=False)
@@ -24,27 +36,262 @@ def _load_env() -> None:
     load_dotenv(override=False)
 
 
-_load_env()
+_env_loaded = False
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-  raise RuntimeError(
-    "Missing SUPABASE_URL or SUPABASE_KEY in environment. "
-    "Set them in your .env.local file at project root."
-  )
+def _require_env(*names: str) -> List[str]:
+  """Values of ``names``, loading .env.local on first use; raises if any is missing."""
+  global _env_loaded
+  if not _env_loaded:
+    _load_env()
+    _env_loaded = True
+  values = [os.getenv(n) for n in names]
+  missing = [n for n, v in zip(names, values) if not v]
+  if missing:
+    raise RuntimeError(
+      f"Missing {' or '.join(missing)} in environment. "
+      f"Set {'it' if len(missing) == 1 else 'them'} in your .env.local file at project root."
+    )
+  return values  # type: ignore[return-value]
 
-if not GEMINI_API_KEY:
-  raise RuntimeError(
-    "Missing GEMINI_API_KEY in environment. "
-    "Set it in your .env.local file at project root."
-  )
+
+# ---------- clients ----------
+# The Supabase client and the Gemini model are created on first use, once per process,
+# so importing this module needs no network config and no heavy SDK imports. Tests and
+# workers can swap either with set_client_factory().
+def _create_supabase() -> Any:
+  from supabase import create_client
+
+  url, key = _require_env("SUPABASE_URL", "SUPABASE_KEY")
+  return create_client(url, key)
+
+
+def _create_model() -> Any:
+  import google.generativeai as genai
+
+  (api_key,) = _require_env("GEMINI_API_KEY")
+  genai.configure(api_key=api_key)
+  return genai.GenerativeModel(MODEL_NAME)
+
+
+_client_factories: Dict[str, Callable[[], Any]] = {
+  "supabase": _create_supabase,
+  "model": _create_model,
+}
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def set_client_factory(name: str, factory: Callable[[], Any]) -> None:
+  """Use ``factory`` to build client ``name`` ("supabase" or "model") from now on."""
+  if name not in _client_factories:
+    raise KeyError(f"Unknown client {name!r}; expected one of {sorted(_client_factories)}")
+  with _clients_lock:
+    _client_factories[name] = factory
+    _clients.pop(name, None)
+
+
+def reset_clients() -> None:
+  """Drop the built clients; the next use builds them again."""
+  with _clients_lock:
+    _clients.clear()
+
+
+def get_client(name: str) -> Any:
+  client = _clients.get(name)
+  if client is None:
+    with _clients_lock:
+      client = _clients.get(name)
+      if client is None:
+        client = _clients[name] = _client_factories[name]()
+  return client
+
+
+def get_supabase() -> Any:
+  """The process-wide Supabase client."""
+  return get_client("supabase")
+
+
+def get_model() -> Any:
+  """The process-wide Gemini model client, created on first use and reused after."""
+  return get_client("model")
+
+
+def __getattr__(name: str) -> Any:
+  # `mock_adcom_service.supabase` used to be a module attribute created at import.
+  if name == "supabase":
+    return get_supabase()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+DOCS_DIR = ROOT / "documents"
+# Extracted document text, one JSON file per document, reused until the document changes.
+DOC_CACHE_DIR = Path(os.getenv("ADCOM_DOC_CACHE_DIR") or ROOT / ".cache" / "adcom_docs")
+# Bump when _extract_text changes, so text cached by the old extractor is not reused.
+DOC_EXTRACTOR_VERSION = 1
+
+# Document chunks pasted into each prompt; 0 pastes every document in full.
+RETRIEVAL_TOP_K = int(os.getenv("ADCOM_RETRIEVAL_TOP_K", "8"))
+
+# path -> (mtime_ns, size, text); shared by every request in the process.
+_doc_text_cache: Dict[str, Tuple[int, int, str]] = {}
+_doc_cache_lock = threading.Lock()
+# Held while extracting a document or building the index, so that work happens once.
+_doc_build_lock = threading.RLock()
 
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-genai.configure(api_key=GEMINI_API_KEY)
+# Everything derived from the current documents, built once per corpus key.
+class HarvardCorpus(NamedTuple):
+  key: tuple  # (document name, text digest) per document
+  version: str
+  index: BM25Index
+  full_context_chars: int  # system prompt with every document pasted in
+
+
+_harvard_corpus: Optional[HarvardCorpus] = None
+
+MODEL_NAME = "gemini-1.5-pro"
+# Bump whenever _build_system_prompt or the retrieval changes what the model is asked,
+# so cached analyses from the old prompt are not served.
+PROMPT_VERSION = 5
+
+# Batch analysis: concurrent model calls, retries on rate limits, rows per upsert.
+BATCH_CONCURRENCY = int(os.getenv("ADCOM_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_RETRIES = 5
+BATCH_BACKOFF_SECONDS = 1.0
+BATCH_BACKOFF_MAX_SECONDS = 30.0
+UPSERT_BATCH_SIZE = 100
+
+# Analyses cached by content (see analysis_cache_key); a TTL of 0 disables the cache.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("ADCOM_RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("ADCOM_RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Keys a model response must have to be worth caching.
+ANALYSIS_KEYS = ("academic_rating", "extracurricular_rating", "personal_rating", "school_predictions")
+
+
+def _extract_text(path: Path) -> Optional[str]:
+  """
+  Text of one document: .txt files as plain text, .pdf files via PyPDF2 (if installed).
+  Returns None for unsupported or unreadable files.
+  """
+  suffix = path.suffix.lower()
+
+  if suffix == ".txt":
+    try:
+      return path.read_text(encoding="utf-8", errors="ignore")
+    except Exception:
+      return None
+
+  if suffix == ".pdf":
+    # Lazy import so the service still works without PyPDF2 when only
+    # text files are present.
+    try:
+      import PyPDF2  # type: ignore
+    except Exception:
+      return None
+    try:
+      with path.open("rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        parts: List[str] = []
+        for page in reader.pages:
+          try:
+            page_text = page.extract_text() or ""
+          except Exception:
+            page_text = ""
+          if page_text:
+            parts.append(page_text)
+        return "\n\n".join(parts)
+    except Exception:
+      return None
+
+  return None
+
+
+def _disk_cache_path(path: Path) -> Path:
+  digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:16]
+  return DOC_CACHE_DIR / f"{digest}.json"
+
+
+def _read_disk_cache(path: Path, mtime_ns: int, size: int) -> Optional[str]:
+  try:
+    entry = json.loads(_disk_cache_path(path).read_text(encoding="utf-8"))
+  except (OSError, ValueError):
+    return None
+  if (
+    entry.get("path") == str(path)
+    and entry.get("mtime_ns") == mtime_ns
+    and entry.get("size") == size
+    and entry.get("extractor") == DOC_EXTRACTOR_VERSION
+  ):
+    return entry.get("text")
+  return None
+
+
+def _write_disk_cache(path: Path, mtime_ns: int, size: int, text: str) -> None:
+  entry = {
+    "path": str(path),
+    "mtime_ns": mtime_ns,
+    "size": size,
+    "extractor": DOC_EXTRACTOR_VERSION,
+    "text": text,
+  }
+  target = _disk_cache_path(path)
+  try:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(target)
+  except OSError:
+    # The disk cache is an optimisation; a read-only checkout still works.
+    pass
+
+
+def document_text(path: Path) -> Optional[str]:
+  """
+  Extracted text of ``path``, served from memory, then from the on-disk cache, and
+  extracted only when neither holds text for the file's current mtime and size.
+  """
+  try:
+    stat = path.stat()
+  except OSError:
+    return None
+  key = str(path)
+  with _doc_cache_lock:
+    cached = _doc_text_cache.get(key)
+  if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+    return cached[2]
+
+  # Concurrent requests wait for one extraction instead of each parsing the PDF.
+  with _doc_build_lock:
+    with _doc_cache_lock:
+      cached = _doc_text_cache.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+      return cached[2]
+    text = _read_disk_cache(path, stat.st_mtime_ns, stat.st_size)
+    if text is None:
+      text = _extract_text(path)
+      if text is None:
+        # Not cached: a missing PyPDF2 or a transient read error should not stick.
+        return None
+      _write_disk_cache(path, stat.st_mtime_ns, stat.st_size, text)
+    with _doc_cache_lock:
+      _doc_text_cache[key] = (stat.st_mtime_ns, stat.st_size, text)
+  return text
+
+
+def harvard_documents() -> List[Tuple[Path, str]]:
+  """(path, text) of every readable document in `documents`, in name order."""
+  if not DOCS_DIR.exists():
+    return []
+
+  docs: List[Tuple[Path, str]] = []
+  for path in sorted(DOCS_DIR.iterdir()):
+    if not path.is_file():
+      continue
+    text = document_text(path)
+    if text:
+      docs.append((path, text))
+  return docs
 
 
 def load_harvard_docs() -> str:
@@ -55,50 +302,105 @@ def load_harvard_docs() -> str:
   It will read:
     - .txt files as plain text
     - .pdf files via PyPDF2, if installed
+
+  Extracted text is cached (see `document_text`), so only new or changed
+  documents are parsed.
   """
-  docs_dir = ROOT / "documents"
-  if not docs_dir.exists():
-    return ""
+  return "\n\n".join(text for _, text in harvard_documents())
 
-  texts: List[str] = []
 
-  # Lazy import so the script still works without PyPDF2 when only
-  # text files are present.
-  try:
-    import PyPDF2  # type: ignore
-  except Exception:
-    PyPDF2 = None  # type: ignore
+@lru_cache(maxsize=64)
+def _text_digest(text: str) -> str:
+  # The text cache hands back the same str object until a document changes, and
+  # Python keeps a str's hash, so repeat lookups do not read the text again.
+  return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
-  for path in docs_dir.iterdir():
-    if not path.is_file():
-      continue
 
-    suffix = path.suffix.lower()
+def _corpus_key(docs: List[Tuple[Path, str]]) -> tuple:
+  return tuple((path.name, _text_digest(text)) for path, text in docs)
 
-    if suffix == ".txt":
-      try:
-        texts.append(path.read_text(encoding="utf-8", errors="ignore"))
-      except Exception:
-        continue
 
-    elif suffix == ".pdf" and PyPDF2 is not None:
-      try:
-        with path.open("rb") as f:
-          reader = PyPDF2.PdfReader(f)
-          parts: List[str] = []
-          for page in reader.pages:
-            try:
-              page_text = page.extract_text() or ""
-            except Exception:
-              page_text = ""
-            if page_text:
-              parts.append(page_text)
-          if parts:
-            texts.append("\n\n".join(parts))
-      except Exception:
-        continue
-
-  return "\n\n".join(texts)
+def harvard_corpus() -> HarvardCorpus:
+  """
+  Key, version, BM25 index and full-context size of the current documents, rebuilt
+  only when a document's extracted text changes.
+  """
+  global _harvard_corpus
+  docs = harvard_documents()
+  key = _corpus_key(docs)
+  with _doc_build_lock:
+    if _harvard_corpus is None or _harvard_corpus.key != key:
+      _harvard_corpus = HarvardCorpus(
+        key=key,
+        version=hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:16],
+        index=build_index((path.name, text) for path, text in docs),
+        full_context_chars=len(_build_system_prompt("\n\n".join(text for _, text in docs))),
+      )
+    return _harvard_corpus
+
+
+def corpus_version() -> str:
+  """Digest of the current documents' names and extracted text."""
+  return harvard_corpus().version
+
+
+def harvard_index() -> BM25Index:
+  """BM25 index over the document chunks (see harvard_corpus)."""
+  return harvard_corpus().index
+
+
+def build_prompt(
+  student_data: Dict[str, Any],
+  target_schools: List[Dict[str, Any]],
+  top_k: int = RETRIEVAL_TOP_K,
+) -> Tuple[str, Dict[str, int]]:
+  """
+  The full Gemini prompt for one request, plus its estimated size. With ``top_k``
+  > 0 only the document chunks most relevant to this profile and these schools
+  are included; 0 pastes every document in full.
+
+  The stats hold ``prompt_tokens`` and, for comparison, ``full_context_tokens``
+  (what the prompt would be with every document pasted in).
+  """
+  # We send a single prompt that includes system-style instructions plus
+  # a JSON payload with the student + school data.
+  payload = {
+    "student_profile": student_data,
+    "target_schools": target_schools,
+  }
+  signals = essay_signals(student_data)
+  if signals:
+    payload["essay_signals"] = signals
+  input_block = "\n\n" + "INPUT DATA (JSON):\n" + json.dumps(payload, ensure_ascii=False)
+
+  corpus = harvard_corpus()
+  # Same as estimate_tokens on the full-document prompt, without building it per request.
+  full_context_tokens = math.ceil((corpus.full_context_chars + len(input_block)) / CHARS_PER_TOKEN)
+  stats = {"full_context_tokens": full_context_tokens, "chunks": 0}
+  if top_k > 0:
+    hits = corpus.index.search(profile_query(student_data, target_schools), top_k)
+    prompt = _build_system_prompt(render_context(hits)) + input_block
+    stats["chunks"] = len(hits)
+  else:
+    prompt = _build_system_prompt(load_harvard_docs()) + input_block
+  stats["prompt_tokens"] = estimate_tokens(prompt)
+  return prompt, stats
+
+
+def warm_doc_cache() -> Dict[str, int]:
+  """
+  Fill the document cache at service start so the first request does not pay for
+  PDF extraction. Returns the number of characters cached per document.
+  """
+  if not DOCS_DIR.exists():
+    return {}
+  warmed: Dict[str, int] = {}
+  for path in sorted(DOCS_DIR.iterdir()):
+    if path.is_file():
+      text = document_text(path)
+      if text is not None:
+        warmed[path.name] = len(text)
+  return warmed
 
 
 def _build_system_prompt(harvard_context: str) -> str:
@@ -175,6 +477,15 @@ Definitions:
 
 When the data is ambiguous, make a best-faith judgment using the Harvard-style reasoning from the materials above. Do not be overly optimistic.
 
+PRECOMPUTED ESSAY SIGNALS:
+- "essay_signals" (when present) scores each essay locally, as two separate signals: "max_similarity" to known essays (0-1, with the closest ones in "similar_essays"), and the overused "topic" it matches with "topic_score" (0-1, the share of that topic's cues found) and the cues themselves in "topic_cues".
+- A "near_duplicate" flag means the essay closely copies a known essay: apply the CRITICAL ESSAY RULE. A "common_topic" flag alone is not enough; apply the rule only if the essay also lacks specific, vivid insight.
+
+PRECOMPUTED TIERS:
+- Some target schools carry a "precomputed_tier" (with "tier_basis"): the school is Ivy / tippy-top or admits under 10%. Copy "precomputed_tier" into "tier" unchanged and only write the rationale.
+- Others carry a "suggested_tier" (with "tier_basis"), derived only from the published admit rate and test-score ranges. Treat it as a starting point: keep it unless GPA, rigor, hooks or the rest of the file clearly point elsewhere, and say why in the rationale when you change it.
+- Classify the schools with neither on your own.
+
 OUTPUT FORMAT (STRICT JSON):
 You MUST respond with a single JSON object, no extra commentary, markdown or text. Use this exact structure and key names:
 
@@ -198,7 +509,205 @@ If any information is missing from the input, make a conservative assumption and
 """
 
 
-def analyze_profile(student_data: Dict[str, Any], target_schools: List[Dict[str, Any]]) -> str:
+# ---------- response cache ----------
+class ResponseCache:
+  """
+  In-memory LRU cache of analysis results with a time-to-live. Thread-safe; the
+  counters are exposed through `stats()`.
+  """
+
+  def __init__(
+    self,
+    max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self.max_entries = max_entries
+    self.ttl_seconds = ttl_seconds
+    self._clock = clock
+    self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.expired = 0
+    self.evictions = 0
+
+  @property
+  def enabled(self) -> bool:
+    return self.ttl_seconds > 0 and self.max_entries > 0
+
+  def get(self, key: str) -> Optional[str]:
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and self._clock() >= entry[0]:
+        del self._entries[key]
+        self.expired += 1
+        entry = None
+      if entry is None:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+
+  def put(self, key: str, value: str) -> None:
+    if not self.enabled:
+      return
+    with self._lock:
+      self._entries[key] = (self._clock() + self.ttl_seconds, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      return {
+        "entries": len(self._entries),
+        "hits": self.hits,
+        "misses": self.misses,
+        "expired": self.expired,
+        "evictions": self.evictions,
+      }
+
+
+response_cache = ResponseCache()
+
+
+def canonical_json(value: Any) -> str:
+  """Key-sorted, whitespace-free JSON, so equal payloads hash equally."""
+  return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def analysis_cache_key(student_data: Dict[str, Any], target_schools: List[Dict[str, Any]]) -> str:
+  """
+  Content address of one analysis: the student payload, the target schools (in
+  order), and everything else that shapes the prompt (prompt version, model,
+  retrieval depth, document corpus, the essay sources behind the essay signals and
+  the data files behind the precomputed tiers).
+  """
+  from adcom_similarity import essay_sources_key  # numpy; kept off the import path
+  from adcom_tiering import data_files_key
+
+  material = {
+    "prompt_version": PROMPT_VERSION,
+    "model": MODEL_NAME,
+    "top_k": RETRIEVAL_TOP_K,
+    "corpus": corpus_version(),
+    "essays": essay_sources_key(),
+    "tier_data": data_files_key(target_schools),
+    "student": student_data,
+    "schools": target_schools,
+  }
+  return hashlib.sha256(canonical_json(material).encode("utf-8")).hexdigest()
+
+
+def valid_analysis(text: str) -> bool:
+  """True when ``text`` is a JSON object with the keys the system prompt asks for."""
+  try:
+    parsed = json.loads(text)
+  except (TypeError, ValueError):
+    return False
+  return isinstance(parsed, dict) and all(k in parsed for k in ANALYSIS_KEYS)
+
+
+def response_cache_stats() -> Dict[str, int]:
+  return response_cache.stats()
+
+
+# ---------- pre-tiering ----------
+def pretier_schools(
+  student_data: Dict[str, Any],
+  target_schools: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+  """
+  Tier the target schools locally (see adcom_tiering). Returns the tiers and copies
+  of the schools annotated with ``precomputed_tier`` (binding) or ``suggested_tier``
+  (a hint the model may override) where one could be assigned.
+  """
+  from adcom_tiering import assign_tiers  # numpy; kept off the import path
+
+  tiers = assign_tiers(student_data, target_schools)
+  annotated = []
+  for school, entry in zip(target_schools, tiers):
+    school = dict(school)
+    if entry["tier"] is not None:
+      school["precomputed_tier" if entry["binding"] else "suggested_tier"] = entry["tier"]
+      school["tier_basis"] = entry["basis"]
+    annotated.append(school)
+  return tiers, annotated
+
+
+# ---------- essay signals ----------
+def essay_signals(student_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+  """
+  Local near-duplicate and overused-topic scores per student essay (see
+  adcom_similarity), keyed by essay name; empty when the profile has no essays.
+  """
+  from adcom_similarity import essay_signal, student_essays  # numpy; kept off the import path
+
+  essays = student_essays(student_data)
+  if not essays:
+    return {}
+  return {name: essay_signal(text) for name, text in essays.items()}
+
+
+def _enforce_tiers(text: str, tiers: List[Dict[str, Any]]) -> str:
+  """Overwrite the model's tier for every school with a binding precomputed tier."""
+  try:
+    parsed = json.loads(text)
+  except (TypeError, ValueError):
+    return text
+  predictions = parsed.get("school_predictions") if isinstance(parsed, dict) else None
+  if not isinstance(predictions, list):
+    return text
+  by_name = {e["school_name"]: e["tier"] for e in tiers if e["binding"] and e["school_name"]}
+  changed = False
+  for pred in predictions:
+    tier = by_name.get(pred.get("school_name")) if isinstance(pred, dict) else None
+    if tier is not None and pred.get("tier") != tier:
+      pred["tier"] = tier
+      changed = True
+  return json.dumps(parsed, ensure_ascii=False) if changed else text
+
+
+def fast_analysis(student_data: Dict[str, Any], target_schools: List[Dict[str, Any]]) -> str:
+  """
+  Fast mode: the local tiers with rule-based rationales and no model call. Ratings,
+  lops and the summary are left empty because only the model can read the file,
+  except that an essay flagged as a near-duplicate of a known essay gets the
+  generic-essay rating. The essay signals are included as they are.
+  """
+  from adcom_tiering import assign_tiers, tier_rationale
+
+  tiers = assign_tiers(student_data, target_schools)
+  signals = essay_signals(student_data)
+  copied = sorted(name for name, signal in signals.items() if "near_duplicate" in signal["flags"])
+  result = {
+    "academic_rating": None,
+    "extracurricular_rating": None,
+    "personal_rating": 4 if copied else None,
+    "personal_rating_flag": "4 - Bland / Generic essay" if copied else "",
+    "lops": [f"Personal: {name} closely matches a known essay" for name in copied],
+    "overall_summary": "Fast mode: school tiers computed from published admit rates and test-score ranges,"
+    " essays checked against known essays; no reader review.",
+    "essay_signals": signals,
+    "school_predictions": [
+      {"school_name": e["school_name"], "tier": e["tier"], "rationale": tier_rationale(e)} for e in tiers
+    ],
+  }
+  return json.dumps(result, ensure_ascii=False)
+
+
+def analyze_profile(
+  student_data: Dict[str, Any],
+  target_schools: List[Dict[str, Any]],
+  fast: bool = False,
+) -> str:
   """
   Sends data to Gemini 2.5-ish model with the Harvard Lawsuit System Prompt
   and returns the model's JSON string.
@@ -217,39 +726,48 @@ def analyze_profile(student_data: Dict[str, Any], target_schools: List[Dict[str,
         "is_ivy": true,
         "is_tippy_top": true
       }}
-  """
-  harvard_context = load_harvard_docs()
-  system_prompt = _build_system_prompt(harvard_context)
 
-  model = genai.GenerativeModel("gemini-1.5-pro")
+  Schools are tiered locally first; the model keeps those tiers and writes the
+  rationales. With ``fast`` the model is skipped (see `fast_analysis`).
 
-  # We send a single prompt that includes system-style instructions plus
-  # a JSON payload with the student + school data.
-  payload = {
-    "student_profile": student_data,
-    "target_schools": target_schools,
-  }
+  Identical requests are answered from `response_cache` without calling the model.
+  """
+  if fast:
+    return fast_analysis(student_data, target_schools)
+
+  cache_key = analysis_cache_key(student_data, target_schools) if response_cache.enabled else None
+  if cache_key is not None:
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+      return cached
 
-  prompt = system_prompt + "\n\n" + "INPUT DATA (JSON):\n" + json.dumps(payload, ensure_ascii=False)
+  tiers, annotated_schools = pretier_schools(student_data, target_schools)
+  prompt, stats = build_prompt(student_data, annotated_schools)
+  logger.info(
+    "prompt ~%d tokens (%d document chunks); full documents would be ~%d tokens",
+    stats["prompt_tokens"],
+    stats["chunks"],
+    stats["full_context_tokens"],
+  )
 
-  response = model.generate_content(prompt)
+  response = get_model().generate_content(prompt)
 
   # `response.text` should be JSON per the instructions. We return it
-  # as-is so callers can decide when/how to parse/validate.
-  return response.text or ""
+  # as-is so callers can decide when/how to parse/validate; only valid
+  # analyses are cached.
+  text = _enforce_tiers(response.text or "", tiers)
+  if cache_key is not None and valid_analysis(text):
+    response_cache.put(cache_key, text)
+  return text
 
 
-def save_to_supabase(
+def _profile_row(
   user_id: str,
   student_data: Dict[str, Any],
   analysis_result: str,
   target_universities: Optional[List[Dict[str, Any]]] = None,
-) -> Any:
-  """
-  Saves the inputs and the outputs to the `profiles` table.
-
-  Assumes the table has jsonb columns that can accept these payloads.
-  """
+) -> Dict[str, Any]:
+  """The `profiles` row for one analysed student."""
   try:
     analysis_json = json.loads(analysis_result)
   except json.JSONDecodeError:
@@ -260,7 +778,7 @@ def save_to_supabase(
   # into their own column.
   university_predictions = analysis_json.get("school_predictions")
 
-  data = {
+  return {
     "user_id": user_id,
     "academic_stats": student_data.get("academics"),
     "demographics": student_data.get("demographics"),
@@ -272,9 +790,23 @@ def save_to_supabase(
     "last_analysis_timestamp": datetime.now(timezone.utc).isoformat(),
   }
 
+
+def save_to_supabase(
+  user_id: str,
+  student_data: Dict[str, Any],
+  analysis_result: str,
+  target_universities: Optional[List[Dict[str, Any]]] = None,
+) -> Any:
+  """
+  Saves the inputs and the outputs to the `profiles` table.
+
+  Assumes the table has jsonb columns that can accept these payloads.
+  """
+  data = _profile_row(user_id, student_data, analysis_result, target_universities)
+
   # Upsert on user_id so that each user has one current profile row.
   return (
-    supabase.table("profiles")
+    get_supabase().table("profiles")
     .upsert(data, on_conflict="user_id")
     .execute()
   )
@@ -299,13 +831,170 @@ def init_empty_profile(user_id: str) -> Any:
   Call this right after a user logs in via magic link.
   """
   return (
-    supabase.table("profiles")
+    get_supabase().table("profiles")
     .upsert({"user_id": user_id}, on_conflict="user_id")
     .execute()
   )
 
 
+# ---------- batch analysis ----------
+class AnalysisJob(NamedTuple):
+  user_id: str
+  student_data: Dict[str, Any]
+  target_schools: List[Dict[str, Any]]
+
+
+class AnalysisResult(NamedTuple):
+  job: AnalysisJob
+  text: Optional[str]  # the model's JSON string; None when the job failed
+  error: Optional[str]
+  attempts: int  # model calls made; 0 when served from the response cache or in fast mode
+  seconds: float
+
+
+def _is_rate_limited(exc: BaseException) -> bool:
+  """True for errors worth retrying: 429 / quota exhaustion and transient 5xx."""
+  try:
+    from google.api_core import exceptions as gexc  # type: ignore
+  except Exception:
+    gexc = None
+  if gexc is not None and isinstance(
+    exc,
+    (gexc.TooManyRequests, gexc.ResourceExhausted, gexc.ServiceUnavailable, gexc.InternalServerError, gexc.DeadlineExceeded),
+  ):
+    return True
+  return getattr(exc, "code", None) in (429, 500, 503, 504)
+
+
+def _backoff(attempt: int) -> float:
+  """Exponential backoff with full jitter for retry ``attempt`` (1-based)."""
+  return random.uniform(0, min(BATCH_BACKOFF_MAX_SECONDS, BATCH_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+
+
+def _failed(job: AnalysisJob, exc: BaseException, attempts: int, start: float) -> AnalysisResult:
+  logger.warning("user %s: analysis failed: %s: %s", job.user_id, type(exc).__name__, exc)
+  return AnalysisResult(job, None, f"{type(exc).__name__}: {exc}", attempts, time.perf_counter() - start)
+
+
+def _fast_job(job: AnalysisJob) -> AnalysisResult:
+  start = time.perf_counter()
+  try:
+    return AnalysisResult(job, fast_analysis(job.student_data, job.target_schools), None, 0, time.perf_counter() - start)
+  except Exception as e:
+    return _failed(job, e, 0, start)
+
+
+async def _analyze_job(
+  job: AnalysisJob,
+  model: Any,
+  semaphore: asyncio.Semaphore,
+  pool: ThreadPoolExecutor,
+  max_retries: int,
+) -> AnalysisResult:
+  loop = asyncio.get_running_loop()
+  start = time.perf_counter()
+  attempts = 0
+  async with semaphore:
+    # Bad input (e.g. an unparsable school field) fails this job only, never the batch.
+    try:
+      cache_key = None
+      if response_cache.enabled:
+        cache_key = await loop.run_in_executor(pool, analysis_cache_key, job.student_data, job.target_schools)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+          return AnalysisResult(job, cached, None, 0, time.perf_counter() - start)
+      tiers, annotated_schools = await loop.run_in_executor(pool, pretier_schools, job.student_data, job.target_schools)
+      prompt, _ = await loop.run_in_executor(pool, build_prompt, job.student_data, annotated_schools)
+    except Exception as e:
+      return _failed(job, e, attempts, start)
+    while True:
+      attempts += 1
+      try:
+        response = await loop.run_in_executor(pool, model.generate_content, prompt)
+        text = _enforce_tiers(response.text or "", tiers)
+        if cache_key is not None and valid_analysis(text):
+          response_cache.put(cache_key, text)
+        return AnalysisResult(job, text, None, attempts, time.perf_counter() - start)
+      except Exception as e:
+        if attempts > max_retries or not _is_rate_limited(e):
+          return _failed(job, e, attempts, start)
+        delay = _backoff(attempts)
+        logger.warning("user %s: %s; retry %d in %.1fs", job.user_id, type(e).__name__, attempts, delay)
+        await asyncio.sleep(delay)
+
+
+async def analyze_many(
+  jobs: Sequence[AnalysisJob],
+  concurrency: int = BATCH_CONCURRENCY,
+  max_retries: int = BATCH_MAX_RETRIES,
+  model: Any = None,
+  fast: bool = False,
+) -> List[AnalysisResult]:
+  """
+  Analyse many students with at most ``concurrency`` model calls in flight, retrying
+  rate-limited calls with backoff. One model client (``get_model()`` unless given)
+  serves every job. Results come back in job order; a failed job carries its error
+  instead of raising. With ``fast`` no model is called (see `fast_analysis`).
+  """
+  if fast:
+    return [_fast_job(job) for job in jobs]
+  model = model if model is not None else get_model()
+  concurrency = max(1, concurrency)
+  semaphore = asyncio.Semaphore(concurrency)
+  # The client is blocking; a pool of its own keeps ``concurrency`` calls truly in flight.
+  with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="adcom") as pool:
+    return list(await asyncio.gather(*(_analyze_job(job, model, semaphore, pool, max_retries) for job in jobs)))
+
+
+def save_many(results: Sequence[AnalysisResult], table: Any = None, batch_size: int = UPSERT_BATCH_SIZE) -> int:
+  """
+  Upsert the successful results into `profiles`, ``batch_size`` rows per request.
+  A user analysed more than once keeps the last result. Returns the rows written.
+  """
+  table = table if table is not None else get_supabase().table("profiles")
+  rows: Dict[str, Dict[str, Any]] = {}
+  for r in results:
+    if r.text is not None:
+      # Postgres rejects an upsert that touches the same key twice.
+      rows.pop(r.job.user_id, None)
+      rows[r.job.user_id] = _profile_row(r.job.user_id, r.job.student_data, r.text, r.job.target_schools)
+  batch = list(rows.values())
+  for i in range(0, len(batch), batch_size):
+    table.upsert(batch[i:i + batch_size], on_conflict="user_id").execute()
+  return len(batch)
+
+
+async def analyze_and_save_many(
+  jobs: Sequence[AnalysisJob],
+  concurrency: int = BATCH_CONCURRENCY,
+  model: Any = None,
+  table: Any = None,
+  batch_size: int = UPSERT_BATCH_SIZE,
+  fast: bool = False,
+) -> List[AnalysisResult]:
+  """`analyze_many` followed by `save_many`; the upserts run off the event loop."""
+  results = await analyze_many(jobs, concurrency, model=model, fast=fast)
+  saved = await asyncio.to_thread(save_many, results, table, batch_size)
+  failed = sum(1 for r in results if r.error)
+  logger.info("batch: %d jobs, %d saved, %d failed", len(jobs), saved, failed)
+  return results
+
+
+def run_batch(jobs: Sequence[AnalysisJob], **kwargs: Any) -> List[AnalysisResult]:
+  """Synchronous entry point for `analyze_and_save_many` (scripts, cron jobs)."""
+  return asyncio.run(analyze_and_save_many(jobs, **kwargs))
+
+
 if __name__ == "__main__":
+  if "--warm-docs" in sys.argv:
+    # Run at deploy/service start: extracts the documents once and leaves the
+    # text in DOC_CACHE_DIR for every later process.
+    start = time.perf_counter()
+    for name, chars in warm_doc_cache().items():
+      print(f"cached {name}: {chars:,} chars")
+    print(f"Document cache warm in {time.perf_counter() - start:.2f}s ({DOC_CACHE_DIR})")
+    sys.exit(0)
+
   # Minimal CLI-style smoke test: this will not actually run Gemini unless
   # you uncomment the analysis call, but it demonstrates the wire-up.
   example_student = {
@@ -338,6 +1027,22 @@ if __name__ == "__main__":
     }
   ]
 
+  if "--prompt-size" in sys.argv:
+    # Offline: shows how much of the documents the example request would send.
+    start = time.perf_counter()
+    _, stats = build_prompt(example_student, example_schools)
+    print(
+      f"full documents: ~{stats['full_context_tokens']:,} tokens;"
+      f" top {stats['chunks']} chunks: ~{stats['prompt_tokens']:,} tokens"
+      f" ({time.perf_counter() - start:.3f}s)"
+    )
+    sys.exit(0)
+
+  if "--fast" in sys.argv:
+    # Offline: local tiers only, no model call.
+    print(json.dumps(json.loads(analyze_profile(example_student, example_schools, fast=True)), indent=2))
+    sys.exit(0)
+
   # Uncomment the lines below to execute a live analysis + save, once
   # you have valid API keys in .env.local.
   #
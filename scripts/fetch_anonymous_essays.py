@@ -1,18 +1,38 @@
 ﻿#!/usr/bin/env python3
+"""
+Download the anonymous essays from collegebase, one ``essay_<n>.json`` per index.
+
+Fetched indices are appended to ``Anonymous_Essays.ndjson`` as they complete (one
+``{"index": n, "entries": [...]}`` line each, in index order), so a rerun resumes
+after the last index on disk instead of starting from 1. Up to ``--workers``
+requests run at once over a pooled session that retries rate limits and server
+errors with backoff. The first index that does not exist ends the run, and
+``Anonymous_Essays.json`` is written once from the checkpoint at the end.
+"""
 from __future__ import annotations
 
+import argparse
 import json
 import pathlib
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_URL = "https://app.collegebase.org/data/essays/essay_{}.json"
 START_INDEX = 1
 TARGET_DIR = pathlib.Path("public/data/Applicant_Data")
 OUTPUT_FILE = TARGET_DIR / "Anonymous_Essays.json"
+CHECKPOINT_FILE = TARGET_DIR / "Anonymous_Essays.ndjson"
 LOG_FILE = TARGET_DIR / "Anonymous_Essays.log"
+WORKERS = 8
+RETRIES = 5
+BACKOFF_SECONDS = 0.5
+TIMEOUT_SECONDS = 15
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 
 def log(message: str) -> None:
@@ -21,47 +41,146 @@ def log(message: str) -> None:
         fh.write(message.rstrip() + "\n")
 
 
-def fetch_all_essays() -> list[Any]:
-    essays: list[Any] = []
+def make_session(workers: int, retries: int = RETRIES, backoff: float = BACKOFF_SECONDS) -> requests.Session:
+    """A session whose connection pool fits ``workers`` threads and that retries transient failures."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers), max_retries=retry)
     session = requests.Session()
-    index = START_INDEX
-    while True:
-        url = BASE_URL.format(index)
-        print(f"Fetching {url}...", end="", flush=True)
-        try:
-            response = session.get(url, timeout=15)
-        except requests.RequestException as exc:
-            log(f"Request failed for {url}: {exc}")
-            print(" failed")
-            break
-        if response.status_code != 200:
-            log(f"Stopped at {url} (status {response.status_code})")
-            print(f" status {response.status_code}, stopping")
-            break
-        try:
-            data = response.json()
-        except ValueError:
-            log(f"Invalid JSON at {url}, stopping.")
-            print(" invalid JSON, stopping")
-            break
-        entries = data if isinstance(data, list) else [data]
-        essays.extend(entries)
-        OUTPUT_FILE.write_text(json.dumps(essays, ensure_ascii=False, indent=2), encoding="utf-8")
-        log(f"Fetched essay {index} with {len(entries)} entr{'ies' if len(entries) != 1 else 'y'}. Total essays: {len(essays)}")
-        print(f" done ({len(entries)} entries, total {len(essays)})")
-        index += 1
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# ---------- checkpoint ----------
+def read_checkpoint(path: pathlib.Path) -> tuple[int, int]:
+    """
+    (last index, entry count) recorded in the checkpoint; (START_INDEX - 1, 0) when
+    there is none. A torn last line from an interrupted run is cut off.
+    """
+    last, count, good_bytes = START_INDEX - 1, 0, 0
+    if not path.exists():
+        return last, count
+    with path.open("rb") as fh:
+        for raw in fh:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            if not raw.endswith(b"\n"):
+                break
+            last = int(record["index"])
+            count += len(record["entries"])
+            good_bytes += len(raw)
+    if good_bytes != path.stat().st_size:
+        with path.open("r+b") as fh:
+            fh.truncate(good_bytes)
+        log(f"Truncated a partial line from {path}")
+    return last, count
+
+
+def checkpoint_entries(path: pathlib.Path) -> list[Any]:
+    essays: list[Any] = []
+    if path.exists():
+        with path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                essays.extend(json.loads(line)["entries"])
     return essays
 
 
-def main() -> None:
+def compact(checkpoint: pathlib.Path, output: pathlib.Path) -> int:
+    """Write every checkpointed entry to ``output`` as one JSON array; returns the count."""
+    essays = checkpoint_entries(checkpoint)
+    tmp = output.with_name(output.name + ".tmp")
+    tmp.write_text(json.dumps(essays, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(output)
+    return len(essays)
+
+
+# ---------- fetching ----------
+def fetch_index(session: requests.Session, base_url: str, index: int) -> tuple[int, list[Any] | None, str]:
+    """(index, entries, message); entries is None when this index ends the run."""
+    url = base_url.format(index)
+    try:
+        response = session.get(url, timeout=TIMEOUT_SECONDS)
+    except requests.RequestException as exc:
+        return index, None, f"Request failed for {url}: {exc}"
+    if response.status_code != 200:
+        return index, None, f"Stopped at {url} (status {response.status_code})"
+    try:
+        data = response.json()
+    except ValueError:
+        return index, None, f"Invalid JSON at {url}, stopping."
+    return index, data if isinstance(data, list) else [data], ""
+
+
+def fetch_all_essays(
+    base_url: str = BASE_URL,
+    start: int = START_INDEX,
+    workers: int = WORKERS,
+    checkpoint: pathlib.Path = CHECKPOINT_FILE,
+    session: requests.Session | None = None,
+) -> tuple[int, int]:
+    """
+    Fetch from ``start`` until the first missing index, appending each index to the
+    checkpoint in order. Requests run ``workers`` at a time; an index is only written
+    once every index before it has been. Returns (indices fetched, entries fetched).
+    """
+    session = session or make_session(workers)
+    fetched = entries_fetched = 0
+    next_index = start
+    last_written = start - 1
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, checkpoint.open("a", encoding="utf-8") as out:
+        while True:
+            window = range(next_index, next_index + max(1, workers))
+            stop = False
+            for index, entries, message in pool.map(lambda i: fetch_index(session, base_url, i), window):
+                if entries is None:
+                    log(message)
+                    print(message)
+                    stop = True
+                    break
+                out.write(json.dumps({"index": index, "entries": entries}, ensure_ascii=False) + "\n")
+                fetched += 1
+                entries_fetched += len(entries)
+                last_written = index
+                log(f"Fetched essay {index} with {len(entries)} entr{'ies' if len(entries) != 1 else 'y'}.")
+            # One flush per window keeps the checkpoint current without a write per request.
+            out.flush()
+            print(f"Fetched through index {last_written} ({entries_fetched} essays this run)", flush=True)
+            if stop:
+                return fetched, entries_fetched
+            next_index = window.stop
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL, help="URL template with {} for the essay index")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Concurrent requests (default {WORKERS})")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and fetch from index 1")
+    args = parser.parse_args()
+
     TARGET_DIR.mkdir(parents=True, exist_ok=True)
-    OUTPUT_FILE.write_text("[]", encoding="utf-8")
-    essays = fetch_all_essays()
-    if not essays:
+    if args.restart:
+        CHECKPOINT_FILE.unlink(missing_ok=True)
+    last, already = read_checkpoint(CHECKPOINT_FILE)
+    if last >= START_INDEX:
+        print(f"Resuming after index {last} ({already} essays already fetched)")
+
+    fetched, entries = fetch_all_essays(args.base_url, last + 1, args.workers)
+    print(f"Fetched {fetched} new indices ({entries} essays)")
+    total = compact(CHECKPOINT_FILE, OUTPUT_FILE)
+    if not total:
         print("No essays downloaded.")
-        return
-    OUTPUT_FILE.write_text(json.dumps(essays, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"Saved {len(essays)} essays to {OUTPUT_FILE}")
+        return 0
+    print(f"Saved {total} essays to {OUTPUT_FILE}")
+    return 0
 
 
 if __name__ == "__main__":
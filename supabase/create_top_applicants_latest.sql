@@ -1,5 +1,7 @@
 -- Build or rebuild the materialized view used to rank institutions by applicants.
 -- Run this in Supabase -> SQL Editor.
+-- data_pipeline/load_to_postgres.py now creates, refreshes and (when its definition in
+-- data_pipeline/schema.py changes) rebuilds this view itself; this script is kept for manual setups.
 
 begin;
 
@@ -25,7 +27,7 @@ create unique index if not exists top_applicants_latest_unitid_idx
   on public.top_applicants_latest (unitid);
 
 create index if not exists top_applicants_latest_applicants_total_idx
-  on public.top_applicants_latest (applicants_total desc nulls last);
+  on public.top_applicants_latest (applicants_total desc);  -- desc = nulls first, matching PostgREST's order=applicants_total.desc
 
 -- Expose to the API (PostgREST schema cache depends on privileges).
 grant select on public.top_applicants_latest to anon, authenticated;
@@ -33,5 +35,5 @@ grant select on public.top_applicants_latest to anon, authenticated;
 commit;
 
 -- Optional: refresh after bulk loads
--- refresh materialized view public.top_applicants_latest;
+-- refresh materialized view concurrently public.top_applicants_latest;
 
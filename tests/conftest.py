@@ -0,0 +1,52 @@
+"""
+Shared fixtures. The pipeline scripts import each other as top-level modules, so
+their folders go on sys.path the same way running them directly would.
+
+Database tests need a Postgres server: set PG_DSN to a role that may create
+databases (e.g. ``PG_DSN=postgresql://postgres@localhost/postgres``). Each test
+gets a fresh, throwaway database; without PG_DSN they are skipped.
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for folder in (ROOT, ROOT / "data_pipeline", ROOT / "scripts"):
+    if str(folder) not in sys.path:
+        sys.path.insert(0, str(folder))
+
+
+@pytest.fixture
+def pg_dsn():
+    """DSN of an empty database created for this test and dropped after it."""
+    dsn = os.getenv("PG_DSN")
+    if not dsn:
+        pytest.skip("PG_DSN is not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    from psycopg2.extensions import make_dsn
+
+    name = f"pipeline_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f'CREATE DATABASE "{name}"')
+        yield make_dsn(dsn, dbname=name)
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        admin.close()
+
+
+@pytest.fixture
+def pg_conn(pg_dsn):
+    import psycopg2
+
+    conn = psycopg2.connect(pg_dsn)
+    try:
+        yield conn
+    finally:
+        conn.close()
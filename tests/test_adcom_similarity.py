@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import adcom_similarity
+from adcom_similarity import EssayIndex, best_topic, essay_signal, topic_cues
+
+INJURY = (
+  "I tore my ACL in the first game of the season. After surgery and months of physical"
+  " therapy I was finally back on the field, slower but wiser."
+)
+GRIEF = (
+  "My grandmother passed away last spring. At her funeral I realized how much her stories"
+  " had shaped me, and the grief still comes in waves when I cook her recipes."
+)
+KNOWN = (
+  "Every summer my uncle and I restore old radios in his garage, tracing faded schematics"
+  " and arguing about capacitors until the first crackle of a station comes through."
+)
+
+
+@pytest.mark.parametrize(
+  "text",
+  [
+    "I am writing about my new school and a friend I made there in my town.",
+    "Our team played a game on the court after practice, and the coach said we should help the community.",
+    "I met my friend at the new school we both moved to, and we still talk every day.",
+    "The oracle in our play wore a visage of death.",
+  ],
+)
+def test_everyday_words_do_not_make_a_topic(text):
+  assert best_topic(text) is None
+  assert essay_signal(text, EssayIndex())["flags"] == []
+
+
+@pytest.mark.parametrize(
+  "text,topic,cues",
+  [
+    (INJURY, "sports injury", ["tore my acl", "surgery", "physical therapy", "back on the field"]),
+    (GRIEF, "loss of a relative", ["passed away", "funeral", "grief"]),
+  ],
+)
+def test_distinctive_cues_make_a_topic(text, topic, cues):
+  name, share, found = best_topic(text)
+  assert (name, found) == (topic, cues)
+  assert share == len(cues) / len(adcom_similarity.TOPIC_CLUSTERS[topic])
+  assert topic_cues(text)[topic] == cues
+
+
+def test_similarity_and_topic_are_reported_separately():
+  index = EssayIndex()
+  index.add("known:1", KNOWN)
+  copied = essay_signal(KNOWN, index)
+  assert copied["flags"] == ["near_duplicate"]
+  assert copied["max_similarity"] == 1.0 and copied["topic_score"] == 0.0 and copied["topic"] is None
+  assert "generic_score" not in copied
+
+  topical = essay_signal(INJURY, index, {"sports injury": 1})
+  assert topical["flags"] == ["common_topic"]
+  assert topical["max_similarity"] == 0.0 and topical["topic_score"] == round(4 / 7, 3)
+  assert topical["topic_cues"] == ["tore my acl", "surgery", "physical therapy", "back on the field"]
+  assert topical["topic_corpus_share"] == 1.0
+
+
+def test_few_published_essays_fall_into_a_topic():
+  if not adcom_similarity.ESSAYS_JSON.is_file():
+    pytest.skip("no published essay corpus")
+  essays = [e["essay"] for e in json.loads(adcom_similarity.ESSAYS_JSON.read_text(encoding="utf-8")) if e.get("essay")]
+  flagged = [text for text in essays if best_topic(text) is not None]
+  assert len(flagged) <= 0.05 * len(essays)
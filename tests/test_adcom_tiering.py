@@ -0,0 +1,163 @@
+import pytest
+
+from adcom_tiering import assign_tiers, data_files_key
+
+# (student, school, expected tier); schools carry their own numbers and the data dir is
+# empty, so the table does not depend on the published data files.
+TIER_CASES = [
+  pytest.param(
+    {"academics": {"sat": 1600}},
+    {"school_name": "A", "acceptance_rate": 0.30, "sat_25": 1300, "sat_75": 1450, "is_ivy": True},
+    "Lottery",
+    id="ivy flag beats strong scores",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1600}},
+    {"school_name": "B", "acceptance_rate": 0.07, "sat_25": 1500, "sat_75": 1570},
+    "Lottery",
+    id="admit rate under 10%",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1600}},
+    {"school_name": "B2", "acceptance_rate": 7, "sat_25": 1500, "sat_75": 1570},
+    "Lottery",
+    id="percent admit rate is accepted",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1400}},
+    {"school_name": "C", "acceptance_rate": 0.70, "sat_25": 1100, "sat_75": 1300},
+    "Academic Safety",
+    id="above 75th at an open school",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1300}},
+    {"school_name": "C2", "acceptance_rate": 0.50, "sat_25": 1100, "sat_75": 1300},
+    "Academic Safety",
+    id="exactly at 75th counts as above",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1500}},
+    {"school_name": "D", "acceptance_rate": 0.30, "sat_25": 1300, "sat_75": 1450},
+    "Yield Target",
+    id="above 75th at a moderately selective school",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1500}},
+    {"school_name": "D2", "sat_25": 1300, "sat_75": 1450},
+    "Target Match",
+    id="above 75th, admit rate unknown",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1250}},
+    {"school_name": "E", "acceptance_rate": 0.55, "sat_25": 1150, "sat_75": 1350},
+    "Target Match",
+    id="inside the middle 50%",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1420}},
+    {"school_name": "F", "acceptance_rate": 0.15, "sat_25": 1400, "sat_75": 1540},
+    "Reach",
+    id="below median at a selective school",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1500}},
+    {"school_name": "F2", "acceptance_rate": 0.15, "sat_25": 1400, "sat_75": 1540},
+    "Target Match",
+    id="above median at a selective school",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1000}},
+    {"school_name": "G", "acceptance_rate": 0.80, "sat_25": 1050, "sat_75": 1250},
+    "Reach",
+    id="below 25th",
+  ),
+  pytest.param(
+    {"academics": {"test_scores": {"act": 34}}},
+    {"school_name": "H", "acceptance_rate": 0.60, "act_25": 26, "act_75": 31},
+    "Academic Safety",
+    id="ACT only",
+  ),
+  pytest.param(
+    {"academics": {"test_scores": {"sat": 1100, "act": 33}}},
+    {"school_name": "I", "acceptance_rate": 0.40, "sat_25": 1300, "sat_75": 1450, "act_25": 28, "act_75": 32},
+    "Yield Target",
+    id="better of SAT and ACT",
+  ),
+  pytest.param(
+    {"academics": {"test_scores": {"sat_math": 700, "sat_ebrw": 650}}},
+    {"school_name": "J", "acceptance_rate": 0.45, "sat_25": 1200, "sat_75": 1400},
+    "Target Match",
+    id="SAT sections are summed",
+  ),
+  pytest.param(
+    {"academics": {"gpa": 3.9}},
+    {"school_name": "K", "acceptance_rate": 0.75},
+    "Target Match",
+    id="no scores, open admit rate",
+  ),
+  pytest.param(
+    {"academics": {"gpa": 3.9}},
+    {"school_name": "L", "acceptance_rate": 0.35},
+    "Reach",
+    id="no scores, selective admit rate",
+  ),
+  pytest.param(
+    {"academics": {"sat": 1500}},
+    {"school_name": "Unknown College XYZ"},
+    None,
+    id="nothing known",
+  ),
+]
+
+
+@pytest.mark.parametrize("student,school,expected", TIER_CASES)
+def test_tier_rules(tmp_path, student, school, expected):
+  assert assign_tiers(student, [school], data_dir=tmp_path)[0]["tier"] == expected
+
+
+def test_tiers_come_back_in_school_order(tmp_path):
+  schools = [case.values[1] for case in TIER_CASES]
+  tiers = assign_tiers({"academics": {"sat": 1450}}, schools, data_dir=tmp_path)
+  assert [t["school_name"] for t in tiers] == [s["school_name"] for s in schools]
+
+
+def test_only_lottery_is_binding(tmp_path):
+  schools = [case.values[1] for case in TIER_CASES]
+  tiers = assign_tiers({"academics": {"sat": 1450}}, schools, data_dir=tmp_path)
+  assert {(t["tier"], t["basis"]) for t in tiers if t["binding"]} == {("Lottery", "flag"), ("Lottery", "acceptance_rate")}
+  assert all(t["tier"] != "Lottery" for t in tiers if not t["binding"])
+
+
+@pytest.mark.parametrize("bad", ["30%", "n/a", "", "  ", "nan", [], {}])
+def test_unparsable_school_numbers_count_as_unknown(tmp_path, bad):
+  student = {"academics": {"sat": 1500}}
+  no_rate = {"school_name": "M", "acceptance_rate": bad, "sat_25": 1300, "sat_75": 1450}
+  no_range = {"school_name": "N", "acceptance_rate": 0.35, "sat_25": bad, "sat_75": "1450"}
+  tiers = assign_tiers(student, [no_rate, no_range], data_dir=tmp_path)
+  assert [(t["tier"], t["acceptance_rate"], t["score_position"]) for t in tiers] == [
+    ("Target Match", None, 1.333),
+    ("Reach", 0.35, None),
+  ]
+
+
+def test_numeric_strings_are_parsed(tmp_path):
+  school = {"school_name": "O", "acceptance_rate": "30", "sat_25": "1300", "sat_75": "1450"}
+  assert assign_tiers({"academics": {"sat": "1500"}}, [school], data_dir=tmp_path)[0]["tier"] == "Yield Target"
+
+
+def test_data_files_key_covers_the_files_each_school_reads(tmp_path):
+  (tmp_path / "institutions_index.json").write_text('[{"unitid": 5, "name": "Example College"}]', encoding="utf-8")
+  (tmp_path / "metrics").mkdir()
+  (tmp_path / "metrics" / "5.json").write_text('{"metrics": []}', encoding="utf-8")
+  schools = [{"school_name": "example college"}, {"unitid": "9"}, {"school_name": "Unknown"}]
+  key = data_files_key(schools, tmp_path)
+  assert [name for name, _ in key] == [
+    "institutions_index.json",
+    "metrics/5.json",
+    "institutions/5.json",
+    "metrics/9.json",
+    "institutions/9.json",
+  ]
+  assert [stamp is not None for _, stamp in key] == [True, True, False, False, False]
+  (tmp_path / "metrics" / "5.json").write_text('{"metrics": [{"year": 2023}]}', encoding="utf-8")
+  assert data_files_key(schools, tmp_path) != key
@@ -0,0 +1,103 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+from columnar import columnar_records, decode_columnar, encode_columnar, read_columnar
+
+
+def metrics_frame():
+    """Unsorted keys, float32-exact and float64-only columns, and every kind of null."""
+    return pd.DataFrame(
+        {
+            "unitid": [300, 100, 200, 100, 200],
+            "year": [2022, 2023, 2021, 2022, 2022],
+            "applicants_total": [1200.0, None, 50.0, 40.0, float("nan")],
+            "admit_rate": [0.1, 0.25, None, 1 / 3, 0.5],
+            "yield": [pd.NA, 0.5, 0.25, 0.125, 1.0],
+            "note": ["n/a", "7", None, "3.5", ""],
+            "all_null": [None] * 5,
+        }
+    )
+
+
+def test_round_trip_sorts_by_key_and_keeps_nulls():
+    df = metrics_frame()
+    decoded = decode_columnar(encode_columnar(df))
+    assert list(decoded) == list(df.columns)
+    assert decoded["unitid"].tolist() == [100, 100, 200, 200, 300]
+    assert decoded["year"].tolist() == [2022, 2023, 2021, 2022, 2022]
+    assert columnar_records(decoded) == [
+        {"unitid": 100, "year": 2022, "applicants_total": 40.0, "admit_rate": 1 / 3, "yield": 0.125, "note": 3.5, "all_null": None},
+        {"unitid": 100, "year": 2023, "applicants_total": None, "admit_rate": 0.25, "yield": 0.5, "note": 7.0, "all_null": None},
+        {"unitid": 200, "year": 2021, "applicants_total": 50.0, "admit_rate": None, "yield": 0.25, "note": None, "all_null": None},
+        {"unitid": 200, "year": 2022, "applicants_total": None, "admit_rate": 0.5, "yield": 1.0, "note": None, "all_null": None},
+        {"unitid": 300, "year": 2022, "applicants_total": 1200.0, "admit_rate": 0.1, "yield": None, "note": None, "all_null": None},
+    ]
+
+
+def test_each_column_gets_the_narrowest_exact_dtype():
+    decoded = decode_columnar(encode_columnar(metrics_frame()))
+    dtypes = {name: values.dtype.str for name, values in decoded.items()}
+    assert dtypes == {
+        "unitid": "<i4",
+        "year": "<i4",
+        "applicants_total": "<f4",
+        "admit_rate": "<f8",
+        "yield": "<f4",
+        "note": "<f4",
+        "all_null": "<f4",
+    }
+
+
+def test_column_buffers_are_aligned():
+    data = encode_columnar(metrics_frame())
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8 : 8 + header_len])
+    assert header["rows"] == 5 and header["keys"] == ["unitid", "year"]
+    assert all(col["offset"] % columnar.ALIGN == 0 for col in header["columns"])
+    assert len(data) % columnar.ALIGN == 0
+
+
+def test_empty_frame_round_trips():
+    df = metrics_frame().iloc[:0]
+    decoded = decode_columnar(encode_columnar(df))
+    assert list(decoded) == list(df.columns)
+    assert all(values.size == 0 for values in decoded.values())
+    assert columnar_records(decoded) == []
+    assert columnar_records(decoded, unitid=100) == []
+
+
+def test_records_for_one_unitid():
+    decoded = decode_columnar(encode_columnar(metrics_frame()))
+    assert [(r["unitid"], r["year"]) for r in columnar_records(decoded, unitid=200)] == [(200, 2021), (200, 2022)]
+    assert columnar_records(decoded, unitid=150) == []
+    assert columnar_records(decoded, unitid=999) == []
+
+
+def test_custom_keys_and_file_round_trip(tmp_path):
+    df = pd.DataFrame({"unitid": [2, 1], "value": [np.float64(0.1), 2.0]})
+    path = tmp_path / "metrics.bin"
+    path.write_bytes(encode_columnar(df, keys=("unitid",)))
+    decoded = read_columnar(path)
+    assert decoded["unitid"].tolist() == [1, 2]
+    assert decoded["value"].tolist() == [2.0, 0.1]
+
+
+def test_key_outside_int32_is_rejected():
+    df = pd.DataFrame({"unitid": [1, 2**31], "year": [2022, 2022], "value": [1.0, 2.0]})
+    with pytest.raises(ValueError, match="int32"):
+        encode_columnar(df)
+
+
+def test_bad_magic_and_version_are_rejected():
+    data = encode_columnar(metrics_frame())
+    with pytest.raises(ValueError, match="magic"):
+        decode_columnar(b"JSON" + data[4:])
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = data[8 : 8 + header_len].replace(b'"version": 1', b'"version": 9')
+    with pytest.raises(ValueError, match="version"):
+        decode_columnar(data[:8] + header + data[8 + header_len :])
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import essay_corpus
+from essay_corpus import EssayCorpus, brute_force_search, write_corpus
+
+
+def essay(essay_id, school, essay_type, year, body, question=None):
+    return {
+        "essay_id": essay_id,
+        "school": school,
+        "type": essay_type,
+        "year": year,
+        "category": "Personal",
+        "question": question,
+        "essay": body,
+    }
+
+
+ESSAYS = [
+    essay(3, "Yale", "Common App", 2021, "My grandmother's kitchen smelled of cardamom and community."),
+    essay(1, "Yale", "Supplement", 2021, "Why Yale? The community of scientists and musicians.", "Why Yale?"),
+    essay(2, "Harvard", "Common App", 2020, "Music and science meet in my garage lab, where music wins."),
+    essay(4, "Harvard", "common app", 2021, "Café mornings with my abuela taught me patience."),
+    essay(5, "MIT", "Supplement", 2022, "I build robots; robots build community. Science, science, science."),
+    essay(6, "MIT", "Supplement", 2021, "The kitchen is my lab and my grandmother is my first mentor."),
+    essay(7, None, None, None, "An essay with no school, type or year about music."),
+    essay(8, "Yale", "Common App", 2022, "", "Describe a community you belong to."),
+    {"school": "Yale", "type": "Common App", "essay": "No id: never indexed, community music."},
+]
+INDEXED = [e for e in ESSAYS if e.get("essay_id") is not None]
+QUERIES = ["community", "grandmother kitchen", "music science", "cafe", "CAFÉ abuela", "yale", "the of and", "zzzz", ""]
+
+
+@pytest.fixture(params=["pretty", "compact"])
+def corpus_dir(tmp_path, request):
+    write_corpus(ESSAYS, tmp_path, request.param)
+    return tmp_path
+
+
+def scan(school=None, essay_type=None, year=None):
+    return sorted(
+        (
+            e
+            for e in INDEXED
+            if (school is None or e["school"] == school)
+            and (essay_type is None or essay_corpus.slug(e["type"]) == essay_corpus.slug(essay_type))
+            and (year is None or e["year"] == year)
+        ),
+        key=lambda e: e["essay_id"],
+    )
+
+
+FILTERS = [
+    (None, None, None),
+    ("Yale", None, None),
+    (None, "Common App", None),
+    (None, "COMMON APP", None),
+    (None, None, 2021),
+    ("Harvard", "common app", 2021),
+    ("MIT", "Common App", None),
+    ("Nowhere", None, None),
+]
+
+
+@pytest.mark.parametrize("school,essay_type,year", FILTERS)
+def test_list_matches_a_scan_without_loading_bodies(corpus_dir, school, essay_type, year):
+    corpus = EssayCorpus(corpus_dir)
+    rows = corpus.list(school, essay_type, year)
+    assert [r["essay_id"] for r in rows] == [e["essay_id"] for e in scan(school, essay_type, year)]
+    assert all("essay" not in r for r in rows)
+    assert corpus.files_loaded == []
+
+
+@pytest.mark.parametrize("school,essay_type,year", FILTERS)
+def test_essays_reads_only_the_matching_shards(corpus_dir, school, essay_type, year):
+    corpus = EssayCorpus(corpus_dir)
+    want = scan(school, essay_type, year)
+    assert corpus.essays(school, essay_type, year) == want
+    assert sorted(corpus.files_loaded) == sorted({f"shards/{essay_corpus.shard_key(e)}.json" for e in want})
+
+
+def test_types_differing_only_in_case_share_a_shard(corpus_dir):
+    meta = EssayCorpus(corpus_dir).meta
+    assert meta["shards"]["harvard--common-app"] == 2
+    assert meta["shards"]["unknown--unknown"] == 1
+    assert meta["count"] == len(INDEXED)
+
+
+def test_essay_loads_one_shard(corpus_dir):
+    corpus = EssayCorpus(corpus_dir)
+    for e in INDEXED:
+        assert corpus.essay(e["essay_id"]) == e
+    assert len(corpus.files_loaded) == len({essay_corpus.shard_key(e) for e in INDEXED})
+
+    corpus = EssayCorpus(corpus_dir)
+    assert corpus.essay(6) == INDEXED[5]
+    assert corpus.files_loaded == ["shards/mit--supplement.json"]
+    assert corpus.essay(999) is None
+    assert corpus.files_loaded == ["shards/mit--supplement.json"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_a_brute_force_scan(corpus_dir, query):
+    corpus = EssayCorpus(corpus_dir)
+    hits = corpus.search(query)
+    assert [(h["essay_id"], h["score"]) for h in hits] == brute_force_search(ESSAYS, query)
+    prefixes = sorted({t[: essay_corpus.PREFIX_LEN] for t in essay_corpus.tokens(query)})
+    if prefixes:
+        indexed = json.loads((corpus_dir / "search" / "manifest.json").read_text(encoding="utf-8"))["shards"]
+        expected = ["search/manifest.json"] + [f"search/{p}.json" for p in prefixes if p in indexed]
+        assert corpus.files_loaded == expected
+    else:
+        assert corpus.files_loaded == []
+
+
+def test_search_requires_every_word_and_honours_filters(corpus_dir):
+    corpus = EssayCorpus(corpus_dir)
+    assert sorted(h["essay_id"] for h in corpus.search("grandmother kitchen")) == [3, 6]
+    assert [h["essay_id"] for h in corpus.search("grandmother kitchen", school="Yale")] == [3]
+    assert [h["essay_id"] for h in corpus.search("community", essay_type="supplement", year=2022)] == [5]
+    assert corpus.search("community", limit=2) == corpus.search("community")[:2]
+    assert corpus.search("describe belong")[0]["essay_id"] == 8
+
+
+def test_rewriting_removes_stale_shards(tmp_path):
+    write_corpus(ESSAYS, tmp_path)
+    write_corpus([e for e in ESSAYS if e.get("school") != "MIT"], tmp_path)
+    assert not (tmp_path / "shards" / "mit--supplement.json").exists()
+    corpus = EssayCorpus(tmp_path)
+    assert corpus.essay(5) is None
+    assert corpus.search("robots") == []
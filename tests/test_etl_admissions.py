@@ -0,0 +1,206 @@
+import json
+from functools import partial
+
+import pandas as pd
+import pytest
+
+import etl_admissions
+from artifacts import write_binary_artifact, write_json_artifact
+from columnar import columnar_records, read_columnar
+from etl_admissions import (
+    build_metrics_by_year,
+    build_rank_indexes,
+    frame_columnar,
+    frame_json,
+    write_institution_details,
+    write_rank_indexes,
+)
+
+
+def institutions():
+    return pd.DataFrame({"unitid": [1, 2, 3, 4], "name": ["A", "B", "C", "D"]})
+
+
+def metrics():
+    """Unit 99 is not published; unit 2's newest year has no applicant count."""
+    return pd.DataFrame(
+        {
+            "unitid": [1, 1, 2, 2, 3, 4, 99],
+            "year": [2022, 2023, 2022, 2023, 2022, 2023, 2023],
+            "applicants_total": [100, 500, 900, None, "300", 500, 10_000],
+            "percent_admitted_total": [50, 40, 5, 6, None, 40, 1],
+            "total_enrollment": [None, None, None, None, None, None, None],
+        }
+    )
+
+
+def tuition():
+    return pd.DataFrame(
+        {
+            "unitid": [1, 2, 3, 3, 99],
+            "tuition_year": ["2022-23", "2023-24", "2022-23", "2023-24", "2023-24"],
+            "tuition_and_fees": [30_000, 10_000, 20_000, 25_000, 1],
+        }
+    )
+
+
+def ranking(rank):
+    return list(zip(rank["unitids"], rank["values"]))
+
+
+def test_rankings_use_each_units_latest_value_and_break_ties_by_unitid():
+    ranks = build_rank_indexes(institutions(), metrics(), tuition())
+    assert sorted(ranks) == ["acceptance_rate", "applicants", "total_enrollment", "tuition"]
+    assert ranking(ranks["applicants"]) == [(2, 900.0), (1, 500.0), (4, 500.0), (3, 300.0)]
+    assert ranking(ranks["acceptance_rate"]) == [(2, 6.0), (1, 40.0), (4, 40.0)]
+    assert ranking(ranks["tuition"]) == [(2, 10_000), (3, 25_000), (1, 30_000)]
+    assert ranks["total_enrollment"]["unitids"] == []
+    assert ranks["total_enrollment"]["latest_period"] is None
+
+
+def test_rankings_carry_their_column_order_and_latest_period():
+    ranks = build_rank_indexes(institutions(), metrics(), tuition())
+    applicants = ranks["applicants"]
+    assert (applicants["key"], applicants["column"], applicants["order"]) == ("applicants", "applicants_total", "desc")
+    assert applicants["latest_period"] == 2023 and type(applicants["latest_period"]) is int
+    assert ranks["tuition"]["latest_period"] == "2023-24"
+    assert ranks["acceptance_rate"]["order"] == "asc"
+
+
+def test_missing_sources_and_columns_are_skipped():
+    ranks = build_rank_indexes(institutions(), metrics().drop(columns=["total_enrollment"]), None)
+    assert sorted(ranks) == ["acceptance_rate", "applicants"]
+    assert build_rank_indexes(institutions(), metrics().iloc[:0], tuition().iloc[:0]) == {}
+
+
+@pytest.mark.parametrize("output_format", ["pretty", "compact"])
+def test_written_rankings_split_the_top_n(tmp_path, monkeypatch, output_format):
+    monkeypatch.setattr(etl_admissions, "RANK_TOP_N", 2)
+    ranks = build_rank_indexes(institutions(), metrics(), tuition())
+    write_rank_indexes(ranks, tmp_path, output_format)
+
+    def read(name):
+        return json.loads((tmp_path / name).read_text(encoding="utf-8"))
+
+    for key, rank in ranks.items():
+        assert read(f"{key}.json") == rank
+        top = read(f"{key}.top.json")
+        assert top == {**rank, "unitids": rank["unitids"][:2], "values": rank["values"][:2]}
+    assert read("manifest.json") == [
+        {
+            "key": key,
+            "column": rank["column"],
+            "order": rank["order"],
+            "latest_period": rank["latest_period"],
+            "count": len(rank["unitids"]),
+            "top_n": min(2, len(rank["unitids"])),
+        }
+        for key, rank in ranks.items()
+    ]
+
+
+# ---------- metrics_by_year ----------
+def admissions(year, unitids, applicants, admitted, ratio):
+    return pd.DataFrame(
+        {
+            "unitid": unitids,
+            "year": [year] * len(unitids),
+            "applicants_total": applicants,
+            "admissions_total": [a / 2 if a == a else None for a in applicants],
+            "percent_admitted_total": admitted,
+            "admissions_yield_total": [33.3, None, 12.5][: len(unitids)],
+            "student_to_faculty_ratio": ratio,
+        }
+    )
+
+
+@pytest.mark.parametrize("output_format", ["pretty", "compact"])
+def test_metrics_bin_decodes_to_the_rows_of_metrics_json(tmp_path, output_format):
+    """Both files go through the writers main() uses; null, fractional and rounded cells included."""
+    metrics_by_year = build_metrics_by_year(
+        admissions(2022, [300, 100, 200], [1200.0, float("nan"), 7.0], [10.6, 25.0, None], [0.1, 1 / 3, None]),
+        admissions(2023, [100, 200], [40.0, 1e7], [None, 99.5], [12.25, 2.5e-7]),
+    )
+    write_json_artifact(tmp_path / "metrics_by_year.json", partial(frame_json, metrics_by_year), output_format)
+    write_binary_artifact(tmp_path / "metrics_by_year.bin", frame_columnar(metrics_by_year), output_format)
+
+    expected = json.loads((tmp_path / "metrics_by_year.json").read_text(encoding="utf-8"))
+    expected.sort(key=lambda r: (r["unitid"], r["year"]))
+    decoded = columnar_records(read_columnar(tmp_path / "metrics_by_year.bin"))
+    assert len(decoded) == len(expected) == 5
+    for got, want in zip(decoded, expected):
+        assert got == want
+        assert [k for k, v in got.items() if v is None] == [k for k, v in want.items() if v is None]
+    assert expected[0]["student_to_faculty_ratio"] == 0.3333333333 and expected[0]["applicants_total"] is None
+
+
+# ---------- detail files ----------
+def detail_frames(n=10):
+    institutions = pd.DataFrame(
+        {
+            "unitid": [500 + i for i in range(n)],
+            "name": [f"Collège {i}" if i % 5 else f"x\x7fy {i}" for i in range(n)],
+            "state": ["CA", None] * (n // 2),
+            "acceptance_rate": pd.array([i * 7 if i % 3 else None for i in range(n)], dtype="Int64"),
+            "major_families": [["Engineering"] if i % 2 else [] for i in range(n)],
+        }
+    )
+    metrics = pd.DataFrame(
+        {
+            "unitid": [500 + i for i in range(n) for _ in range(2)],
+            "year": [2022, 2023] * n,
+            "applicants_total": [float(i * 100) if i % 4 else float("nan") for i in range(2 * n)],
+        }
+    )
+    tuition = pd.DataFrame({"unitid": [501, 503], "tuition_year": ["2023-24", "2023-24"], "tuition_and_fees": [1e4, 2.5e4]})
+    requirements = pd.DataFrame(
+        {
+            "unitid": [500, 502],
+            "required": [["Transcript"], []],
+            "considered": [[], ["Essay"]],
+            "not_considered": [[], []],
+            "test_policy": ["Required", "Test blind"],
+        }
+    )
+    return institutions, metrics, tuition, requirements
+
+
+def written(root):
+    return {str(p.relative_to(root)): p.read_bytes() for p in sorted(root.rglob("*.json"))}
+
+
+@pytest.mark.parametrize("output_format", ["pretty", "compact"])
+def test_worker_pool_writes_the_same_files_as_the_serial_writer(tmp_path, monkeypatch, output_format):
+    monkeypatch.setattr(etl_admissions.os, "cpu_count", lambda: 4)
+    frames = detail_frames()
+    write_institution_details(tmp_path / "serial" / "institutions", *frames, workers=1, output_format=output_format)
+    write_institution_details(tmp_path / "pool" / "institutions", *frames, workers=3, output_format=output_format)
+    serial, pool = written(tmp_path / "serial"), written(tmp_path / "pool")
+    assert serial == pool
+    assert len(serial) == 2 * 10 + 1
+    assert b'"x\\u007fy 0"' in serial["institutions/500.json"]
+    detail = json.loads(serial["institutions/502.json"])
+    assert detail["requirements"]["considered"] == ["Essay"]
+    assert json.loads(serial["metrics/501.json"])["tuition"] == [{"unitid": 501, "tuition_year": "2023-24", "tuition_and_fees": 10000.0}]
+
+
+def test_incremental_pool_run_skips_unchanged_files_and_deletes_stale_ones(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(etl_admissions.os, "cpu_count", lambda: 4)
+    institutions, metrics, tuition, requirements = detail_frames()
+    out = tmp_path / "institutions"
+    write_institution_details(out, institutions, metrics, tuition, requirements, workers=3)
+    capsys.readouterr()
+
+    changed = institutions.iloc[1:].copy()
+    changed.loc[changed["unitid"] == 505, "name"] = "Renamed"
+    write_institution_details(out, changed, metrics, tuition, requirements, workers=3)
+    assert "1 changed, 17 unchanged, 2 deleted" in capsys.readouterr().out
+    assert not (out / "500.json").exists() and not (tmp_path / "metrics" / "500.json").exists()
+    assert json.loads((out / "505.json").read_text(encoding="utf-8"))["profile"]["name"] == "Renamed"
+
+
+def test_workers_are_capped_at_the_cpu_count(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(etl_admissions.os, "cpu_count", lambda: 1)
+    monkeypatch.setattr(etl_admissions, "ProcessPoolExecutor", None)
+    write_institution_details(tmp_path / "institutions", *detail_frames(), workers=8)
+    assert "with 1 worker(s)" in capsys.readouterr().out
@@ -0,0 +1,237 @@
+import io
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pytest
+
+import export_institutions_sql as sql_export
+from schema import TABLES, table_rows
+
+COLUMNS = TABLES["institutions"].column_names
+DDL = {c.name: c.ddl for c in TABLES["institutions"].columns}
+
+
+def awkward_institutions() -> List[dict]:
+  """Records with the values most likely to break quoting/escaping in the SQL export."""
+  base = {c: None for c in COLUMNS}
+  return [
+    {**base, "unitid": 1, "name": "O'Brien's \"Quoted\" College", "major_families": []},
+    {**base, "unitid": 2, "name": "Tab\tNew\nLine\r; end;", "city": "C:\\path\\", "acceptance_rate": 0.1},
+    {**base, "unitid": 3, "name": "Ünïcødé — 東京", "major_families": ["Arts, \"Design\"", "O'Neil\\x", "NULL", "{x}"]},
+    {**base, "unitid": 4, "name": "Numbers", "yield": 1e-05, "total_enrollment": 123456789, "grad_rate_6yr": -0.0},
+    {**base, "unitid": 5, "name": "\\N", "website": "';--", "major_families": [None, ""]},
+    {**base, "unitid": 6, "name": "Only nulls", "major_families": [None]},
+    {**base, "unitid": 7, "name": "No families"},
+  ]
+
+
+def many_institutions(n: int) -> List[dict]:
+  """``n`` plain records, every third with no major families (as in the published data)."""
+  base = {c: None for c in COLUMNS}
+  return [
+    {**base, "unitid": 1000 + i, "name": f"College {i}", "state": "CA", "major_families": [] if i % 3 else ["Engineering"]}
+    for i in range(n)
+  ]
+
+
+FORMATS = [
+  (fmt, upsert, batch)
+  for fmt in sql_export.EXPORT_FORMATS
+  for upsert in (False, True)
+  for batch in ((1, 7, sql_export.DEFAULT_BATCH_SIZE) if fmt == "values" else (sql_export.DEFAULT_BATCH_SIZE,))
+]
+
+
+# ---------- reading an export back ----------
+_TOKEN = re.compile(
+  r"\s*(NULL|ARRAY\[|\]|::text\[\]|\(|\)|,|;|'(?:[^']|'')*'|-?[0-9][0-9.eE+-]*|[A-Za-z_]+)", re.S
+)
+
+
+def _number(text: str) -> Any:
+  return int(text) if re.fullmatch(r"-?[0-9]+", text) else float(text)
+
+
+def _parse_literal(tokens: List[str], i: int):
+  tok = tokens[i]
+  if tok == "NULL":
+    return None, i + 1
+  if tok.startswith("'"):
+    if tokens[i + 1] == "::text[]":
+      assert tok == "'{}'", "only the empty array is written as a quoted literal"
+      return [], i + 2
+    return tok[1:-1].replace("''", "'"), i + 1
+  if tok == "ARRAY[":
+    items: List[Any] = []
+    i += 1
+    while tokens[i] != "]":
+      value, i = _parse_literal(tokens, i)
+      items.append(value)
+      if tokens[i] == ",":
+        i += 1
+    assert tokens[i + 1] == "::text[]", "arrays must carry their type"
+    return items, i + 2
+  return _number(tok), i + 1
+
+
+def _statement_rows(statement: str) -> Iterator[Dict[str, Any]]:
+  """Rows of the VALUES tuples in one INSERT statement produced by export_lines."""
+  body = statement[statement.index(" VALUES") + len(" VALUES"):]
+  tokens = []
+  pos = 0
+  while pos < len(body):
+    m = _TOKEN.match(body, pos)
+    if not m:
+      break
+    tokens.append(m.group(1))
+    pos = m.end()
+  i = 0
+  while i < len(tokens) and tokens[i] == "(":
+    values = []
+    i += 1
+    while tokens[i] != ")":
+      value, i = _parse_literal(tokens, i)
+      values.append(value)
+      if tokens[i] == ",":
+        i += 1
+    yield dict(zip(COLUMNS, values))
+    i += 1
+    if i < len(tokens) and tokens[i] == ",":
+      i += 1
+
+
+def _copy_unescape(text: str) -> Optional[str]:
+  if text == "\\N":
+    return None
+  return re.sub(r"\\(.)", lambda m: {"t": "\t", "n": "\n", "r": "\r"}.get(m.group(1), m.group(1)), text)
+
+
+def _copy_array(text: str) -> List[Optional[str]]:
+  items = re.findall(r'"((?:[^"\\]|\\.)*)"|(NULL)', text[1:-1])
+  return [None if null else re.sub(r"\\(.)", r"\1", quoted) for quoted, null in items]
+
+
+def read_export(text: str) -> List[Dict[str, Any]]:
+  """Parse an export written by export_lines back into rows."""
+  rows: List[Dict[str, Any]] = []
+  lines = text.split("\n")
+  i = 0
+  while i < len(lines):
+    line = lines[i]
+    if line.startswith("COPY "):
+      i += 1
+      while lines[i] != "\\.":
+        row = {}
+        for c, raw in zip(COLUMNS, lines[i].split("\t")):
+          value = _copy_unescape(raw)
+          if value is not None and DDL[c].startswith("text[]"):
+            value = _copy_array(value)
+          elif value is not None and not DDL[c].startswith("text"):
+            value = _number(value)
+          row[c] = value
+        rows.append(row)
+        i += 1
+    elif line.startswith("INSERT INTO public.institutions") and " SELECT " not in line:
+      statement = [line]
+      # Quotes inside literals are doubled, so an odd count means a literal spans the line break.
+      while not statement[-1].endswith(";") or "\n".join(statement).count("'") % 2:
+        i += 1
+        statement.append(lines[i])
+      rows.extend(_statement_rows("\n".join(statement)))
+    i += 1
+  return rows
+
+
+def assert_same_rows(expected: Sequence[Dict[str, Any]], actual: Sequence[Dict[str, Any]]) -> None:
+  assert len(actual) == len(expected)
+  for want, got in zip(expected, actual):
+    for c, value in want.items():
+      assert got[c] == value and type(got[c]) is type(value), f"unitid {want['unitid']} {c}: {value!r} vs {got[c]!r}"
+
+
+def test_sql_literal_types_arrays():
+  assert sql_export.sql_literal([]) == "'{}'::text[]"
+  assert sql_export.sql_literal(["a", None]) == "ARRAY['a', NULL]::text[]"
+  assert sql_export.sql_literal("O'Brien") == "'O''Brien'"
+
+
+@pytest.mark.parametrize("fmt,upsert,batch", FORMATS)
+@pytest.mark.parametrize("records", [awkward_institutions(), many_institutions(25)], ids=["awkward", "plain"])
+def test_export_reads_back_to_the_exported_rows(records, fmt, upsert, batch):
+  text = "\n".join(sql_export.export_lines(records, fmt, batch, upsert))
+  assert_same_rows(list(table_rows("institutions", records)), read_export(text))
+
+
+def test_values_format_batches_rows():
+  text = "\n".join(sql_export.export_lines(many_institutions(25), "values", 10))
+  assert text.count("INSERT INTO public.institutions") == 3
+  assert text.startswith("-- ") and text.split("\n")[1] == "BEGIN;" and text.endswith("COMMIT;")
+
+
+@pytest.mark.parametrize("fmt", sql_export.EXPORT_FORMATS)
+def test_records_without_an_integer_unitid_are_dropped(fmt):
+  records = many_institutions(3) + [{"unitid": None, "name": "No id"}, {"unitid": "abc", "name": "Bad id"}]
+  text = "\n".join(sql_export.export_lines(records, fmt))
+  assert "No id" not in text and "Bad id" not in text
+  assert [r["unitid"] for r in read_export(text)] == [1000, 1001, 1002]
+
+
+def test_unknown_format_is_rejected():
+  with pytest.raises(ValueError):
+    list(sql_export.export_lines([], "csv"))
+
+
+# ---------- executing an export ----------
+def replay(conn, text: str) -> None:
+  """
+  Run an export the way ``psql -f`` does: statements as written, and each COPY fed
+  the data lines that follow it up to ``\\.``.
+  """
+  conn.autocommit = True
+  lines = text.split("\n")
+  pending: List[str] = []
+  with conn.cursor() as cur:
+    i = 0
+    while i < len(lines):
+      if lines[i].startswith("COPY "):
+        if pending:
+          cur.execute("\n".join(pending))
+          pending = []
+        end = lines.index("\\.", i)
+        cur.copy_expert(lines[i], io.StringIO("".join(line + "\n" for line in lines[i + 1:end])))
+        i = end + 1
+        continue
+      pending.append(lines[i])
+      i += 1
+    if pending:
+      cur.execute("\n".join(pending))
+
+
+def stored_rows(conn) -> List[Dict[str, Any]]:
+  with conn.cursor() as cur:
+    cur.execute(f"SELECT {', '.join(COLUMNS)} FROM public.institutions ORDER BY unitid")
+    rows = cur.fetchall()
+
+  def plain(value):
+    if isinstance(value, Decimal):
+      return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+  return [{c: plain(v) for c, v in zip(COLUMNS, row)} for row in rows]
+
+
+@pytest.mark.parametrize("fmt,upsert,batch", FORMATS)
+def test_export_executes_on_postgres(pg_conn, fmt, upsert, batch):
+  import load_to_postgres
+
+  load_to_postgres.create_tables(pg_conn)
+  records = awkward_institutions() + many_institutions(25)
+  replay(pg_conn, "\n".join(sql_export.export_lines(records, fmt, batch, upsert)))
+  expected = sorted(table_rows("institutions", records), key=lambda r: r["unitid"])
+  assert stored_rows(pg_conn) == expected
+
+  if upsert:
+    changed = [{**r, "city": "Moved", "major_families": []} for r in records]
+    replay(pg_conn, "\n".join(sql_export.export_lines(changed, fmt, batch, upsert)))
+    assert stored_rows(pg_conn) == sorted(table_rows("institutions", changed), key=lambda r: r["unitid"])
@@ -0,0 +1,141 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetch_anonymous_essays as fetch
+
+LAST_INDEX = 23
+
+
+def essay(index):
+    """Odd indices hold a list of two entries, even ones a single bare object."""
+    if index % 2:
+        return [{"id": f"{index}-a"}, {"id": f"{index}-b"}]
+    return {"id": f"{index}"}
+
+
+def entries(first, last):
+    out = []
+    for index in range(first, last + 1):
+        data = essay(index)
+        out.extend(data if isinstance(data, list) else [data])
+    return out
+
+
+class EssayServer:
+    """
+    Local stand-in for collegebase: ``/essay_<n>.json`` exists up to LAST_INDEX.
+    ``failures`` maps an index to the statuses its next requests get, in order.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = {k: list(v) for k, v in (failures or {}).items()}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                index = int(self.path.rsplit("_", 1)[1].split(".")[0])
+                with server.lock:
+                    server.requests[index] += 1
+                    pending = server.failures.get(index)
+                    status = pending.pop(0) if pending else None
+                if status is None and index > LAST_INDEX:
+                    status = 404
+                body = b"{}" if status else json.dumps(essay(index)).encode()
+                self.send_response(status or 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}/essay_{{}}.json"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, "TARGET_DIR", tmp_path)
+    monkeypatch.setattr(fetch, "LOG_FILE", tmp_path / "fetch.log")
+
+
+def session(workers):
+    return fetch.make_session(workers, backoff=0)
+
+
+def checkpoint_indices(path):
+    return [json.loads(line)["index"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.parametrize("workers", [1, 4, 8])
+def test_fetches_every_index_in_order_through_transient_errors(tmp_path, workers):
+    checkpoint = tmp_path / "essays.ndjson"
+    with EssayServer({3: [503, 503], 7: [429], 12: [500, 502]}) as server:
+        fetched = fetch.fetch_all_essays(server.base_url, workers=workers, checkpoint=checkpoint, session=session(workers))
+    assert fetched == (LAST_INDEX, len(entries(1, LAST_INDEX)))
+    assert checkpoint_indices(checkpoint) == list(range(1, LAST_INDEX + 1))
+    assert [server.requests[i] for i in (3, 7, 12, 1)] == [3, 2, 3, 1]
+    assert fetch.read_checkpoint(checkpoint) == (LAST_INDEX, len(entries(1, LAST_INDEX)))
+    output = tmp_path / "essays.json"
+    assert fetch.compact(checkpoint, output) == len(entries(1, LAST_INDEX))
+    assert json.loads(output.read_text(encoding="utf-8")) == entries(1, LAST_INDEX)
+
+
+def test_an_index_that_keeps_failing_ends_the_run(tmp_path):
+    checkpoint = tmp_path / "essays.ndjson"
+    with EssayServer({5: [503] * (fetch.RETRIES + 1)}) as server:
+        fetched = fetch.fetch_all_essays(server.base_url, workers=2, checkpoint=checkpoint, session=session(2))
+    assert fetched == (4, len(entries(1, 4)))
+    assert checkpoint_indices(checkpoint) == [1, 2, 3, 4]
+    assert "status 503" in (tmp_path / "fetch.log").read_text(encoding="utf-8")
+
+
+def test_resume_cuts_a_torn_line_and_continues_after_it(tmp_path):
+    checkpoint = tmp_path / "essays.ndjson"
+    lines = [json.dumps({"index": i, "entries": entries(i, i)}) + "\n" for i in (1, 2, 3)]
+    checkpoint.write_text("".join(lines) + '{"index": 4, "entries": [{"id": "4', encoding="utf-8")
+
+    last, count = fetch.read_checkpoint(checkpoint)
+    assert (last, count) == (3, len(entries(1, 3)))
+    assert checkpoint.read_text(encoding="utf-8") == "".join(lines)
+
+    with EssayServer() as server:
+        fetched = fetch.fetch_all_essays(server.base_url, start=last + 1, workers=4, checkpoint=checkpoint, session=session(4))
+    assert fetched == (LAST_INDEX - 3, len(entries(4, LAST_INDEX)))
+    assert min(server.requests) == 4
+    assert checkpoint_indices(checkpoint) == list(range(1, LAST_INDEX + 1))
+    output = tmp_path / "essays.json"
+    assert fetch.compact(checkpoint, output) == len(entries(1, LAST_INDEX))
+    assert json.loads(output.read_text(encoding="utf-8")) == entries(1, LAST_INDEX)
+
+
+def test_a_complete_last_line_without_a_newline_is_cut(tmp_path):
+    checkpoint = tmp_path / "essays.ndjson"
+    whole = json.dumps({"index": 1, "entries": entries(1, 1)}) + "\n"
+    checkpoint.write_text(whole + json.dumps({"index": 2, "entries": entries(2, 2)}), encoding="utf-8")
+    assert fetch.read_checkpoint(checkpoint) == (1, len(entries(1, 1)))
+    assert checkpoint.read_text(encoding="utf-8") == whole
+
+
+def test_no_checkpoint_starts_from_the_first_index(tmp_path):
+    checkpoint = tmp_path / "missing.ndjson"
+    assert fetch.read_checkpoint(checkpoint) == (fetch.START_INDEX - 1, 0)
+    output = tmp_path / "essays.json"
+    assert fetch.compact(checkpoint, output) == 0
+    assert json.loads(output.read_text(encoding="utf-8")) == []
@@ -0,0 +1,398 @@
+from decimal import Decimal
+
+import pytest
+
+import load_to_postgres as loader
+from schema import HASH_COLUMN, TABLES, table_row
+
+AWKWARD_TEXT = [
+  "tab\there",
+  "new\nline\r\nwindows",
+  "back\\slash \\N \\t",
+  "quote's \"double\"",
+  "ünïcode ✓ 漢字",
+  "\\N",
+  "NULL",
+  "",
+  "{braces}",
+  "comma, here",
+]
+
+
+def institution(unitid, **fields):
+  return table_row("institutions", {"unitid": unitid, "name": f"Institution {unitid}", **fields})
+
+
+def awkward_institutions():
+  rows = []
+  for i, text in enumerate(AWKWARD_TEXT):
+    rows.append(
+      institution(
+        100000 + i,
+        name=text or "blank city",
+        city=text,
+        state=None if i % 3 == 0 else "CA",
+        acceptance_rate=[0.25, 12, None, 99.5][i % 4],
+        total_enrollment=1000 + i,
+        major_families=[[], [text], [text, None, "Engineering"], ['a"b', "c\\d", "e,f", "{g}"]][i % 4],
+      )
+    )
+  return rows
+
+
+def fetch(conn, table):
+  """Every row of ``table`` as dicts ordered by key; numerics come back as Python numbers."""
+  spec = TABLES[table]
+  columns = spec.column_names
+  with conn.cursor() as cur:
+    cur.execute(f"SELECT {', '.join(columns)} FROM public.{table} ORDER BY {', '.join(spec.key)}")
+    rows = cur.fetchall()
+  conn.commit()
+
+  def plain(value):
+    if isinstance(value, Decimal):
+      return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+  return [{c: plain(v) for c, v in zip(columns, row)} for row in rows]
+
+
+def test_copy_stream_reads_in_any_chunk_size():
+  rows = awkward_institutions()
+  columns = TABLES["institutions"].column_names
+  whole = loader._CopyStream(rows, columns).read()
+  for size in (1, 7, 8192):
+    stream = loader._CopyStream(rows, columns)
+    parts = iter(lambda: stream.read(size), "")
+    assert "".join(parts) == whole
+  assert whole.count("\n") == len(rows)
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_upsert_rows_stores_awkward_values_exactly(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  rows = awkward_institutions()
+  load = loader.upsert_rows(pg_conn, "institutions", rows, ("unitid",), mode, diff=False)
+  assert load.rows == len(rows)
+  assert fetch(pg_conn, "institutions") == rows
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_upsert_rows_overwrites_and_keeps_the_last_duplicate(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  loader.upsert_rows(pg_conn, "institutions", [institution(1, city="Old"), institution(2)], ("unitid",), mode, diff=False)
+  rows = [institution(1, city="First"), institution(3), institution(1, city="Last")]
+  load = loader.upsert_rows(pg_conn, "institutions", rows, ("unitid",), mode, diff=False)
+  assert load.rows == 2
+  assert [(r["unitid"], r["city"]) for r in fetch(pg_conn, "institutions")] == [(1, "Last"), (2, None), (3, None)]
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_upsert_rows_without_update_keeps_existing_rows(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  loader.upsert_rows(pg_conn, "institutions", [institution(1, city="Kept")], ("unitid",), mode, diff=False)
+  loader.upsert_rows(pg_conn, "institutions", [institution(1, city="Ignored"), institution(2)], ("unitid",), mode, update=False, diff=False)
+  assert [(r["unitid"], r["city"]) for r in fetch(pg_conn, "institutions")] == [(1, "Kept"), (2, None)]
+
+
+def test_copy_and_batch_modes_leave_identical_tables(pg_dsn):
+  import psycopg2
+
+  contents = {}
+  for mode in loader.LOAD_MODES:
+    conn = psycopg2.connect(pg_dsn)
+    try:
+      loader.create_tables(conn)
+      with conn.cursor() as cur:
+        cur.execute("TRUNCATE public.institutions CASCADE")
+      loader.upsert_rows(conn, "institutions", awkward_institutions(), ("unitid",), mode, diff=False)
+      with conn.cursor() as cur:
+        cur.execute(f"SELECT unitid, {HASH_COLUMN}, institutions::text FROM public.institutions ORDER BY unitid")
+        contents[mode] = cur.fetchall()
+      conn.commit()
+    finally:
+      conn.close()
+  assert contents["copy"] == contents["batch"]
+
+
+# ---------- run_loaders ----------
+def bundle_rows():
+  """A small, FK-consistent row set for every table."""
+  return {
+    "institutions": [institution(1, state="CA"), institution(2, state="NY"), institution(3)],
+    "institution_locations": [table_row("institution_locations", {"unitid": u, "UniLocation": "City"}) for u in (1, 2)],
+    "institution_metrics": [
+      table_row("institution_metrics", {"unitid": u, "year": y, "applicants_total": u * 1000 + y})
+      for u in (1, 2, 3)
+      for y in (2022, 2023)
+    ],
+    "majors_meta": [
+      {"cip_code": "14", "cip_level": "2-digit", "title": "Engineering"},
+      {"cip_code": "14.08", "cip_level": "4-digit", "title": "Civil Engineering"},
+    ],
+    "institution_majors": [
+      {"unitid": 1, "cip_level": "2-digit", "cip_code": "14"},
+      {"unitid": 1, "cip_level": "4-digit", "cip_code": "14.08"},
+      {"unitid": 3, "cip_level": "2-digit", "cip_code": "14"},
+    ],
+    "institution_requirements": [
+      table_row("institution_requirements", {"unitid": 1, "test_policy": "Required", "required": ["Transcript"]})
+    ],
+    "institution_support_notes": [{"unitid": 2, "key": "disability", "note": "Office in Hall 2"}],
+  }
+
+
+@pytest.fixture
+def bundle(tmp_path, monkeypatch):
+  from schema import write_load_table
+
+  rows = bundle_rows()
+  for table, data in rows.items():
+    write_load_table(tmp_path, table, data)
+  monkeypatch.setattr(loader, "LOAD_DIR", tmp_path)
+  return rows
+
+
+@pytest.fixture
+def pool(pg_dsn):
+  from psycopg2.pool import ThreadedConnectionPool
+
+  pool = ThreadedConnectionPool(1, 4, pg_dsn)
+  try:
+    yield pool
+  finally:
+    pool.closeall()
+
+
+def record_order(monkeypatch):
+  """Wrap every loader so its start and end are logged, in the order they happen."""
+  import threading
+
+  events = []
+  lock = threading.Lock()
+
+  def wrap(name, fn):
+    def run(conn, mode, diff):
+      with lock:
+        events.append(("start", name))
+      try:
+        return fn(conn, mode, diff)
+      finally:
+        with lock:
+          events.append(("end", name))
+    return run
+
+  monkeypatch.setattr(loader, "LOADERS", {n: (wrap(n, fn), deps) for n, (fn, deps) in loader.LOADERS.items()})
+  return events
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_run_loaders_loads_every_table_after_its_parents(pg_conn, bundle, pool, monkeypatch, mode, jobs):
+  loader.create_tables(pg_conn)
+  events = record_order(monkeypatch)
+  results = loader.run_loaders(pool, mode, jobs)
+
+  assert sorted(name for name, _, _ in results) == sorted(loader.LOADERS)
+  for name, (_, deps) in loader.LOADERS.items():
+    for dep in deps:
+      assert events.index(("end", dep)) < events.index(("start", name)), f"{name} started before {dep} finished"
+  loaded = {load.table: load.rows for _, loads, _ in results for load in loads}
+  assert loaded == {table: len(rows) for table, rows in bundle.items()}
+  for table, rows in bundle.items():
+    assert len(fetch(pg_conn, table)) == len(rows)
+
+
+def test_run_loaders_rejects_unsatisfiable_dependencies(pool, monkeypatch):
+  monkeypatch.setattr(loader, "LOADERS", {"a": (lambda *args: [], ("b",)), "b": (lambda *args: [], ("a",))})
+  with pytest.raises(RuntimeError, match="cannot be satisfied"):
+    loader.run_loaders(pool)
+
+
+def test_run_loaders_surfaces_a_failing_loader_and_discards_its_connection(pool, monkeypatch):
+  seen = []
+
+  def fail(conn, mode, diff):
+    seen.append(conn)
+    with conn.cursor() as cur:
+      cur.execute("SELECT 1")  # leaves the connection inside a transaction
+    raise ValueError("boom")
+
+  monkeypatch.setattr(loader, "LOADERS", {"bad": (fail, ())})
+  with pytest.raises(ValueError, match="boom"):
+    loader.run_loaders(pool)
+  assert seen[0].closed
+
+
+# ---------- diff-aware loads ----------
+def metrics(*pairs, bump=()):
+  return [
+    table_row("institution_metrics", {"unitid": u, "year": y, "applicants_total": 15 if (u, y) in bump else 10})
+    for u, y in pairs
+  ]
+
+
+def xmins(conn, table, key):
+  with conn.cursor() as cur:
+    cur.execute(f"SELECT {', '.join(key)}, xmin::text FROM public.{table}")
+    out = {tuple(r[:-1]): r[-1] for r in cur.fetchall()}
+  conn.commit()
+  return out
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_diff_load_writes_only_changes_and_deletes_vanished_rows(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  loader.upsert_rows(pg_conn, "institutions", [institution(u) for u in (1, 2, 3)], ("unitid",), mode)
+  key = TABLES["institution_metrics"].key
+  first = metrics((1, 2022), (1, 2023), (2, 2022), (2, 2023))
+
+  load = loader.upsert_rows(pg_conn, "institution_metrics", first, key, mode)
+  assert (load.inserted, load.updated, load.unchanged, load.deleted) == (4, 0, 0, 0)
+  before = xmins(pg_conn, "institution_metrics", key)
+
+  load = loader.upsert_rows(pg_conn, "institution_metrics", first, key, mode)
+  assert (load.inserted, load.updated, load.unchanged, load.deleted) == (0, 0, 4, 0)
+  assert xmins(pg_conn, "institution_metrics", key) == before  # nothing was rewritten
+
+  second = metrics((1, 2022), (1, 2023), (2, 2022), (3, 2023), bump=[(1, 2023)])
+  load = loader.upsert_rows(pg_conn, "institution_metrics", second, key, mode)
+  assert (load.inserted, load.updated, load.unchanged, load.deleted) == (1, 1, 2, 1)
+  assert fetch(pg_conn, "institution_metrics") == second
+  after = xmins(pg_conn, "institution_metrics", key)
+  assert after[(1, 2022)] == before[(1, 2022)] and after[(2, 2022)] == before[(2, 2022)]
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_diff_load_stores_row_hashes_that_a_full_reload_agrees_with(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  rows = awkward_institutions()
+  loader.upsert_rows(pg_conn, "institutions", rows, ("unitid",), mode, diff=False)
+  columns = list(rows[0])
+  with pg_conn.cursor() as cur:
+    cur.execute(f"SELECT unitid, {HASH_COLUMN} FROM public.institutions ORDER BY unitid")
+    stored = dict(cur.fetchall())
+  pg_conn.commit()
+  assert stored == {r["unitid"]: loader.row_hash(r, columns) for r in rows}
+
+  load = loader.upsert_rows(pg_conn, "institutions", rows, ("unitid",), mode)
+  assert (load.inserted, load.updated, load.unchanged, load.deleted) == (0, 0, len(rows), 0)
+
+
+@pytest.mark.parametrize("mode", loader.LOAD_MODES)
+def test_empty_input_never_deletes(pg_conn, mode):
+  loader.create_tables(pg_conn)
+  loader.upsert_rows(pg_conn, "institutions", [institution(1)], ("unitid",), mode)
+  load = loader.upsert_rows(pg_conn, "institutions", [], ("unitid",), mode)
+  assert load.rows == 0
+  assert len(fetch(pg_conn, "institutions")) == 1
+
+
+# ---------- indexes and materialized views ----------
+def relation_oids(conn):
+  with conn.cursor() as cur:
+    cur.execute("SELECT relname, oid FROM pg_class WHERE relnamespace = 'public'::regnamespace AND relkind IN ('i', 'm')")
+    out = dict(cur.fetchall())
+  conn.commit()
+  return out
+
+
+def has_extension(conn, name):
+  with conn.cursor() as cur:
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = %s", (name,))
+    found = cur.fetchone() is not None
+  conn.commit()
+  return found
+
+
+@pytest.fixture
+def loaded(pg_conn, bundle, pool):
+  loader.create_tables(pg_conn)
+  return loader.run_loaders(pool)
+
+
+def test_provision_builds_declared_indexes_and_views_once(pg_conn, loaded):
+  from schema import INDEXES, MATERIALIZED_VIEWS
+
+  built = loader.provision_indexes_and_views(pg_conn)
+  assert built == [v.name for v in MATERIALIZED_VIEWS]
+  oids = relation_oids(pg_conn)
+  expected = [i.name for i in INDEXES if not i.extension or has_extension(pg_conn, i.extension)]
+  expected += [i.name for v in MATERIALIZED_VIEWS for i in v.indexes] + built
+  assert set(expected) <= set(oids)
+
+  assert loader.provision_indexes_and_views(pg_conn) == []
+  assert relation_oids(pg_conn) == oids
+
+
+def test_provision_rebuilds_only_what_changed(pg_conn, loaded, monkeypatch):
+  from schema import INDEXES, Index
+
+  loader.provision_indexes_and_views(pg_conn)
+  oids = relation_oids(pg_conn)
+  changed = tuple(Index(i.name, i.table, "btree (state, city)") if i.name == "institutions_state_idx" else i for i in INDEXES)
+  monkeypatch.setattr(loader, "INDEXES", changed)
+
+  assert loader.provision_indexes_and_views(pg_conn) == []
+  after = relation_oids(pg_conn)
+  assert after["institutions_state_idx"] != oids["institutions_state_idx"]
+  assert {k: v for k, v in after.items() if k != "institutions_state_idx"} == {
+    k: v for k, v in oids.items() if k != "institutions_state_idx"
+  }
+  with pg_conn.cursor() as cur:
+    cur.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'institutions_state_idx'")
+    assert "(state, city)" in cur.fetchone()[0]
+  pg_conn.commit()
+
+
+def test_provision_never_drops_hand_made_indexes(pg_conn, loaded, capsys):
+  with pg_conn.cursor() as cur:
+    cur.execute("CREATE INDEX institutions_state_idx ON public.institutions USING btree (state)")
+    cur.execute("CREATE INDEX institutions_control_idx ON public.institutions (control, state)")
+    cur.execute("COMMENT ON INDEX public.institutions_control_idx IS 'tuned by hand'")
+  pg_conn.commit()
+  oids = relation_oids(pg_conn)
+
+  for _ in range(2):
+    loader.provision_indexes_and_views(pg_conn)
+    after = relation_oids(pg_conn)
+    assert after["institutions_state_idx"] == oids["institutions_state_idx"]
+    assert after["institutions_control_idx"] == oids["institutions_control_idx"]
+    out = capsys.readouterr().out
+    assert "index institutions_control_idx was not created by this script" in out
+    assert "institutions_state_idx was not" not in out
+  with pg_conn.cursor() as cur:
+    cur.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'institutions_control_idx'")
+    assert "(control, state)" in cur.fetchone()[0]
+  pg_conn.commit()
+
+
+def latest_applicants(conn):
+  with conn.cursor() as cur:
+    cur.execute("SELECT unitid, year, applicants_total FROM public.top_applicants_latest ORDER BY unitid")
+    out = [tuple(int(v) for v in row) for row in cur.fetchall()]
+  conn.commit()
+  return out
+
+
+def test_refresh_views_follows_changed_sources(pg_conn, loaded):
+  built = loader.provision_indexes_and_views(pg_conn)
+  loader.refresh_views(pg_conn, loaded, skip=built)
+  assert latest_applicants(pg_conn) == [(1, 2023, 3023), (2, 2023, 4023), (3, 2023, 5023)]
+
+  new_year = table_row("institution_metrics", {"unitid": 1, "year": 2024, "applicants_total": 7})
+  rows = bundle_rows()["institution_metrics"] + [new_year]
+  load = loader.upsert_rows(pg_conn, "institution_metrics", rows, TABLES["institution_metrics"].key)
+  unchanged = [("institutions", [loader.TableLoad("institutions", 3, 0.0, 0, 0, 3, 0)], 0.0)]
+
+  loader.refresh_views(pg_conn, unchanged)
+  assert latest_applicants(pg_conn)[0] == (1, 2023, 3023)  # sources unchanged: not refreshed
+  loader.refresh_views(pg_conn, unchanged + [("institution_metrics", [load], 0.0)])
+  assert latest_applicants(pg_conn)[0] == (1, 2024, 7)
+
+
+def test_hot_queries_use_their_indexes(pg_conn, loaded):
+  loader.provision_indexes_and_views(pg_conn)
+  failures = loader.check_hot_queries(pg_conn)
+  expected = [] if has_extension(pg_conn, "pg_trgm") else ["name substring"]
+  assert failures == expected
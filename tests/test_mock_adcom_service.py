@@ -0,0 +1,374 @@
+import json
+import os
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import mock_adcom_service as svc
+
+ANALYSIS = {
+  "academic_rating": 2,
+  "extracurricular_rating": 3,
+  "personal_rating": 3,
+  "personal_rating_flag": "",
+  "lops": [],
+  "overall_summary": "Solid file.",
+  "school_predictions": [{"school_name": "Example College", "tier": "Target Match", "rationale": "Within range."}],
+}
+SCHOOLS = [{"school_name": "Example College", "acceptance_rate": 0.45, "sat_25": 1300, "sat_75": 1450}]
+
+
+class RateLimited(Exception):
+  code = 429
+
+
+class FakeModel:
+  """
+  Stand-in for the Gemini client: answers after ``delay`` seconds and records the peak
+  number of calls in flight. ``failures`` maps a marker found in the prompt to the
+  exceptions its next calls raise, in order.
+  """
+
+  def __init__(self, delay=0.02, failures=None, answer=ANALYSIS):
+    self.delay = delay
+    self.answer = answer
+    self.prompts = []
+    self.failures = {k: list(v) for k, v in (failures or {}).items()}
+    self.lock = threading.Lock()
+    self.in_flight = 0
+    self.peak = 0
+    self.calls = 0
+
+  def generate_content(self, prompt):
+    with self.lock:
+      self.in_flight += 1
+      self.peak = max(self.peak, self.in_flight)
+      self.calls += 1
+      self.prompts.append(prompt)
+      error = next((errs.pop(0) for marker, errs in self.failures.items() if marker in prompt and errs), None)
+    try:
+      time.sleep(self.delay)
+      if error is not None:
+        raise error
+      return SimpleNamespace(text=json.dumps(self.answer))
+    finally:
+      with self.lock:
+        self.in_flight -= 1
+
+
+class FakeTable:
+  """In-memory Supabase table: records each upsert request and keeps rows by key."""
+
+  def __init__(self):
+    self.rows = {}
+    self.requests = []
+    self._pending = None
+
+  def upsert(self, rows, on_conflict):
+    self._pending = (rows, on_conflict)
+    return self
+
+  def execute(self):
+    rows, key = self._pending
+    keys = [r[key] for r in rows]
+    assert len(keys) == len(set(keys)), "an upsert may not touch the same row twice"
+    self.requests.append(len(rows))
+    for row in rows:
+      self.rows[row[key]] = row
+    return SimpleNamespace(data=rows)
+
+
+def job(n, **student):
+  return svc.AnalysisJob(f"user-{n}", {"marker": f"student-{n}", "academics": {"sat": 1400}, **student}, SCHOOLS)
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+  """No PDFs, no network, no backoff sleeps, and a fresh response cache per test."""
+  docs = [(Path("rubric.txt"), "Academic rating scale. Personal rating: essays and reader comments.")]
+  monkeypatch.setattr(svc, "harvard_documents", lambda: docs)
+  monkeypatch.setattr(svc, "response_cache", svc.ResponseCache())
+  monkeypatch.setattr(svc, "_backoff", lambda attempt: 0.0)
+  monkeypatch.setattr(svc, "get_model", lambda: pytest.fail("tests must pass a fake model"))
+  monkeypatch.setattr(svc, "get_supabase", lambda: pytest.fail("tests must pass a fake table"))
+
+
+# ---------- batch analysis ----------
+def test_analyze_many_caps_calls_in_flight_and_keeps_job_order():
+  model = FakeModel(delay=0.05)
+  jobs = [job(n) for n in range(12)]
+  results = svc.run_batch(jobs, concurrency=3, model=model, table=FakeTable())
+  assert model.peak == 3
+  assert model.calls == 12
+  assert [r.job for r in results] == jobs
+  assert all(r.error is None and r.attempts == 1 for r in results)
+
+
+def test_rate_limited_calls_are_retried():
+  model = FakeModel(failures={"student-1": [RateLimited("429"), RateLimited("429")]})
+  results = svc.run_batch([job(0), job(1)], model=model, table=FakeTable())
+  assert [(r.error, r.attempts) for r in results] == [(None, 1), (None, 3)]
+
+
+def test_retries_give_up_after_max_retries():
+  model = FakeModel(failures={"student-0": [RateLimited("429")] * 5})
+  [result] = svc.asyncio.run(svc.analyze_many([job(0)], model=model, max_retries=2))
+  assert result.text is None and result.attempts == 3
+  assert result.error.startswith("RateLimited")
+
+
+def test_a_non_retryable_error_fails_only_its_job():
+  model = FakeModel(failures={"student-1": [ValueError("bad request")]})
+  table = FakeTable()
+  results = svc.run_batch([job(0), job(1), job(2)], model=model, table=table)
+  assert [r.error for r in results] == [None, "ValueError: bad request", None]
+  assert results[1].attempts == 1
+  assert sorted(table.rows) == ["user-0", "user-2"]
+
+
+def test_a_job_that_fails_before_the_model_call_fails_alone(monkeypatch):
+  real = svc.pretier_schools
+
+  def pretier(student_data, schools):
+    if student_data["marker"] == "student-1":
+      raise ValueError("could not convert string to float: '30%'")
+    return real(student_data, schools)
+
+  monkeypatch.setattr(svc, "pretier_schools", pretier)
+  model = FakeModel()
+  table = FakeTable()
+  results = svc.run_batch([job(0), job(1), job(2)], model=model, table=table)
+  assert results[1].text is None and results[1].attempts == 0
+  assert results[1].error.startswith("ValueError")
+  assert [r.error for r in results[::2]] == [None, None]
+  assert model.calls == 2
+  assert sorted(table.rows) == ["user-0", "user-2"]
+
+
+def test_identical_jobs_are_answered_from_the_cache():
+  model = FakeModel()
+  results = svc.run_batch([job(0)], model=model, table=FakeTable())
+  again = svc.run_batch([job(0)], model=model, table=FakeTable())
+  assert model.calls == 1
+  assert again[0].text == results[0].text and again[0].attempts == 0
+
+
+def test_cache_key_follows_essay_sources_and_tier_data(tmp_path, monkeypatch):
+  import adcom_similarity
+  import adcom_tiering
+
+  essays = tmp_path / "essays.json"
+  essays.write_text("[]", encoding="utf-8")
+  monkeypatch.setattr(adcom_similarity, "ESSAYS_JSON", essays)
+  monkeypatch.delenv("ADCOM_ESSAY_SOURCES", raising=False)
+  monkeypatch.setattr(adcom_tiering, "data_files_key", partial(adcom_tiering.data_files_key, data_dir=tmp_path))
+  schools = [{"school_name": "Example College", "unitid": 7}]
+
+  def key():
+    return svc.analysis_cache_key({"academics": {"sat": 1400}}, schools)
+
+  first = key()
+  assert key() == first
+  essays.write_text('[{"essay": "A new known essay."}]', encoding="utf-8")
+  second = key()
+  assert second != first
+  (tmp_path / "metrics").mkdir()
+  (tmp_path / "metrics" / "7.json").write_text('{"metrics": []}', encoding="utf-8")
+  assert key() != second
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+def test_cached_responses_expire_after_the_ttl():
+  clock = FakeClock()
+  cache = svc.ResponseCache(max_entries=4, ttl_seconds=60, clock=clock)
+  cache.put("a", "A")
+  clock.now += 59.9
+  assert cache.get("a") == "A"
+  clock.now += 0.1
+  assert cache.get("a") is None
+  assert cache.get("a") is None
+  assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2, "expired": 1, "evictions": 0}
+
+  cache.put("a", "A2")
+  clock.now += 30
+  assert cache.get("a") == "A2"
+
+
+def test_overfilling_the_cache_evicts_the_least_recently_used_keys():
+  clock = FakeClock()
+  cache = svc.ResponseCache(max_entries=3, ttl_seconds=60, clock=clock)
+  for key in "abc":
+    cache.put(key, key.upper())
+  assert cache.get("a") == "A"
+  cache.put("b", "B2")
+  cache.put("d", "D")
+  cache.put("e", "E")
+  assert list(cache._entries) == ["b", "d", "e"]
+  assert [cache.get(key) for key in "abcde"] == [None, "B2", None, "D", "E"]
+  assert cache.stats() == {"entries": 3, "hits": 4, "misses": 2, "expired": 0, "evictions": 2}
+
+
+@pytest.mark.parametrize("max_entries,ttl", [(0, 60), (4, 0)])
+def test_a_disabled_cache_stores_nothing(max_entries, ttl):
+  cache = svc.ResponseCache(max_entries=max_entries, ttl_seconds=ttl, clock=FakeClock())
+  cache.put("a", "A")
+  assert not cache.enabled and cache.get("a") is None and cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize(
+  "answer",
+  [{"overall_summary": "No ratings."}, {k: v for k, v in ANALYSIS.items() if k != "school_predictions"}],
+  ids=["no_ratings", "no_predictions"],
+)
+def test_invalid_model_responses_are_never_cached(monkeypatch, answer):
+  model = FakeModel(delay=0, answer=answer)
+  monkeypatch.setattr(svc, "get_model", lambda: model)
+  student = job(0).student_data
+  assert json.loads(svc.analyze_profile(student, SCHOOLS)) == answer
+  svc.analyze_profile(student, SCHOOLS)
+  svc.run_batch([job(0)], model=model, table=FakeTable())
+  assert model.calls == 3
+  assert svc.response_cache.stats()["entries"] == 0
+
+  model.answer = ANALYSIS
+  svc.analyze_profile(student, SCHOOLS)
+  svc.run_batch([job(0)], model=model, table=FakeTable())
+  assert model.calls == 4
+  assert svc.response_cache.stats()["entries"] == 1
+
+
+# ---------- prompt ----------
+def test_document_work_happens_once_per_corpus(monkeypatch):
+  monkeypatch.setattr(svc, "_harvard_corpus", None)
+  built = []
+  system_prompts = []
+  real_index, real_prompt = svc.build_index, svc._build_system_prompt
+  monkeypatch.setattr(svc, "build_index", lambda docs: built.append(1) or real_index(docs))
+  monkeypatch.setattr(svc, "_build_system_prompt", lambda context: system_prompts.append(context) or real_prompt(context))
+
+  full = real_prompt(svc.load_harvard_docs())
+  version = svc.corpus_version()
+  for n in range(3):
+    prompt, stats = svc.build_prompt(job(n).student_data, SCHOOLS)
+    input_block = prompt[prompt.index("\n\nINPUT DATA (JSON):"):]
+    assert stats["full_context_tokens"] == svc.estimate_tokens(full + input_block)
+    assert svc.corpus_version() == version
+  assert len(built) == 1
+  assert len(system_prompts) == 1 + 3  # the full-document prompt once, then one per request
+
+  docs = [(Path("rubric.txt"), "Revised rubric: academic rating scale.")]
+  monkeypatch.setattr(svc, "harvard_documents", lambda: docs)
+  svc.build_prompt(job(0).student_data, SCHOOLS)
+  assert svc.corpus_version() != version
+  assert len(built) == 2
+
+
+# ---------- document text cache ----------
+@pytest.fixture
+def doc_cache(tmp_path, monkeypatch):
+  """A .txt document, an empty disk and memory cache, and a counting _extract_text."""
+  monkeypatch.setattr(svc, "DOC_CACHE_DIR", tmp_path / "cache")
+  monkeypatch.setattr(svc, "_doc_text_cache", {})
+  extracted = []
+  real_extract = svc._extract_text
+  monkeypatch.setattr(svc, "_extract_text", lambda path: extracted.append(path) or real_extract(path))
+  doc = tmp_path / "rubric.txt"
+  doc.write_text("Academic rating scale.", encoding="utf-8")
+  return doc, extracted
+
+
+def test_cached_document_text_skips_extraction(doc_cache):
+  doc, extracted = doc_cache
+  assert svc.document_text(doc) == "Academic rating scale."
+  assert svc.document_text(doc) == "Academic rating scale."
+  assert extracted == [doc]
+  assert list((doc.parent / "cache").glob("*.json")) == [svc._disk_cache_path(doc)]
+
+
+def test_disk_cache_survives_clearing_the_memory_cache(doc_cache):
+  doc, extracted = doc_cache
+  svc.document_text(doc)
+  svc._doc_text_cache.clear()
+  assert svc.document_text(doc) == "Academic rating scale."
+  assert extracted == [doc]
+  assert svc._doc_text_cache[str(doc)][2] == "Academic rating scale."
+
+
+def test_a_new_mtime_or_size_invalidates_the_cached_text(doc_cache):
+  doc, extracted = doc_cache
+  svc.document_text(doc)
+  stat = doc.stat()
+
+  os.utime(doc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+  assert svc.document_text(doc) == "Academic rating scale."
+  assert len(extracted) == 2
+
+  doc.write_text("Academic rating scale, revised.", encoding="utf-8")
+  os.utime(doc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+  svc._doc_text_cache.clear()
+  assert svc.document_text(doc) == "Academic rating scale, revised."
+  assert len(extracted) == 3
+  assert svc._read_disk_cache(doc, stat.st_mtime_ns, stat.st_size) is None
+
+
+def test_a_failed_extraction_is_not_cached(doc_cache, monkeypatch):
+  doc, extracted = doc_cache
+  monkeypatch.setattr(svc, "_extract_text", lambda path: extracted.append(path) and None)
+  assert svc.document_text(doc) is None
+  assert svc.document_text(doc) is None
+  assert extracted == [doc, doc]
+  assert svc._doc_text_cache == {}
+  assert not (doc.parent / "cache").exists()
+
+
+# ---------- tiers ----------
+def test_only_lottery_tiers_are_enforced():
+  schools = SCHOOLS + [{"school_name": "Tiny Admit U", "acceptance_rate": 0.05}, {"school_name": "Open U", "acceptance_rate": 0.8}]
+  predictions = [
+    {"school_name": "Example College", "tier": "Reach", "rationale": "Weak rigor."},
+    {"school_name": "Tiny Admit U", "tier": "Target Match", "rationale": "Strong file."},
+    {"school_name": "Open U", "tier": "Academic Safety", "rationale": "Strong file."},
+  ]
+  model = FakeModel(answer={**ANALYSIS, "school_predictions": predictions})
+  [result] = svc.run_batch([svc.AnalysisJob("user-0", {"academics": {"sat": 1400}}, schools)], model=model, table=FakeTable())
+  tiers = {p["school_name"]: p["tier"] for p in json.loads(result.text)["school_predictions"]}
+  assert tiers == {"Example College": "Reach", "Tiny Admit U": "Lottery", "Open U": "Academic Safety"}
+  assert '"suggested_tier": "Target Match"' in model.prompts[0]
+  assert '"precomputed_tier": "Lottery"' in model.prompts[0]
+
+
+# ---------- saving ----------
+@pytest.mark.parametrize("count,batch_size,expected", [(250, 100, [100, 100, 50]), (100, 100, [100]), (3, 1, [1, 1, 1]), (0, 100, [])])
+def test_save_many_upserts_in_batches(count, batch_size, expected):
+  results = [svc.AnalysisResult(job(n), json.dumps(ANALYSIS), None, 1, 0.0) for n in range(count)]
+  table = FakeTable()
+  assert svc.save_many(results, table, batch_size) == count
+  assert table.requests == expected
+  assert len(table.rows) == count
+
+
+def test_save_many_keeps_the_last_result_per_user_and_skips_failures():
+  first = svc.AnalysisResult(job(0), json.dumps({**ANALYSIS, "overall_summary": "first"}), None, 1, 0.0)
+  failed = svc.AnalysisResult(job(1), None, "ValueError: x", 1, 0.0)
+  last = svc.AnalysisResult(job(0), json.dumps({**ANALYSIS, "overall_summary": "last"}), None, 1, 0.0)
+  table = FakeTable()
+  assert svc.save_many([first, failed, last], table) == 1
+  assert table.requests == [1]
+  assert "last" in json.dumps(table.rows["user-0"])
+
+
+def test_unparsable_school_fields_do_not_fail_the_job():
+  schools = [{"school_name": "Example College", "acceptance_rate": "30%", "sat_25": "n/a", "sat_75": ""}]
+  results = svc.run_batch([svc.AnalysisJob("user-0", {"academics": {"sat": 1400}}, schools)], model=FakeModel(), table=FakeTable())
+  assert results[0].error is None
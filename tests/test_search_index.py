@@ -0,0 +1,136 @@
+import json
+
+import pandas as pd
+import pytest
+
+import search_index
+from search_index import SearchIndex, brute_force_search, shards_for_token, write_search_index
+
+NAMES = [
+    ("Columbia University", "New York", "NY"),
+    ("Columbia College Chicago", "Chicago", "IL"),
+    ("College of the Holy Cross", "Worcester", "MA"),
+    ("Colorado College", "Colorado Springs", "CO"),
+    ("Colorado State University", "Fort Collins", "CO"),
+    ("Community College of Denver", "Denver", "CO"),
+    ("Cornell University", "Ithaca", "NY"),
+    ("Cooper Union", "New York", "NY"),
+    ("Connecticut College", "New London", "CT"),
+    ("Concordia University", "Montreal", None),
+    ("University of Chicago", "Chicago", "IL"),
+    ("Chicago State University", "Chicago", "IL"),
+    ("Universidad de Puerto Rico", "San Juan", "PR"),
+    ("École Polytechnique", "Palaiseau", None),
+    ("St. John's College", "Annapolis", "MD"),
+    ("MIT", "Cambridge", "MA"),
+    ("Co-op Tech", "New York", "NY"),
+    ("C", "Nowhere", "ZZ"),
+]
+QUERIES = [
+    "colorado",
+    "col",
+    "co",
+    "comm coll",
+    "chicago",
+    "Chicago State",
+    "university of chicago",
+    "university",
+    "univ",
+    "new york",
+    "ecole",
+    "ÉCOLE poly",
+    "st john",
+    "mit",
+    "puerto rico",
+    "ny",
+    "c",
+    "the of",
+    "",
+    "zzzz",
+]
+
+
+def index_frame():
+    rows = [{"unitid": 100 + i, "name": name, "city": city, "state": state} for i, (name, city, state) in enumerate(NAMES)]
+    rows.append({"unitid": 999, "name": None, "city": "Nameless", "state": "NY"})
+    return pd.DataFrame(rows)
+
+
+def docs():
+    return [(100 + i, name, city, state) for i, (name, city, state) in enumerate(NAMES)]
+
+
+@pytest.fixture(
+    params=[(search_index.MAX_SHARD_DOCS, search_index.MAX_TOKEN_DOCS), (4, search_index.MAX_TOKEN_DOCS), (4, 4)],
+    ids=["unsplit", "split", "capped"],
+)
+def index_dir(tmp_path, monkeypatch, request):
+    max_shard_docs, max_token_docs = request.param
+    monkeypatch.setattr(search_index, "MAX_SHARD_DOCS", max_shard_docs)
+    monkeypatch.setattr(search_index, "MAX_TOKEN_DOCS", max_token_docs)
+    write_search_index(index_frame(), tmp_path, "compact")
+    return tmp_path
+
+
+def test_large_prefixes_are_split(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_SHARD_DOCS", 4)
+    manifest, shards = write_search_index(index_frame(), tmp_path)
+    assert {"colo", "coll", "colu", "com", "con", "coo", "cor"} <= set(shards)
+    assert "co" in shards and set(shards["co"]["tokens"]) == {"co"}
+    for key, shard in shards.items():
+        assert all(tok.startswith(key) for tok in shard["tokens"])
+        assert manifest["shards"][key]["docs"] == len(shard["docs"])
+    assert manifest["doc_count"] == len(NAMES)
+    assert manifest["common"] == []
+
+
+def test_common_tokens_are_not_posted_but_still_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_TOKEN_DOCS", 4)
+    manifest, shards = write_search_index(index_frame(), tmp_path)
+    assert manifest["common"] == ["college", "university"]
+    assert not any(tok in shard["tokens"] for shard in shards.values() for tok in manifest["common"])
+
+    index = SearchIndex(tmp_path)
+    for query in ("university", "univ", "college", "coll university"):
+        assert index.search(query) == []
+    assert index.shards_loaded == []
+    hits = [h["name"] for h in index.search("university of chicago")]
+    assert hits == ["University of Chicago", "Chicago State University"]
+    assert index.shards_loaded == ["ch"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_a_brute_force_scan(index_dir, query):
+    assert SearchIndex(index_dir).search(query) == brute_force_search(docs(), query)
+
+
+@pytest.mark.parametrize("query", ["colorado", "comm coll", "chicago", "co"])
+def test_search_loads_only_the_pivot_shards(index_dir, query):
+    index = SearchIndex(index_dir)
+    index.search(query)
+    pivot = search_index.choose_pivot(index.manifest, search_index.query_tokens(query))
+    assert sorted(index.shards_loaded) == (shards_for_token(index.manifest, pivot) if pivot else [])
+
+
+def test_ranking_prefers_name_starts_then_shorter_names():
+    hits = brute_force_search(docs(), "chicago")
+    assert [h["name"] for h in hits[:3]] == ["Chicago State University", "University of Chicago", "Columbia College Chicago"]
+    assert brute_force_search(docs(), "university of chicago")[0]["name"] == "University of Chicago"
+    assert [h["unitid"] for h in brute_force_search(docs(), "chicago", limit=2)] == [h["unitid"] for h in hits[:2]]
+
+
+def test_queries_without_an_indexable_token_return_nothing(index_dir):
+    index = SearchIndex(index_dir)
+    for query in ("", "c", "the of", "!!"):
+        assert index.search(query) == []
+    assert index.shards_loaded == []
+
+
+def test_rewriting_removes_stale_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_SHARD_DOCS", 4)
+    write_search_index(index_frame(), tmp_path)
+    monkeypatch.setattr(search_index, "MAX_SHARD_DOCS", 300)
+    manifest, _ = write_search_index(index_frame(), tmp_path)
+    on_disk = {p.stem for p in tmp_path.glob("*.json")} - {"manifest"}
+    assert on_disk == set(manifest["shards"])
+    assert json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8")) == manifest